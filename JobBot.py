@@ -3,6 +3,8 @@ import os, re, yaml, requests
 from dataclasses import dataclass
 from typing import List, Optional
 
+from messaging import extract_keywords
+
 TIMEOUT = 12
 
 @dataclass
@@ -13,8 +15,6 @@ class Job:
     url: str
     description: str = ""
 
-KEYWORDS = ["python","django","javascript","react","sql","mysql","kotlin","android","git","rest","api"]
-
 def ok_link(url: str) -> bool:
     try:
         r = requests.get(url, timeout=TIMEOUT, allow_redirects=True, headers={"User-Agent":"job-scout/1.0"})
@@ -86,8 +86,9 @@ def passes_filters(job: Job, cfg: dict) -> bool:
 def make_message(job: Job, cfg: dict) -> str:
     profile = cfg["profile"]["pitch"]
     jd = normalize(job.description)
-    hits = [k for k in KEYWORDS if k in jd][:4]  # pocas para no pasar 300 chars
-    stack = ", ".join(h.upper() if h in ["sql","api"] else h.title() for h in hits) or "Python/Django y React"
+    # Same stack list the report's messages and ranking use.
+    hits = extract_keywords(jd)[:4]  # pocas para no pasar 300 chars
+    stack = ", ".join(hits) or "Python/Django y React"
 
     msg = (f"Hola, vi la vacante de {job.title} en {job.company}. "
            f"Tengo base sólida en {stack} y experiencia con Git y APIs REST. "
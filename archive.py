@@ -0,0 +1,301 @@
+"""Local archive of every fetched posting, for re-filtering without the network."""
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from normalize import html_to_text
+from sources.record import JobRecord, posting_key_of
+
+
+DEFAULT_ARCHIVE_PATH = "archive.sqlite3"
+DEFAULT_EXPIRE_DAYS = 365
+FLUSH_EVERY = 500
+# Raw descriptions are stored as fetched, so speed matters more than ratio.
+COMPRESS_LEVEL = 1
+
+# (source, posting id, title, company, location, url, raw description, updated_at, fetched_at)
+Row = Tuple[str, str, str, str, str, str, str, Optional[str], float]
+
+
+def _version(source: str, posting_id: str, updated_at: Optional[str], description: str) -> int:
+    digest = hashlib.blake2b(digest_size=8)
+    for part in (source, posting_id, updated_at or "", description):
+        digest.update(part.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+    # Signed, like the 64-bit integers SQLite stores.
+    return int.from_bytes(digest.digest(), "big", signed=True)
+
+
+def _text(blob: bytes) -> str:
+    return html_to_text(zlib.decompress(blob).decode("utf-8"))
+
+
+def _fts_available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts_probe USING fts5(text)")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class JobArchive:
+    def __init__(
+        self,
+        path: str = DEFAULT_ARCHIVE_PATH,
+        expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS,
+    ) -> None:
+        self.expire_days = expire_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.fts = _fts_available(self._conn)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(postings)")]
+        with self._conn:
+            if columns and "indexed" not in columns:
+                # Archives from before lazy indexing hold normalized, indexed text.
+                self._conn.execute("ALTER TABLE postings ADD COLUMN indexed INTEGER NOT NULL DEFAULT 1")
+            if columns and "listing" not in columns:
+                self._conn.execute("ALTER TABLE postings ADD COLUMN listing INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " id INTEGER PRIMARY KEY,"
+                " source TEXT NOT NULL,"
+                " posting_id TEXT NOT NULL,"
+                " version INTEGER NOT NULL,"
+                " title TEXT NOT NULL,"
+                " company TEXT NOT NULL,"
+                " location TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " description BLOB NOT NULL,"
+                " updated_at TEXT,"
+                " fetched_at REAL NOT NULL,"
+                " indexed INTEGER NOT NULL DEFAULT 0,"
+                # Stored from a listing, without its description.
+                " listing INTEGER NOT NULL DEFAULT 0,"
+                " UNIQUE (source, posting_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS postings_fetched_at ON postings (fetched_at)")
+            if self.fts:
+                # Contentless: the text lives compressed in ``postings`` only.
+                # Postings are indexed when a query first needs them.
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS postings_fts USING fts5("
+                    "title, company, location, description, content='', tokenize='unicode61 remove_diacritics 2')"
+                )
+        self._versions = {row[0] for row in self._conn.execute("SELECT version FROM postings")}
+        self._new: Dict[Tuple[str, str], Tuple[int, Row, bool]] = {}
+
+    @classmethod
+    def from_config(cls, archive_config: Optional[Dict]) -> Optional["JobArchive"]:
+        archive_config = archive_config or {}
+        if not archive_config.get("enabled", True):
+            return None
+        return cls(
+            archive_config.get("path", DEFAULT_ARCHIVE_PATH),
+            archive_config.get("expire_days", DEFAULT_EXPIRE_DAYS),
+        )
+
+    def add(self, source: str, job: Dict[str, str], listing: bool = False) -> bool:
+        """Archive ``job`` unless this version of it is already stored; ``True`` if it was new.
+
+        A ``listing`` job comes without its description and never replaces a
+        stored version with the same ``updated_at``.
+        """
+        key = posting_key_of(job)
+        posting_id, updated_at = key if key is not None else (job.get("url") or "", None)
+        if not posting_id:
+            return False
+        raw = job.get("description") or ""
+        version = _version(source, posting_id, updated_at, raw)
+        with self._lock:
+            if version in self._versions:
+                return False
+            self._versions.add(version)
+        row: Row = (
+            source,
+            posting_id,
+            job.get("title") or "",
+            job.get("company") or "",
+            job.get("location") or "",
+            job.get("url") or "",
+            # Normalized when read back: most postings are never replayed.
+            raw,
+            updated_at,
+            time.time(),
+        )
+        with self._lock:
+            replaced = self._new.get((source, posting_id))
+            if replaced is not None:
+                self._versions.discard(replaced[0])
+            self._new[(source, posting_id)] = (version, row, listing)
+            pending = len(self._new)
+        if pending >= FLUSH_EVERY:
+            self.flush()
+        return True
+
+    def record(
+        self, jobs: Iterable[Tuple[int, Dict[str, str]]], sources: Sequence[str]
+    ) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """Archive each ``(task index, job)`` on its way through; ``sources[index]`` names its source."""
+        for index, job in jobs:
+            self.add(sources[index], job)
+            yield index, job
+
+    def _unindex(self, rowid: int) -> None:
+        old = self._conn.execute(
+            "SELECT title, company, location, description FROM postings WHERE id = ? AND indexed", (rowid,)
+        ).fetchone()
+        if old is not None:
+            self._conn.execute(
+                "INSERT INTO postings_fts (postings_fts, rowid, title, company, location, description)"
+                " VALUES ('delete', ?, ?, ?, ?, ?)",
+                (rowid, old[0], old[1], old[2], _text(old[3])),
+            )
+
+    def _index_pending(self) -> None:
+        """Add the postings stored since the last query to the full-text index."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, title, company, location, description FROM postings WHERE NOT indexed"
+            )
+            self._conn.executemany(
+                "INSERT INTO postings_fts (rowid, title, company, location, description) VALUES (?, ?, ?, ?, ?)",
+                ((rowid, title, company, location, _text(blob)) for rowid, title, company, location, blob in rows),
+            )
+            self._conn.execute("UPDATE postings SET indexed = 1 WHERE NOT indexed")
+
+    def flush(self) -> None:
+        with self._lock:
+            new, self._new = self._new, {}
+        if not new:
+            return
+        with self._lock, self._conn:
+            for version, row, listing in new.values():
+                source, posting_id, title, company, location, url, raw, updated_at, fetched_at = row
+                previous = self._conn.execute(
+                    "SELECT id, version, updated_at FROM postings WHERE source = ? AND posting_id = ?",
+                    (source, posting_id),
+                ).fetchone()
+                if previous is not None:
+                    if listing and previous[2] == updated_at:
+                        # Same version, stored with its description.
+                        self._versions.discard(version)
+                        continue
+                    # A new version replaces the old one in the table and the index.
+                    if self.fts:
+                        self._unindex(previous[0])
+                    self._conn.execute("DELETE FROM postings WHERE id = ?", (previous[0],))
+                    self._versions.discard(previous[1])
+                self._conn.execute(
+                    "INSERT INTO postings (source, posting_id, version, title, company, location, url,"
+                    " description, updated_at, fetched_at, listing) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        source,
+                        posting_id,
+                        version,
+                        title,
+                        company,
+                        location,
+                        url,
+                        zlib.compress(raw.encode("utf-8"), COMPRESS_LEVEL),
+                        updated_at,
+                        fetched_at,
+                        listing,
+                    ),
+                )
+
+    def prune(self) -> None:
+        if not self.expire_days:
+            return
+        cutoff = time.time() - float(self.expire_days) * 86400
+        with self._lock, self._conn:
+            expired = self._conn.execute("SELECT id, version FROM postings WHERE fetched_at < ?", (cutoff,)).fetchall()
+            for rowid, version in expired:
+                if self.fts:
+                    self._unindex(rowid)
+                self._conn.execute("DELETE FROM postings WHERE id = ?", (rowid,))
+                self._versions.discard(version)
+
+    def _where(
+        self, since: Optional[float], query: Optional[str], sources: Optional[List[str]]
+    ) -> Tuple[List[str], List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if since is not None:
+            clauses.append("fetched_at >= ?")
+            params.append(since)
+        if sources:
+            clauses.append(f"source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        if query:
+            if not self.fts:
+                raise RuntimeError("Esta instalación de SQLite no incluye FTS5; no se puede usar --query")
+            self._index_pending()
+            clauses.append("id IN (SELECT rowid FROM postings_fts WHERE postings_fts MATCH ?)")
+            params.append(query)
+        return clauses, params
+
+    def count_listings(
+        self, since: Optional[float] = None, query: Optional[str] = None, sources: Optional[List[str]] = None
+    ) -> int:
+        """How many of the postings ``iter_postings`` would read were stored without their description."""
+        self.flush()
+        clauses, params = self._where(since, query, sources)
+        where = " AND ".join(clauses + ["listing"])
+        return self._conn.execute(f"SELECT COUNT(*) FROM postings WHERE {where}", params).fetchone()[0]
+
+    def iter_postings(
+        self,
+        since: Optional[float] = None,
+        query: Optional[str] = None,
+        sources: Optional[List[str]] = None,
+        keep: Optional[Callable[[str, str], bool]] = None,
+        listings: bool = True,
+    ) -> Iterator[Tuple[str, JobRecord]]:
+        """Yield ``(source, job)`` for the archived postings, newest first.
+
+        ``since`` bounds when they were fetched (a ``time.time()`` value),
+        ``query`` is an FTS5 match expression and ``sources`` the sources to
+        read. With ``keep(title, location)``, only the postings it accepts have
+        their description decompressed and normalized. ``listings=False``
+        leaves out the postings stored without their description.
+        """
+        self.flush()
+        clauses, params = self._where(since, query, sources)
+        if not listings:
+            clauses.append("NOT listing")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn.execute(
+            "SELECT id, source, title, company, location, url, posting_id, updated_at"
+            f" FROM postings{where} ORDER BY fetched_at DESC",
+            params,
+        )
+        batch: List[Tuple] = []
+        for row in rows:
+            if keep is None or keep(row[2], row[4]):
+                batch.append(row)
+                if len(batch) >= FLUSH_EVERY:
+                    yield from self._with_descriptions(batch)
+                    batch = []
+        yield from self._with_descriptions(batch)
+
+    def _with_descriptions(self, rows: List[Tuple]) -> Iterator[Tuple[str, JobRecord]]:
+        if not rows:
+            return
+        descriptions = dict(
+            self._conn.execute(
+                f"SELECT id, description FROM postings WHERE id IN ({', '.join('?' * len(rows))})",
+                [row[0] for row in rows],
+            )
+        )
+        for rowid, source, title, company, location, url, posting_id, updated_at in rows:
+            description = _text(descriptions[rowid])
+            yield source, JobRecord(title, company, location, url, description, posting_id, updated_at)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,83 @@
+"""Break-even of ``cpu_pool``: in-process text rules against the process pool.
+
+    python -m benchmarks.bench_cpu_pool --workers 4
+"""
+import argparse
+import os
+import time
+from typing import List
+
+from benchmarks.bench_filters import synthetic_jobs
+from cpu_pool import ParallelMatcher
+from dedup import minhash
+from main import load_config
+from messaging import extract_keywords
+from normalize import html_to_text
+from profiles import ProfileMatcher, load_profiles
+from sources.record import JobRecord
+
+
+def _records(count: int, sentences: int) -> List[JobRecord]:
+    jobs = synthetic_jobs(count)
+    for job in jobs:
+        # Board descriptions run to several KB of HTML.
+        job["description"] = f"<div><p>{job['description']}</p></div>" * sentences
+    return [JobRecord(job["title"], job["company"], job["location"], job["url"], job["description"]) for job in jobs]
+
+
+def _normalize(job: JobRecord) -> None:
+    job["description"] = html_to_text(job["description"])
+
+
+def _in_process(matcher: ProfileMatcher, jobs: List[JobRecord]) -> float:
+    """What ``_judged_jobs`` does for each posting before the pool takes over."""
+    started = time.perf_counter()
+    for job in jobs:
+        mask, _ = matcher.match(job, _normalize)
+        if mask:
+            minhash(job.description, normalized=True)
+            extract_keywords(job.description)
+    return time.perf_counter() - started
+
+
+def _pooled(matcher: ProfileMatcher, jobs: List[JobRecord], workers: int, chunk_size: int) -> float:
+    started = time.perf_counter()
+    pool = ParallelMatcher(matcher, {"workers": workers, "chunk_size": chunk_size}, normalize=True, signatures=True)
+    try:
+        for index, job in enumerate(jobs):
+            for _ in pool.submit(index, job):
+                pass
+        for _ in pool.finish():
+            pass
+    finally:
+        pool.close()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--size", type=int, default=3, help="copias del texto sintético por descripción")
+    parser.add_argument("--config", default="config.yaml")
+    args = parser.parse_args()
+
+    matcher = ProfileMatcher(load_profiles(load_config(args.config)))
+    local = _in_process(matcher, _records(args.jobs, args.size))
+    startup = _pooled(matcher, _records(1, args.size), args.workers, args.chunk_size)
+    pooled = _pooled(matcher, _records(args.jobs, args.size), args.workers, args.chunk_size)
+
+    per_job = local / args.jobs
+    pooled_per_job = (pooled - startup) / args.jobs
+    print(f"en proceso           {local:8.3f} s  {per_job * 1e6:8.1f} µs/vacante")
+    print(f"pool ({args.workers} procesos)    {pooled:8.3f} s  {pooled_per_job * 1e6:8.1f} µs/vacante  arranque {startup:.3f} s")
+    # Past this many postings, what the workers save covers starting them.
+    if pooled_per_job < per_job:
+        print(f"punto de equilibrio: ~{startup / (per_job - pooled_per_job):,.0f} vacantes")
+    else:
+        print("el pool no gana tiempo con estos procesos")
+
+
+if __name__ == "__main__":
+    main()
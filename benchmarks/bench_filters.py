@@ -0,0 +1,94 @@
+"""Micro-benchmark of ``apply_filters`` against ``CompiledFilter``.
+
+    python -m benchmarks.bench_filters --jobs 100000
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from filters import CompiledFilter, apply_filters
+from main import load_config
+
+
+TITLES = [
+    "Software Engineer",
+    "Senior Software Engineer",
+    "Junior Backend Developer",
+    "Frontend Intern",
+    "Data Analyst Trainee",
+    "Engineering Manager",
+    "QA Automation Practicante",
+    "Full Stack Developer",
+    "Sales Representative",
+    "Android Developer Jr",
+]
+LOCATIONS = [
+    "Monterrey, Nuevo León",
+    "Monterrey, Nuevo Leon",
+    "Remoto México",
+    "Ciudad de México",
+    "Guadalajara",
+    "Área Metropolitana de Monterrey",
+    "Remote - US",
+]
+SENTENCES = [
+    "Buscamos una persona con ganas de aprender.",
+    "Trabajarás con Python, Django y React en proyectos remotos.",
+    "Se requieren 2 años de experiencia en desarrollo web.",
+    "Se requieren 5+ años de experiencia liderando equipos.",
+    "Ideal para Junior o Entry level que quiera crecer.",
+    "Ofrecemos prestaciones superiores a las de ley.",
+    "Colaborarás con el Lead de ingeniería en el diseño de APIs REST.",
+    "Conocimientos de SQL, Git y metodologías ágiles.",
+    "<p>Oportunidad de <strong>crecimiento</strong> y capacitación.</p>",
+]
+
+
+def synthetic_jobs(count: int, seed: int = 7) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    jobs = []
+    for index in range(count):
+        description = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(8, 30)))
+        jobs.append(
+            {
+                "title": rng.choice(TITLES),
+                "company": f"empresa{index % 300}",
+                "location": rng.choice(LOCATIONS),
+                "url": f"https://example.com/jobs/{index}",
+                "description": description,
+            }
+        )
+    return jobs
+
+
+def _time(label: str, func, jobs: List[Dict[str, str]]) -> List[bool]:
+    start = time.perf_counter()
+    verdicts = [func(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {elapsed:8.3f} s  {len(jobs) / elapsed:12,.0f} jobs/s  {sum(verdicts):7} aceptadas")
+    return verdicts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--config", default="config.yaml")
+    args = parser.parse_args()
+
+    filter_config = load_config(args.config).get("filters", {})
+    jobs = synthetic_jobs(args.jobs)
+
+    legacy = _time("apply_filters", lambda job: apply_filters(job, filter_config), jobs)
+    start = time.perf_counter()
+    compiled_filter = CompiledFilter(filter_config)
+    print(f"{'compilación':<16} {time.perf_counter() - start:8.3f} s")
+    compiled = _time("CompiledFilter", compiled_filter.matches, jobs)
+
+    # Differences come from accent folding, e.g. "Nuevo Leon" now matches "Nuevo León".
+    differences = sum(1 for old, new in zip(legacy, compiled) if old != new)
+    print(f"veredictos distintos: {differences}")
+
+
+if __name__ == "__main__":
+    main()
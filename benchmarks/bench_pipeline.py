@@ -0,0 +1,279 @@
+"""End-to-end benchmark of ``main.main`` against the local replay server.
+
+    python -m benchmarks.bench_pipeline --jobs 10000 --latency 0.02 --error-rate 0.01
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+from urllib.parse import urlparse
+
+import yaml
+
+from http_client import get_client
+
+
+SOURCES = ("greenhouse", "lever", "external", "apify")
+
+
+def _bench_config(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "greenhouse_tokens": [f"gh{index}" for index in range(args.boards)],
+        "lever_companies": [f"lv{index}" for index in range(args.boards)],
+        "external_sources": [
+            {
+                "name": f"ext{index}",
+                "endpoint": f"{base_url}/external/ext{index}",
+                "data_key": "data",
+                "pagination": {
+                    "style": "page",
+                    "size_param": "limit",
+                    "page_size": args.page_size,
+                    "max_pages": 1000,
+                }
+                if args.page_size
+                else None,
+            }
+            for index in range(args.boards)
+        ],
+        "lever": {"page_size": args.page_size, "max_pages": 1000},
+        "apify_indeed": {
+            "country": "mx",
+            "items_limit": args.jobs_per_source,
+            "page_size": 1000,
+            "queries": [{"query": f"q{index}", "location": "Monterrey"} for index in range(args.boards)],
+        },
+        "filters": {
+            "ubicaciones": ["Monterrey", "Nuevo León", "Remoto México"],
+            "niveles": ["Junior", "Intern", "Trainee", "Practicante", "Entry", "Jr"],
+            "titulos_permitidos": ["Software Engineer", "Backend", "Frontend", "Full Stack", "Android", "Data Analyst"],
+            "exclusiones": ["Senior", "Lead", "Manager"],
+            "exclusion_por_anos": 3,
+            "limite_envio": args.limit,
+        },
+        "greenhouse": {"two_phase": not args.single_phase},
+        # Tasks are keyed by netloc, so the cap has to name the port too.
+        "concurrency": {"hosts": {urlparse(base_url).netloc: args.per_host}},
+        "http": {"pool_size": 64, "backoff": 0.05},
+        "telegram": {"chat_interval": 0, "global_rate": 1000},
+        "report": {"streaming": not args.batch_report},
+        "deadline": {"run_secs": args.deadline},
+        "metrics": {"enabled": args.metrics, "profile": args.profile or []},
+        "cpu_pool": {
+            "enabled": args.cpu_pool is not None,
+            "min_jobs": args.cpu_pool or 0,
+            "workers": args.cpu_workers,
+        },
+    }
+
+
+def _start_server(args: argparse.Namespace) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.replay_server",
+        "--jobs-per-source",
+        str(args.jobs_per_source),
+        "--latency",
+        str(args.latency),
+        "--jitter",
+        str(args.jitter),
+        "--error-rate",
+        str(args.error_rate),
+        "--run-secs",
+        str(args.run_secs),
+    ]
+    if args.fixtures:
+        command += ["--fixtures", os.path.abspath(args.fixtures)]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=os.getcwd())
+
+
+def _point_at(base_url: str) -> None:
+    """Redirect every API constant to the replay server."""
+    from sources import apify_indeed, greenhouse, lever
+    import notify.telegram
+
+    greenhouse.API_BASE = f"{base_url}/greenhouse"
+    lever.API_BASE = f"{base_url}/lever"
+    apify_indeed.APIFY_BASE_URL = f"{base_url}/apify"
+    notify.telegram.TELEGRAM_API_TEMPLATE = f"{base_url}/telegram/bot{{token}}/sendMessage"
+
+
+def _instrument(timings: Dict[str, float]) -> Callable[[], None]:
+    """Wrap the stage functions ``main`` calls so their time is accumulated.
+
+    Returns a callable that puts the originals back.
+    """
+    import main
+    from dedup import DedupIndex
+    from live_report import LiveReport
+    from runtime import Runtime
+
+    targets = [
+        (main, "filter_jobs", "fetch + filtros"),
+        (main, "stream_jobs", "fetch + filtros"),
+        (main, "validate_links", "validación de links"),
+        (main, "send_report", "armado del reporte"),
+        (LiveReport, "finish", "cierre del reporte"),
+        (Runtime, "deliver", "envío a Telegram"),
+        (DedupIndex, "drop_duplicates", "deduplicación"),
+    ]
+    originals = [(owner, attribute, getattr(owner, attribute)) for owner, attribute, _ in targets]
+
+    def timed(name: str, func: Callable) -> Callable:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[name] += time.perf_counter() - start
+
+        return wrapper
+
+    for (owner, attribute, name), (_, _, original) in zip(targets, originals):
+        setattr(owner, attribute, timed(name, original))
+
+    def restore() -> None:
+        for owner, attribute, original in originals:
+            setattr(owner, attribute, original)
+
+    return restore
+
+
+def _server_stats(base_url: str) -> Dict[str, Any]:
+    return get_client().get(f"{base_url}/__stats", timeout=10).json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=10000, help="vacantes sintéticas en total (10 a 100000)")
+    parser.add_argument("--boards", type=int, default=2, help="boards/consultas por tipo de fuente")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--run-secs", type=float, default=0.5, help="duración simulada de las corridas de Apify")
+    parser.add_argument("--per-host", type=int, default=16, help="conexiones simultáneas al servidor local")
+    parser.add_argument("--limit", type=int, default=25, help="limite_envio del reporte")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--single-phase", action="store_true", help="descarga Greenhouse con content=true")
+    parser.add_argument("--fixtures", help="directorio con respuestas grabadas para el servidor")
+    parser.add_argument("--tracemalloc", action="store_true", help="mide el pico de memoria de Python (más lento)")
+    parser.add_argument("--json", action="store_true", help="imprime el resultado como JSON")
+    parser.add_argument(
+        "--metrics", action="store_true", help="activa la sección metrics; los archivos quedan en el directorio temporal"
+    )
+    parser.add_argument("--profile", nargs="*", help="etapas a perfilar con cProfile (implica --metrics)")
+    parser.add_argument(
+        "--cpu-pool", type=int, metavar="MIN_JOBS", help="activa cpu_pool a partir de MIN_JOBS vacantes evaluadas"
+    )
+    parser.add_argument("--cpu-workers", type=int, default=0, help="procesos de cpu_pool (0 = un proceso por núcleo)")
+    parser.add_argument("--batch-report", action="store_true", help="arma el reporte al final en vez de enviarlo en vivo")
+    parser.add_argument(
+        "--page-size", type=int, default=100, help="vacantes por página de Lever y external_sources (0 = sin paginar)"
+    )
+    parser.add_argument("--deadline", type=float, help="deadline.run_secs: corta la descarga tras estos segundos")
+    args = parser.parse_args()
+    args.metrics = args.metrics or bool(args.profile)
+    args.jobs_per_source = max(1, args.jobs // (len(SOURCES) * args.boards))
+
+    server = _start_server(args)
+    base_url = server.stdout.readline().strip()
+    workdir = tempfile.mkdtemp(prefix="botjobs-bench-")
+    previous_cwd = os.getcwd()
+    os.environ.update(TELEGRAM_BOT_TOKEN="bench", TELEGRAM_CHAT_ID="1", APIFY_TOKEN="bench")
+    try:
+        _point_at(base_url)
+        os.chdir(workdir)
+        with open("config.yaml", "w", encoding="utf-8") as handle:
+            yaml.safe_dump(_bench_config(base_url, args), handle, allow_unicode=True)
+
+        import main as bot
+
+        results: List[Dict[str, Any]] = []
+        for run in range(1, args.runs + 1):
+            timings: Dict[str, float] = defaultdict(float)
+            restore = _instrument(timings)
+            before = _server_stats(base_url)
+            if args.tracemalloc:
+                tracemalloc.start()
+            sys.argv = ["main.py", "--config", "config.yaml"]
+            started_at = time.time()
+            start = time.perf_counter()
+            first_alert = None
+            watcher_done = threading.Event()
+
+            def watch_first_message() -> None:
+                nonlocal first_alert
+                while not watcher_done.wait(0.05):
+                    stats = _server_stats(base_url)
+                    if stats["messages"] > before["messages"]:
+                        first_alert = stats["last_message_at"] - started_at
+                        return
+
+            watcher = threading.Thread(target=watch_first_message, daemon=True)
+            watcher.start()
+            try:
+                bot.main()
+            finally:
+                restore()
+                watcher_done.set()
+                watcher.join()
+            wall = time.perf_counter() - start
+            # filter_jobs also covers deduplication and the link check.
+            timings["fetch + filtros"] -= timings.get("validación de links", 0.0) + timings.get("deduplicación", 0.0)
+            peak_python = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            if args.tracemalloc:
+                tracemalloc.stop()
+            after = _server_stats(base_url)
+            requests_made = after["requests"] - before["requests"]
+            results.append(
+                {
+                    "run": run,
+                    "jobs": args.jobs_per_source * len(SOURCES) * args.boards,
+                    "wall_s": round(wall, 3),
+                    "stages_s": {name: round(value, 3) for name, value in timings.items()},
+                    "requests": requests_made,
+                    "requests_per_s": round(requests_made / wall, 1) if wall else None,
+                    "bytes_served": after["bytes"] - before["bytes"],
+                    "messages": after["messages"] - before["messages"],
+                    "first_alert_s": round(first_alert, 3) if first_alert is not None else None,
+                    "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                    "peak_python_mb": round(peak_python / 1e6, 1) if peak_python is not None else None,
+                }
+            )
+    finally:
+        os.chdir(previous_cwd)
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+    if args.metrics:
+        print(f"métricas y perfiles en {workdir}")
+    for result in results:
+        print(f"corrida {result['run']}: {result['jobs']} vacantes, {result['wall_s']} s en total")
+        for name, value in result["stages_s"].items():
+            print(f"  {name:<22} {value:8.3f} s")
+        print(
+            f"  peticiones {result['requests']} ({result['requests_per_s']}/s), "
+            f"{result['bytes_served'] / 1e6:.1f} MB servidos, {result['messages']} mensajes"
+        )
+        if result["first_alert_s"] is not None:
+            print(f"  primer mensaje a los {result['first_alert_s']} s")
+        memory = f"  memoria pico RSS {result['peak_rss_mb']} MB"
+        if result["peak_python_mb"] is not None:
+            memory += f", Python {result['peak_python_mb']} MB"
+        print(memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Local stand-in for every API the bot talks to.
+
+    python -m benchmarks.replay_server --jobs-per-source 1000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.bench_filters import LOCATIONS, SENTENCES, TITLES
+from messaging import TECH_KEYWORDS
+
+
+VOCABULARY = sorted(TECH_KEYWORDS) + [
+    "equipo", "cliente", "producto", "datos", "servicios", "pruebas", "despliegue", "calidad", "móvil", "nube",
+    "seguridad", "rendimiento", "arquitectura", "documentación", "soporte", "integración", "usuarios", "métricas",
+]
+
+
+class ReplayState:
+    def __init__(
+        self,
+        jobs_per_source: int = 1000,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        run_secs: float = 0.5,
+        fixtures: Optional[str] = None,
+        seed: int = 7,
+    ) -> None:
+        self.jobs_per_source = jobs_per_source
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.run_secs = run_secs
+        self.fixtures = fixtures
+        self.seed = seed
+        self.base_url = ""
+        self.lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.bytes_sent = 0
+        self.messages = 0
+        # Wall-clock time of the latest message, to measure time to first alert.
+        self.last_message_at: Optional[float] = None
+        self.runs: Dict[str, Tuple[float, str]] = {}
+        self.aborted: Set[str] = set()
+        self._boards: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_id: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._rng = random.Random(seed)
+
+    def jobs_for(self, source: str, key: str) -> List[Dict[str, Any]]:
+        """Deterministic synthetic postings of one board, feed or dataset."""
+        board_key = f"{source}/{key}"
+        with self.lock:
+            jobs = self._boards.get(board_key)
+            if jobs is None:
+                rng = random.Random(f"{self.seed}/{board_key}")
+                jobs = [
+                    {
+                        "id": rng.randrange(10**9),
+                        "title": f"{rng.choice(TITLES)} ({index % 40})",
+                        "company": key,
+                        "location": rng.choice(LOCATIONS),
+                        "url": f"{self.base_url}/posting/{source}/{key}/{index}",
+                        # Free-form words keep descriptions apart for the near-duplicate check.
+                        "description": " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(8, 30)))
+                        + " "
+                        + " ".join(rng.choice(VOCABULARY) for _ in range(40)),
+                        "updated_at": "2024-06-01T00:00:00Z",
+                    }
+                    for index in range(self.jobs_per_source)
+                ]
+                self._boards[board_key] = jobs
+                self._by_id[board_key] = {job["id"]: job for job in jobs}
+        return jobs
+
+    def job_by_id(self, source: str, key: str, job_id: str) -> Optional[Dict[str, Any]]:
+        self.jobs_for(source, key)
+        try:
+            return self._by_id[f"{source}/{key}"].get(int(job_id))
+        except ValueError:
+            return None
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def delay(self) -> float:
+        with self.lock:
+            return self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "by_route": dict(self.requests),
+                "statuses": dict(self.statuses),
+                "bytes": self.bytes_sent,
+                "messages": self.messages,
+                "last_message_at": self.last_message_at,
+            }
+
+
+def _greenhouse(state: ReplayState, parts: List[str], query: Dict[str, List[str]]) -> Any:
+    token = parts[1]
+    if len(parts) >= 4:
+        job = state.job_by_id("greenhouse", token, parts[3])
+        return _greenhouse_job(job, with_content=True) if job else None
+    jobs = state.jobs_for("greenhouse", token)
+    with_content = query.get("content") == ["true"]
+    return {"jobs": [_greenhouse_job(job, with_content) for job in jobs], "meta": {"total": len(jobs)}}
+
+
+def _greenhouse_job(job: Dict[str, Any], with_content: bool) -> Dict[str, Any]:
+    record = {
+        "id": job["id"],
+        "title": job["title"],
+        "location": {"name": job["location"]},
+        "absolute_url": job["url"],
+        "updated_at": job["updated_at"],
+    }
+    if with_content:
+        record["content"] = job["description"].replace("<", "&lt;").replace(">", "&gt;")
+    return record
+
+
+def _lever(state: ReplayState, parts: List[str], query: Dict[str, List[str]]) -> Any:
+    company = parts[1]
+    jobs = state.jobs_for("lever", company)
+    skip = int((query.get("skip") or ["0"])[0])
+    limit = int((query.get("limit") or [str(len(jobs))])[0])
+    return [
+        {
+            "id": str(job["id"]),
+            "text": job["title"],
+            "categories": {"location": job["location"]},
+            "hostedUrl": job["url"],
+            "descriptionPlain": job["description"],
+            "createdAt": 1717200000000,
+        }
+        for job in jobs[skip : skip + limit]
+    ]
+
+
+def _external(state: ReplayState, parts: List[str], query: Dict[str, List[str]]) -> Any:
+    name = parts[1] if len(parts) > 1 else "feed"
+    jobs = state.jobs_for("external", name)
+    # Page numbers start at 1; ``cursor`` is the offset of the page.
+    limit = int((query.get("limit") or [str(len(jobs))])[0])
+    if "page" in query:
+        offset = (int(query["page"][0]) - 1) * limit
+    else:
+        offset = int((query.get("cursor") or query.get("offset") or ["0"])[0])
+    page = jobs[offset : offset + limit]
+    return {
+        "data": [{key: job[key] for key in ("title", "company", "location", "url", "description")} for job in page],
+        "meta": {"next": str(offset + limit) if offset + limit < len(jobs) else None},
+    }
+
+
+def _apify_get(state: ReplayState, parts: List[str], query: Dict[str, List[str]]) -> Any:
+    if parts[1] == "actor-runs":
+        started, dataset_id = state.runs.get(parts[2], (time.monotonic(), parts[2]))
+        remaining = started + state.run_secs - time.monotonic()
+        wait = float((query.get("waitForFinish") or ["0"])[0])
+        if remaining > 0 and wait > 0:
+            time.sleep(min(remaining, wait))
+            remaining = started + state.run_secs - time.monotonic()
+        status = "ABORTED" if parts[2] in state.aborted else "SUCCEEDED" if remaining <= 0 else "RUNNING"
+        return {"data": {"id": parts[2], "status": status, "defaultDatasetId": dataset_id}}
+    if parts[1] == "datasets":
+        jobs = state.jobs_for("apify", parts[2])
+        offset = int((query.get("offset") or ["0"])[0])
+        limit = int((query.get("limit") or [str(len(jobs))])[0])
+        return [
+            {
+                "title": job["title"],
+                "companyName": job["company"],
+                "location": job["location"],
+                "url": job["url"],
+                "jobDescription": job["description"],
+            }
+            for job in jobs[offset : offset + limit]
+        ]
+    return None
+
+
+# Routes mirror the real APIs under a prefix per service, so pointing the
+# ``API_BASE`` constants at ``http://127.0.0.1:<port>/<service>`` is enough:
+#
+#     /greenhouse/{token}/jobs[?content=true]   /greenhouse/{token}/jobs/{id}
+#     /lever/{company}?mode=json                /external/{name}
+#     /apify/acts/{actor}/runs (POST)           /apify/actor-runs/{id}?waitForFinish=N
+#     /apify/datasets/{id}/items?offset&limit   /apify/actor-runs/{id}/abort (POST)
+#     /telegram/bot{token}/sendMessage (POST)
+#     /posting/...                              /__stats
+#
+# With ``--fixtures DIR``, ``DIR/<path>.json`` (e.g. ``greenhouse/acme/jobs.json``)
+# is served as-is instead of synthetic data.
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ReplayServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _send(
+        self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None, etag: bool = False
+    ) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        if etag:
+            # Synthetic data never changes, so a content hash is a stable ETag
+            # and conditional GETs from the HTTP cache get their 304.
+            headers = {**(headers or {}), "ETag": '"%08x"' % zlib.crc32(body)}
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        if self.path.startswith("/__stats"):
+            # Polled by the benchmark while the bot runs; not part of the traffic.
+            return
+        state = self.server.state
+        with state.lock:
+            state.statuses[status] += 1
+            state.bytes_sent += len(body)
+
+    def _route(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        split = urlsplit(self.path)
+        parts = [part for part in split.path.split("/") if part]
+        state = self.server.state
+        if parts[:1] != ["__stats"]:
+            with state.lock:
+                state.requests[f"{self.command} {parts[0] if parts else '/'}"] += 1
+        return parts, parse_qs(split.query)
+
+    def _fixture(self, parts: List[str]) -> Any:
+        fixtures = self.server.state.fixtures
+        if not fixtures:
+            return None
+        path = os.path.join(fixtures, *parts) + ".json"
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def _prologue(self, parts: List[str]) -> bool:
+        """Apply latency and injected errors; ``False`` if the request was answered."""
+        state = self.server.state
+        if parts and parts[0] == "__stats":
+            return True
+        delay = state.delay()
+        if delay:
+            time.sleep(delay)
+        if state.should_fail():
+            self._send(503, {"error": "injected"}, {"Retry-After": "0"})
+            return False
+        return True
+
+    def do_HEAD(self) -> None:
+        parts, _ = self._route()
+        if self._prologue(parts):
+            self._send(200 if parts and parts[0] == "posting" else 404)
+
+    def do_GET(self) -> None:
+        parts, query = self._route()
+        if not parts or not self._prologue(parts):
+            return self._send(404) if not parts else None
+        state = self.server.state
+        if parts[0] == "__stats":
+            return self._send(200, state.stats())
+        if parts[0] == "posting":
+            return self._send(200, {})
+        payload = self._fixture(parts)
+        if payload is None:
+            handler = {"greenhouse": _greenhouse, "lever": _lever, "external": _external, "apify": _apify_get}.get(
+                parts[0]
+            )
+            payload = handler(state, parts, query) if handler and len(parts) > 1 else None
+        if payload is None:
+            return self._send(404, {"error": "not found"})
+        self._send(200, payload, etag=parts[0] in ("greenhouse", "lever"))
+
+    def do_POST(self) -> None:
+        parts, _ = self._route()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if not self._prologue(parts):
+            return
+        state = self.server.state
+        if parts[0] == "apify" and parts[1:2] == ["acts"]:
+            with state.lock:
+                run_id = f"run{len(state.runs)}"
+                payload = json.loads(body or b"{}")
+                dataset_id = re.sub(
+                    r"[^A-Za-z0-9]+", "-", f"{payload.get('searchQuery', 'q')}-{payload.get('locationQuery', '')}"
+                )
+                state.runs[run_id] = (time.monotonic(), dataset_id)
+            return self._send(201, {"data": {"id": run_id, "status": "RUNNING", "defaultDatasetId": dataset_id}})
+        if parts[0] == "apify" and parts[1:2] == ["actor-runs"] and parts[-1] == "abort":
+            with state.lock:
+                state.aborted.add(parts[2])
+            return self._send(200, {"data": {"id": parts[2], "status": "ABORTING"}})
+        if parts[0] == "telegram" and parts[-1] == "sendMessage":
+            with state.lock:
+                state.messages += 1
+                state.last_message_at = time.time()
+            return self._send(200, {"ok": True, "result": {}})
+        self._send(404, {"error": "not found"})
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, state: ReplayState, port: int = 0) -> None:
+        super().__init__(("127.0.0.1", port), ReplayHandler)
+        self.state = state
+        state.base_url = f"http://127.0.0.1:{self.server_port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor local que imita las APIs de las fuentes y de Telegram.")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--jobs-per-source", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos añadidos a cada respuesta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latencia extra aleatoria máxima")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    parser.add_argument("--run-secs", type=float, default=0.5, help="duración simulada de cada corrida de Apify")
+    parser.add_argument("--fixtures", help="directorio con respuestas grabadas")
+    args = parser.parse_args()
+
+    state = ReplayState(args.jobs_per_source, args.latency, args.jitter, args.error_rate, args.run_secs, args.fixtures)
+    server = ReplayServer(state, args.port)
+    print(state.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Circuit breakers that skip fetch endpoints which keep failing, kept across runs."""
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+
+DEFAULT_BREAKER_PATH = "breakers.sqlite3"
+DEFAULT_FAILURES = 3
+DEFAULT_COOLDOWN_SECS = 3600
+DEFAULT_MAX_COOLDOWN_SECS = 86400
+
+# (consecutive failures, open until)
+State = Tuple[int, float]
+
+
+class CircuitBreakers:
+    def __init__(
+        self,
+        path: str = DEFAULT_BREAKER_PATH,
+        failures: int = DEFAULT_FAILURES,
+        cooldown_secs: float = DEFAULT_COOLDOWN_SECS,
+        max_cooldown_secs: float = DEFAULT_MAX_COOLDOWN_SECS,
+    ) -> None:
+        self.failures = max(1, failures)
+        self.cooldown_secs = cooldown_secs
+        self.max_cooldown_secs = max(cooldown_secs, max_cooldown_secs)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS breakers ("
+            " endpoint TEXT PRIMARY KEY,"
+            " failures INTEGER NOT NULL,"
+            " open_until REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._states: Dict[str, State] = {
+            endpoint: (failures, open_until)
+            for endpoint, failures, open_until in self._conn.execute(
+                "SELECT endpoint, failures, open_until FROM breakers"
+            )
+        }
+        self._changed: Set[str] = set()
+
+    @classmethod
+    def from_config(cls, breaker_config: Optional[Dict]) -> Optional["CircuitBreakers"]:
+        breaker_config = breaker_config or {}
+        if not breaker_config.get("enabled", True):
+            return None
+        return cls(
+            breaker_config.get("path", DEFAULT_BREAKER_PATH),
+            int(breaker_config.get("failures", DEFAULT_FAILURES)),
+            float(breaker_config.get("cooldown_secs", DEFAULT_COOLDOWN_SECS)),
+            float(breaker_config.get("max_cooldown_secs", DEFAULT_MAX_COOLDOWN_SECS)),
+        )
+
+    def allow(self, endpoint: str) -> bool:
+        """Whether ``endpoint`` should be fetched now: its breaker is closed or due for a probe."""
+        with self._lock:
+            failures, open_until = self._states.get(endpoint, (0, 0.0))
+        return failures < self.failures or time.time() >= open_until
+
+    def record(self, endpoint: str, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                if endpoint in self._states:
+                    del self._states[endpoint]
+                    self._changed.add(endpoint)
+                return
+            failures = self._states.get(endpoint, (0, 0.0))[0] + 1
+            open_until = 0.0
+            if failures >= self.failures:
+                cooldown = self.cooldown_secs * 2 ** min(failures - self.failures, 16)
+                open_until = time.time() + min(cooldown, self.max_cooldown_secs)
+            self._states[endpoint] = (failures, open_until)
+            self._changed.add(endpoint)
+
+    def flush(self) -> None:
+        with self._lock, self._conn:
+            for endpoint in self._changed:
+                state = self._states.get(endpoint)
+                if state is None:
+                    self._conn.execute("DELETE FROM breakers WHERE endpoint = ?", (endpoint,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO breakers (endpoint, failures, open_until) VALUES (?, ?, ?)",
+                        (endpoint, *state),
+                    )
+            self._changed.clear()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,134 @@
+"""Optional process pool for the description rules of very large runs."""
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Pattern, Tuple
+
+from dedup import minhash
+from messaging import extract_keywords
+from normalize import html_to_text
+from profiles import Profile, ProfileMatcher
+from ranking import TermCounts, count_terms
+from sources.record import JobRecord, drop_description
+
+
+# Where the workers start paying for their start-up on four or more cores;
+# see benchmarks/bench_cpu_pool.py.
+DEFAULT_MIN_JOBS = 5000
+DEFAULT_CHUNK_SIZE = 500
+# Chunks in flight per worker before the parent waits for the oldest one.
+MAX_PENDING_PER_WORKER = 2
+
+# (task index, job, profile mask, rejection)
+Verdict = Tuple[int, Dict[str, str], int, Optional[str]]
+# (mask, rejection, keywords, signature, term counts) as computed by a worker.
+WorkerResult = Tuple[int, Optional[str], Optional[List[str]], Any, Optional[TermCounts]]
+
+_matcher: Optional[ProfileMatcher] = None
+_normalize = False
+_signatures = False
+_vocabulary: Optional[Pattern[str]] = None
+
+
+def _init_worker(
+    profile_entries: List[Tuple[str, Dict, List[str], Optional[int]]],
+    normalize: bool,
+    signatures: bool,
+    vocabulary: Optional[str],
+) -> None:
+    global _matcher, _normalize, _signatures, _vocabulary
+    _matcher = ProfileMatcher([Profile(*entry) for entry in profile_entries])
+    _normalize = normalize
+    _signatures = signatures
+    _vocabulary = re.compile(vocabulary) if vocabulary else None
+
+
+def _evaluate(chunk: List[Tuple[str, str, str]]) -> List[WorkerResult]:
+    results: List[WorkerResult] = []
+    for title, location, description in chunk:
+        if _normalize:
+            description = html_to_text(description)
+        mask, rejection = _matcher.match({"title": title, "location": location, "description": description})
+        if mask:
+            text = description
+            if not _normalize and (_vocabulary is not None or _signatures):
+                text = html_to_text(description)
+            terms = count_terms(_vocabulary, text) if _vocabulary is not None else None
+            signature = minhash(text, normalized=True) if _signatures else None
+            results.append((mask, None, extract_keywords(description), signature, terms))
+        else:
+            results.append((0, rejection, None, None, None))
+    return results
+
+
+class ParallelMatcher:
+    def __init__(
+        self,
+        matcher: ProfileMatcher,
+        pool_config: Dict,
+        normalize: bool = False,
+        signatures: bool = False,
+        vocabulary: Optional[Pattern[str]] = None,
+    ) -> None:
+        self.matcher = matcher
+        self.chunk_size = max(1, int(pool_config.get("chunk_size", DEFAULT_CHUNK_SIZE)))
+        workers = int(pool_config.get("workers") or 0) or os.cpu_count() or 1
+        profile_entries = [
+            (profile.name, profile.filter_config, profile.chat_ids, profile.limit) for profile in matcher.profiles
+        ]
+        # Spawned rather than forked: the fetch threads are still running and
+        # a fork would copy whatever locks they hold.
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(profile_entries, normalize, signatures, vocabulary.pattern if vocabulary is not None else None),
+        )
+        self._max_pending = workers * MAX_PENDING_PER_WORKER
+        self._chunk: List[Tuple[int, Dict[str, str]]] = []
+        self._pending: Deque[Tuple[Future, List[Tuple[int, Dict[str, str]]]]] = deque()
+
+    def submit(self, index: int, job: Dict[str, str]) -> Iterator[Verdict]:
+        """Queue ``job`` and yield the verdicts that are ready.
+
+        Shipped postings come back in submission order; a title or location
+        rejection is yielded at once.
+        """
+        mask, rejection = self.matcher.candidates(job.get("title") or "", job.get("location") or "")
+        if rejection is not None:
+            yield index, job, 0, rejection
+            return
+        self._chunk.append((index, job))
+        if len(self._chunk) >= self.chunk_size:
+            self._send()
+        while self._pending and (len(self._pending) > self._max_pending or self._pending[0][0].done()):
+            yield from self._collect()
+
+    def _send(self) -> None:
+        chunk, self._chunk = self._chunk, []
+        payload = [(job.get("title") or "", job.get("location") or "", job.get("description") or "") for _, job in chunk]
+        self._pending.append((self._pool.submit(_evaluate, payload), chunk))
+        # The worker has its own copy now; accepted records get their keywords back.
+        for _, job in chunk:
+            drop_description(job)
+
+    def _collect(self) -> Iterator[Verdict]:
+        future, chunk = self._pending.popleft()
+        for (index, job), (mask, rejection, keywords, signature, terms) in zip(chunk, future.result()):
+            if mask and isinstance(job, JobRecord):
+                job.description = " ".join(keywords)
+                job.signature = signature
+                job.terms = terms
+            yield index, job, mask, rejection
+
+    def finish(self) -> Iterator[Verdict]:
+        """Yield the verdicts of everything still queued."""
+        if self._chunk:
+            self._send()
+        while self._pending:
+            yield from self._collect()
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
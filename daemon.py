@@ -0,0 +1,176 @@
+"""Long-running mode: poll every source on its own interval."""
+import heapq
+import logging
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fetcher import FetchTask
+from main import load_config, run_once
+from runtime import Runtime
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVALS = {
+    "greenhouse": 900,
+    "lever": 900,
+    "external": 1800,
+    "apify_indeed": 3600,
+}
+DEFAULT_INTERVAL = 1800
+DEFAULT_JITTER = 0.1
+DEFAULT_CONFIG_CHECK_SECS = 5
+DEFAULT_MAINTENANCE_SECS = 3600
+
+TaskKey = Tuple[str, str]
+
+
+def _task_key(task: FetchTask) -> TaskKey:
+    return (task.source, task.key)
+
+
+def _interval_for(task: FetchTask, daemon_config: Dict) -> float:
+    """Seconds between polls of ``task``.
+
+    ``overrides`` is keyed by ``"<source>:<key>"`` (e.g. ``greenhouse:stripe``)
+    and wins over the per-source ``intervals``.
+    """
+    overrides = daemon_config.get("overrides") or {}
+    override = overrides.get(f"{task.source}:{task.key}")
+    if override is not None:
+        return float(override)
+    intervals = {**DEFAULT_INTERVALS, **(daemon_config.get("intervals") or {})}
+    return float(intervals.get(task.source, DEFAULT_INTERVAL))
+
+
+def _next_due(task: FetchTask, daemon_config: Dict, now: float) -> float:
+    interval = _interval_for(task, daemon_config)
+    jitter = float(daemon_config.get("jitter", DEFAULT_JITTER))
+    return now + interval * (1 + random.uniform(-jitter, jitter))
+
+
+def _config_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class _Schedule:
+    """Min-heap of next-due times keyed by task."""
+
+    def __init__(self) -> None:
+        self.tasks: Dict[TaskKey, FetchTask] = {}
+        self._due: Dict[TaskKey, float] = {}
+        self._heap: List[Tuple[float, TaskKey]] = []
+
+    def replace_tasks(self, tasks: List[FetchTask], now: float) -> None:
+        """Swap in a new task list; tasks already scheduled keep their due time."""
+        self.tasks = {_task_key(task): task for task in tasks}
+        self._due = {key: self._due.get(key, now) for key in self.tasks}
+        self._heap = [(due, key) for key, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def set_due(self, key: TaskKey, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+
+    def next_due(self) -> Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[FetchTask]:
+        due_tasks: List[FetchTask] = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, key = heapq.heappop(self._heap)
+            due_tasks.append(self.tasks[key])
+        return due_tasks
+
+    def _drop_stale(self) -> None:
+        # Rescheduling pushes a new entry instead of updating in place.
+        while self._heap:
+            due, key = self._heap[0]
+            if key in self.tasks and self._due.get(key) == due:
+                return
+            heapq.heappop(self._heap)
+
+
+def _reload_if_changed(
+    config_path: str, config_mtime: Optional[float], runtime: Runtime, schedule: _Schedule
+) -> Optional[float]:
+    """Reload ``config_path`` into ``runtime`` and ``schedule`` if its mtime is no longer ``config_mtime``.
+
+    Returns the new mtime, or ``None`` if the file did not change. A config
+    that fails to load leaves the previous one in place.
+    """
+    mtime = _config_mtime(config_path)
+    if mtime is None or mtime == config_mtime:
+        return None
+    try:
+        runtime.apply_config(load_config(config_path))
+    except Exception:
+        logger.exception("No se pudo recargar %s; se mantiene la configuración anterior", config_path)
+    else:
+        schedule.replace_tasks(runtime.build_tasks(), time.time())
+        logger.info("Configuración recargada: %d tareas programadas", len(schedule.tasks))
+    return mtime
+
+
+def run_daemon(config_path: str) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = load_config(config_path)
+    runtime = Runtime(config)
+    schedule = _Schedule()
+    schedule.replace_tasks(runtime.build_tasks(), time.time())
+    config_mtime = _config_mtime(config_path)
+    last_maintenance = time.monotonic()
+    logger.info("Modo daemon: %d tareas programadas", len(schedule.tasks))
+
+    try:
+        while True:
+            daemon_config = runtime.config.get("daemon") or {}
+            check_secs = float(daemon_config.get("config_check_secs", DEFAULT_CONFIG_CHECK_SECS))
+
+            reloaded_mtime = _reload_if_changed(config_path, config_mtime, runtime, schedule)
+            if reloaded_mtime is not None:
+                config_mtime = reloaded_mtime
+                continue
+
+            now = time.time()
+            due_tasks = schedule.pop_due(now)
+            if due_tasks:
+                try:
+                    run_once(runtime, due_tasks)
+                except Exception:
+                    logger.exception("Falló el ciclo de %d tareas", len(due_tasks))
+                finished = time.time()
+                for task in due_tasks:
+                    schedule.set_due(_task_key(task), _next_due(task, daemon_config, finished))
+
+            maintenance_secs = float(daemon_config.get("maintenance_secs", DEFAULT_MAINTENANCE_SECS))
+            if time.monotonic() - last_maintenance >= maintenance_secs:
+                last_maintenance = time.monotonic()
+                runtime.link_cache.prune()
+                runtime.outbox.prune()
+                if runtime.response_cache is not None:
+                    runtime.response_cache.prune()
+                if runtime.normalizer is not None:
+                    runtime.normalizer.prune()
+                if runtime.watermarks is not None:
+                    runtime.watermarks.prune()
+                if runtime.archive is not None:
+                    runtime.archive.prune()
+                for store in runtime.seen_stores.values():
+                    if store.expire_days:
+                        store.expire(store.expire_days)
+
+            next_due = schedule.next_due()
+            sleep_for = check_secs if next_due is None else min(check_secs, next_due - time.time())
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+    except KeyboardInterrupt:
+        logger.info("Deteniendo el daemon")
+    finally:
+        runtime.close()
@@ -0,0 +1,368 @@
+"""Cross-source duplicate detection by canonical URL, fingerprint and MinHash signature."""
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+from filters import fold_text
+from normalize import html_to_text
+from sources.record import JobRecord, signature_of
+
+
+DEFAULT_DEDUP_PATH = "dedup.sqlite3"
+DEFAULT_EXPIRE_DAYS = 90
+DEFAULT_THRESHOLD = 0.8
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 10
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "refid", "referrer", "source", "src", "trk",
+    "trackingid", "from", "lever-source", "lever-origin", "gh_src", "utm", "sid", "tk", "vjs", "rsltid",
+}
+TRACKING_PREFIXES = ("utm_", "lever-source", "_hs", "mkt_")
+REDIRECT_PARAMS = ("url", "u", "dest", "destination", "redirect", "redirect_url", "target", "link")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(_MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_WORD = re.compile(r"[a-z0-9]+")
+_COMPANY_SUFFIXES = re.compile(
+    r"\b(inc|llc|ltd|corp|corporation|co|company|gmbh|sa de cv|s de rl de cv|sapi de cv|sa|sas|srl|plc)\b\.?"
+)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_LINKEDIN_VIEW = re.compile(r"/jobs/view/(?:[^/]*-)?(\d+)")
+_GREENHOUSE_JOB = re.compile(r"/jobs/(\d+)")
+_LEVER_POSTING = re.compile(r"^/([^/]+)/([0-9a-f-]{36})")
+
+
+def _unwrap_redirect(parts) -> Optional[str]:
+    for key, value in parse_qsl(parts.query, keep_blank_values=True):
+        if key.lower() in REDIRECT_PARAMS:
+            target = unquote(value) if "%" in value else value
+            if target.startswith(("http://", "https://")):
+                return target
+    return None
+
+
+def canonical_url(url: str, _depth: int = 0) -> str:
+    """Reduce ``url`` to a key shared by every URL of the same posting."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    if _depth < 3:
+        target = _unwrap_redirect(parts)
+        if target:
+            return canonical_url(target, _depth + 1)
+
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    lowered = {key.lower(): value for key, value in params}
+
+    # Greenhouse job ids are global: board pages, embedded boards and company
+    # career pages with ``gh_jid`` all point to the same posting.
+    if lowered.get("gh_jid", "").isdigit():
+        return f"greenhouse:{lowered['gh_jid']}"
+    if host.endswith("greenhouse.io"):
+        match = _GREENHOUSE_JOB.search(path)
+        if match:
+            return f"greenhouse:{match.group(1)}"
+    if host == "jobs.lever.co":
+        match = _LEVER_POSTING.match(path)
+        if match:
+            return f"lever:{match.group(2)}"
+    if host.endswith("indeed.com") or ".indeed." in host or host.startswith("indeed."):
+        if lowered.get("jk"):
+            return f"indeed:{lowered['jk']}"
+    if host.endswith("linkedin.com"):
+        if lowered.get("currentjobid", "").isdigit():
+            return f"linkedin:{lowered['currentjobid']}"
+        match = _LINKEDIN_VIEW.search(path)
+        if match:
+            return f"linkedin:{match.group(1)}"
+
+    kept = sorted(
+        (key, value)
+        for key, value in params
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(kept), ""))
+
+
+def _normalize(text: str) -> str:
+    return _NON_ALNUM.sub(" ", fold_text(text or "")).strip()
+
+
+def fingerprint(job: Dict[str, str]) -> Optional[str]:
+    """Hash of the normalized title, company and city, or ``None`` if one is missing."""
+    title = _normalize(job.get("title") or "")
+    company = _NON_ALNUM.sub("", _COMPANY_SUFFIXES.sub(" ", _normalize(job.get("company") or "")))
+    # Sources disagree on everything after the city ("Nuevo León", "N.L.", "MX").
+    city = _normalize((job.get("location") or "").split(",")[0])
+    if not title or not company:
+        return None
+    return hashlib.sha1(f"{title}|{company}|{city}".encode("utf-8")).hexdigest()
+
+
+def _shingles(text: str) -> Set[int]:
+    words = _WORD.findall(text)
+    return {
+        zlib.crc32(" ".join(words[index : index + SHINGLE_SIZE]).encode("utf-8"))
+        for index in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(description: str, normalized: bool = False) -> Optional[array]:
+    """MinHash signature of the description's word shingles, or ``None`` if too short.
+
+    ``normalized`` says the description already went through ``html_to_text``.
+    """
+    shingles = _shingles(description if normalized else html_to_text(description))
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    return array(
+        "Q", (min((a * value + b) % _MERSENNE_PRIME for value in shingles) for a, b in _PERMUTATIONS)
+    )
+
+
+def _bands(signature: array) -> List[str]:
+    return [
+        f"{band}:{hash(tuple(signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]))}"
+        for band in range(BANDS)
+    ]
+
+
+def _similarity(left: array, right: array) -> float:
+    return sum(1 for a, b in zip(left, right) if a == b) / NUM_PERMUTATIONS
+
+
+class _Claims:
+    """The profiles each copy of one posting goes out to in this run, and the copies held back."""
+
+    __slots__ = ("members", "settled", "held")
+
+    def __init__(self) -> None:
+        self.members: Dict[str, int] = {}
+        # Profiles whose copy was reported: nothing held for them is needed anymore.
+        self.settled = 0
+        self.held: List[Tuple[Dict[str, str], int]] = []
+
+    def claimed(self) -> int:
+        mask = self.settled
+        for bits in self.members.values():
+            mask |= bits
+        return mask
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        path: str = DEFAULT_DEDUP_PATH,
+        expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> None:
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_keys ("
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " seen_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_signatures ("
+            " url TEXT PRIMARY KEY,"
+            " signature BLOB NOT NULL,"
+            " seen_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        if expire_days:
+            cutoff = time.time() - float(expire_days) * 86400
+            with self._conn:
+                self._conn.execute("DELETE FROM dedup_keys WHERE seen_at < ?", (cutoff,))
+                self._conn.execute("DELETE FROM dedup_signatures WHERE seen_at < ?", (cutoff,))
+
+        self._keys: Dict[Tuple[str, str], str] = {
+            (kind, key): url for kind, key, url in self._conn.execute("SELECT kind, key, url FROM dedup_keys")
+        }
+        self._signatures: Dict[str, array] = {}
+        self._buckets: Dict[str, List[str]] = {}
+        for url, blob in self._conn.execute("SELECT url, signature FROM dedup_signatures"):
+            signature = array("Q")
+            signature.frombytes(blob)
+            self._index_signature(url, signature)
+        # Keys of jobs admitted in this run, persisted by ``record``.
+        self._pending: Dict[str, Tuple[List[Tuple[str, str]], Optional[array]]] = {}
+        # Claims of this run by original URL, and the original each claiming URL belongs to.
+        self._claims: Dict[str, _Claims] = {}
+        self._claimed_by: Dict[str, str] = {}
+
+    @classmethod
+    def from_config(cls, dedup_config: Optional[Dict]) -> Optional["DedupIndex"]:
+        dedup_config = dedup_config or {}
+        if not dedup_config.get("enabled", True):
+            return None
+        return cls(
+            dedup_config.get("path", DEFAULT_DEDUP_PATH),
+            dedup_config.get("expire_days", DEFAULT_EXPIRE_DAYS),
+            float(dedup_config.get("threshold", DEFAULT_THRESHOLD)),
+        )
+
+    def _index_signature(self, url: str, signature: array) -> None:
+        self._signatures[url] = signature
+        for band in _bands(signature):
+            self._buckets.setdefault(band, []).append(url)
+
+    def _near_duplicate(self, signature: array) -> Optional[str]:
+        checked: Set[str] = set()
+        for band in _bands(signature):
+            for url in self._buckets.get(band, ()):
+                if url in checked:
+                    continue
+                checked.add(url)
+                if _similarity(signature, self._signatures[url]) >= self.threshold:
+                    return url
+        return None
+
+    def prepare(self, job: Dict[str, str], normalized: bool = False) -> None:
+        """Compute the description signature of a ``JobRecord`` before its
+        description is released."""
+        if isinstance(job, JobRecord) and job.signature is None:
+            job.signature = minhash(job.description, normalized)
+
+    def duplicate_of(self, job: Dict[str, str]) -> Optional[str]:
+        """Return the URL ``job`` duplicates, or index it and return ``None``."""
+        url = job.get("url") or ""
+        keys = [("url", canonical_url(url))]
+        job_fingerprint = fingerprint(job)
+        if job_fingerprint:
+            keys.append(("fingerprint", job_fingerprint))
+        signature = signature_of(job)
+        if signature is None:
+            signature = minhash(job.get("description") or "")
+        with self._lock:
+            for key in keys:
+                if key[1] and key in self._keys:
+                    return self._keys[key]
+            if signature is not None:
+                original = self._near_duplicate(signature)
+                if original is not None:
+                    return original
+            for key in keys:
+                if key[1]:
+                    self._keys[key] = url
+            if signature is not None:
+                self._index_signature(url, signature)
+            self._pending[url] = (keys, signature)
+        return None
+
+    def _claim(self, original: str, url: str, mask: int) -> None:
+        claims = self._claims.setdefault(original, _Claims())
+        claims.members[url] = claims.members.get(url, 0) | mask
+        self._claimed_by[url] = original
+
+    def claim(self, url: str, mask: int) -> None:
+        """Note that ``url``, just admitted, goes out to the profiles in ``mask``."""
+        with self._lock:
+            self._claim(url, url, mask)
+
+    def unclaimed(self, original: str, job: Dict[str, str], mask: int) -> int:
+        """Profiles of ``mask`` no other copy of ``original`` goes out to in this run.
+
+        ``job`` claims them; for the others it is held back until ``release``
+        says the copy they got has a broken link.
+        """
+        with self._lock:
+            claims = self._claims.setdefault(original, _Claims())
+            taken = mask & claims.claimed()
+            if taken & ~claims.settled:
+                claims.held.append((job, taken & ~claims.settled))
+            if mask & ~taken:
+                self._claim(original, job.get("url") or "", mask & ~taken)
+            return mask & ~taken
+
+    def release(self, url: str) -> List[Tuple[Dict[str, str], int]]:
+        """Drop the claim of ``url``, whose link is broken, and return the held copies that take its profiles."""
+        with self._lock:
+            original = self._claimed_by.pop(url, None)
+            if original is None:
+                return []
+            claims = self._claims[original]
+            claims.members.pop(url, None)
+            free = ~claims.claimed()
+            released: List[Tuple[Dict[str, str], int]] = []
+            held: List[Tuple[Dict[str, str], int]] = []
+            for job, bits in claims.held:
+                given = bits & free
+                if given:
+                    released.append((job, given))
+                    self._claim(original, job.get("url") or "", given)
+                    free &= ~given
+                if bits & ~given:
+                    held.append((job, bits & ~given))
+            claims.held = held
+            return released
+
+    def drop_duplicates(self, jobs: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+        return [job for job in jobs if self.duplicate_of(job) is None]
+
+    def record(self, urls: Iterable[str]) -> None:
+        """Persist the keys of the admitted jobs in ``urls``."""
+        now = time.time()
+        with self._lock, self._conn:
+            for url in urls:
+                original = self._claimed_by.get(url)
+                if original is not None:
+                    claims = self._claims[original]
+                    claims.settled |= claims.members.get(url, 0)
+                    claims.held = [(job, bits & ~claims.settled) for job, bits in claims.held if bits & ~claims.settled]
+                entry = self._pending.pop(url, None)
+                if entry is None:
+                    continue
+                keys, signature = entry
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO dedup_keys (kind, key, url, seen_at) VALUES (?, ?, ?, ?)",
+                    ((kind, key, url, now) for kind, key in keys if key),
+                )
+                if signature is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO dedup_signatures (url, signature, seen_at) VALUES (?, ?, ?)",
+                        (url, signature.tobytes(), now),
+                    )
+
+    def forget_pending(self) -> None:
+        """Drop in-memory keys of admitted jobs that were never recorded."""
+        with self._lock:
+            for url, (keys, signature) in self._pending.items():
+                for key in keys:
+                    if self._keys.get(key) == url:
+                        del self._keys[key]
+                if signature is not None and self._signatures.get(url) is signature:
+                    del self._signatures[url]
+                    for band in _bands(signature):
+                        bucket = self._buckets.get(band)
+                        if bucket and url in bucket:
+                            bucket.remove(url)
+            self._pending.clear()
+            self._claims.clear()
+            self._claimed_by.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,406 @@
+"""Concurrent fan-out over every configured board, capped per host and per deadline."""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from archive import JobArchive
+from breakers import CircuitBreakers
+from filters import CompiledFilter
+import http_client
+import metrics
+from http_cache import ResponseCache
+from profiles import ProfileMatcher
+from sources import apify_indeed, greenhouse, lever
+from sources.apify_indeed import fetch_apify_indeed_query
+from sources.external import PAGINATION_STYLES, fetch_external_source
+from sources.greenhouse import fetch_greenhouse_board
+from sources.lever import fetch_lever_company
+from watermarks import WatermarkStore
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_PER_HOST = 4
+DEFAULT_QUEUE_SIZE = 1000
+
+_TASK_DONE = object()
+
+# Fetch tasks submitted and not finished yet, including the ones a cut-short
+# ``stream_tasks`` leaves running.
+_running = 0
+_idle = threading.Condition()
+
+
+def _task_submitted() -> None:
+    global _running
+    with _idle:
+        _running += 1
+
+
+def _task_finished(_future: Any = None) -> None:
+    global _running
+    with _idle:
+        _running -= 1
+        if not _running:
+            _idle.notify_all()
+
+
+def wait_idle(timeout: Optional[float] = None) -> bool:
+    """Wait until no fetch task is running; ``False`` if ``timeout`` seconds pass first.
+
+    Stores the tasks write to (response cache, archive, breakers...) are only
+    safe to close once the tasks left running after a deadline cut are done.
+    """
+    with _idle:
+        return _idle.wait_for(lambda: not _running, timeout)
+
+
+@dataclass
+class FetchTask:
+    source: str
+    key: str
+    host: str
+    func: Callable[..., Iterable[Dict[str, str]]]
+    args: Tuple[Any, ...] = ()
+    # Spends most of its time waiting on a long-poll (Apify runs); runs on its
+    # own threads instead of holding one of the ``max_workers``.
+    long_running: bool = False
+
+
+@dataclass
+class ConcurrencySettings:
+    max_workers: int = DEFAULT_MAX_WORKERS
+    per_host: int = DEFAULT_PER_HOST
+    hosts: Dict[str, int] = field(default_factory=dict)
+    queue_size: int = DEFAULT_QUEUE_SIZE
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "ConcurrencySettings":
+        config = config or {}
+        hosts = {str(host): max(1, int(limit)) for host, limit in (config.get("hosts") or {}).items()}
+        return cls(
+            max_workers=max(1, int(config.get("max_workers", DEFAULT_MAX_WORKERS))),
+            per_host=max(1, int(config.get("per_host", DEFAULT_PER_HOST))),
+            hosts=hosts,
+            queue_size=max(1, int(config.get("queue_size", DEFAULT_QUEUE_SIZE))),
+        )
+
+    def limit_for(self, host: str) -> int:
+        return self.hosts.get(host, self.per_host)
+
+
+@dataclass
+class DeadlineSettings:
+    run_secs: Optional[float] = None
+    sources: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "DeadlineSettings":
+        config = config or {}
+        run_secs = config.get("run_secs")
+        sources = {str(source): float(secs) for source, secs in (config.get("sources") or {}).items() if secs}
+        return cls(run_secs=float(run_secs) if run_secs else None, sources=sources)
+
+    def budget_for(self, source: str) -> Optional[float]:
+        """Seconds from the start of the fetch that ``source`` may use, or ``None`` when unbounded."""
+        budgets = [secs for secs in (self.sources.get(source), self.run_secs) if secs is not None]
+        return min(budgets) if budgets else None
+
+
+def _host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def build_tasks(
+    config: Dict,
+    apify_token: Optional[str],
+    response_cache: Optional[ResponseCache] = None,
+    job_filter: Union[CompiledFilter, ProfileMatcher, None] = None,
+    watermarks: Optional[WatermarkStore] = None,
+    known: Optional[Callable[[str], bool]] = None,
+    archive: Optional[JobArchive] = None,
+) -> List[FetchTask]:
+    """Turn the configured sources into fetch tasks.
+
+    ``job_filter`` (a single filter or the matcher of every profile) enables
+    the two-phase Greenhouse fetch (see ``fetch_greenhouse_board``) unless
+    ``greenhouse.two_phase`` is false. ``watermarks`` lets that fetch skip
+    postings already rejected and ``known(url)`` those every profile already
+    received or has queued, and gives ``archive`` the postings it prefilters.
+    """
+    tasks: List[FetchTask] = []
+    greenhouse_config = config.get("greenhouse") or {}
+    if not greenhouse_config.get("two_phase", True):
+        job_filter = None
+    hydrate_workers = int(greenhouse_config.get("hydrate_workers", greenhouse.DEFAULT_HYDRATE_WORKERS))
+    greenhouse_host = _host_of(greenhouse.API_BASE)
+    for token in config.get("greenhouse_tokens") or []:
+        tasks.append(
+            FetchTask(
+                "greenhouse",
+                str(token),
+                greenhouse_host,
+                fetch_greenhouse_board,
+                (token, response_cache, job_filter, hydrate_workers, watermarks, known, archive),
+            )
+        )
+
+    lever_config = config.get("lever") or {}
+    lever_pages = (
+        int(lever_config.get("page_size", lever.DEFAULT_PAGE_SIZE)),
+        int(lever_config.get("max_pages", lever.DEFAULT_MAX_PAGES)),
+        int(lever_config.get("page_workers", lever.DEFAULT_PAGE_WORKERS)),
+    )
+    lever_host = _host_of(lever.API_BASE)
+    for company in config.get("lever_companies") or []:
+        tasks.append(
+            FetchTask("lever", str(company), lever_host, fetch_lever_company, (company, response_cache, *lever_pages))
+        )
+
+    for source in config.get("external_sources") or []:
+        endpoint = source.get("endpoint")
+        if not endpoint:
+            continue
+        key = source.get("name") or endpoint
+        style = (source.get("pagination") or {}).get("style", "page")
+        if style not in PAGINATION_STYLES:
+            # A task would fail on every run and open the host's breaker.
+            logger.warning("Se omite la fuente %s: estilo de paginación desconocido %r", key, style)
+            continue
+        tasks.append(FetchTask("external", str(key), _host_of(endpoint), fetch_external_source, (source,)))
+
+    apify_config = config.get("apify_indeed") or {}
+    if apify_token and apify_config:
+        apify_host = _host_of(apify_indeed.APIFY_BASE_URL)
+        for query in apify_config.get("queries") or []:
+            if not isinstance(query, dict) or not query.get("query"):
+                continue
+            key = f"{query.get('query')}|{query.get('location') or ''}"
+            tasks.append(
+                FetchTask(
+                    "apify_indeed",
+                    key,
+                    apify_host,
+                    fetch_apify_indeed_query,
+                    (query, apify_config, apify_token),
+                    long_running=True,
+                )
+            )
+    return tasks
+
+
+class _HostScheduler:
+    """Submits tasks to the pool while respecting the per-host cap.
+
+    Tasks over the cap wait in a per-host queue instead of occupying a worker,
+    so a slow host never starves the others of threads. Long-running tasks go
+    to ``wait_pool`` so their waits never hold a worker of ``pool``.
+    """
+
+    def __init__(
+        self,
+        pool: ThreadPoolExecutor,
+        settings: ConcurrencySettings,
+        runner: Callable[[int, FetchTask], None],
+        wait_pool: Optional[ThreadPoolExecutor] = None,
+    ):
+        self._pool = pool
+        self._wait_pool = wait_pool or pool
+        self._settings = settings
+        self._runner = runner
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+        self._pending: Dict[str, Deque[Tuple[int, FetchTask]]] = {}
+        self._closed = False
+
+    def start(self, tasks: List[FetchTask]) -> None:
+        for item in enumerate(tasks):
+            self._enqueue(item)
+
+    def close(self) -> None:
+        """Drop every task that has not started yet."""
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+
+    def _enqueue(self, item: Tuple[int, FetchTask]) -> None:
+        host = item[1].host
+        with self._lock:
+            if self._active.get(host, 0) < self._settings.limit_for(host):
+                self._active[host] = self._active.get(host, 0) + 1
+                start = True
+            else:
+                self._pending.setdefault(host, deque()).append(item)
+                start = False
+        if start:
+            self._start(item)
+
+    def borrow(self, host: str) -> bool:
+        """Take a free slot of ``host`` for a request a running task makes in parallel."""
+        with self._lock:
+            if self._closed or self._active.get(host, 0) >= self._settings.limit_for(host):
+                return False
+            self._active[host] = self._active.get(host, 0) + 1
+            return True
+
+    def give_back(self, host: str) -> None:
+        self._finish(host)
+
+    def _start(self, item: Tuple[int, FetchTask]) -> None:
+        pool = self._wait_pool if item[1].long_running else self._pool
+        _task_submitted()
+        try:
+            future = pool.submit(self._runner, *item)
+        except RuntimeError:
+            _task_finished()
+            raise
+        future.add_done_callback(_task_finished)
+        future.add_done_callback(lambda _future, host=item[1].host: self._finish(host))
+
+    def _finish(self, host: str) -> None:
+        with self._lock:
+            waiting = self._pending.get(host)
+            next_item = waiting.popleft() if waiting and not self._closed else None
+            if next_item is None:
+                self._active[host] -= 1
+        if next_item is not None:
+            self._start(next_item)
+
+
+class _HostSlots:
+    """The spare slots of one host, as lent to a task's request scope."""
+
+    def __init__(self, scheduler: _HostScheduler, host: str) -> None:
+        self._scheduler = scheduler
+        self._host = host
+
+    def try_acquire(self) -> bool:
+        return self._scheduler.borrow(self._host)
+
+    def release(self) -> None:
+        self._scheduler.give_back(self._host)
+
+
+def endpoint_of(task: FetchTask) -> str:
+    return f"{task.source}:{task.key}"
+
+
+def stream_tasks(
+    tasks: List[FetchTask],
+    settings: Optional[ConcurrencySettings] = None,
+    deadline: Optional[DeadlineSettings] = None,
+    breakers: Optional[CircuitBreakers] = None,
+) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield ``(task index, job)`` pairs as soon as any task produces them.
+
+    Jobs of one task keep their order, jobs of different tasks interleave.
+    Workers hand jobs over through a queue of ``queue_size`` items, so a fast
+    source waits for the consumer instead of piling jobs up in memory.
+    Sorting by task index restores the sequential order.
+
+    A task that raises, or whose requests all failed, counts against the
+    breaker of its endpoint. A task that runs out of its ``deadline`` budget
+    keeps the jobs it already produced.
+    """
+    settings = settings or ConcurrencySettings()
+    deadline = deadline or DeadlineSettings()
+    if not tasks:
+        return
+    started_at = time.monotonic()
+    run_deadline = started_at + deadline.run_secs if deadline.run_secs is not None else None
+    results: "queue.Queue[Tuple[int, Any]]" = queue.Queue(maxsize=settings.queue_size)
+    stop = threading.Event()
+
+    def _put(item: Tuple[int, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _skip(index: int, task: FetchTask, reason: str) -> None:
+        metrics.incr("sources_skipped_total", source=task.source, reason=reason)
+        _put((index, _TASK_DONE))
+
+    def _run(index: int, task: FetchTask) -> None:
+        budget = deadline.budget_for(task.source)
+        task_deadline = started_at + budget if budget is not None else None
+        if task_deadline is not None and time.monotonic() >= task_deadline:
+            _skip(index, task, "deadline")
+            return
+        endpoint = endpoint_of(task)
+        if breakers is not None and not breakers.allow(endpoint):
+            _skip(index, task, "circuit_open")
+            return
+        started = time.perf_counter()
+        waited = 0.0
+        count = 0
+        error = None
+        jobs: Iterable[Dict[str, str]] = ()
+        with http_client.request_scope(task_deadline, _HostSlots(scheduler, task.host)) as scope:
+            try:
+                jobs = task.func(*task.args) or ()
+                for job in jobs:
+                    put_started = time.perf_counter()
+                    if not _put((index, job)):
+                        return
+                    # Time spent waiting for the consumer is not the source's latency.
+                    waited += time.perf_counter() - put_started
+                    count += 1
+                    if task_deadline is not None and time.monotonic() >= task_deadline:
+                        error = "deadline"
+                        break
+            except Exception as exc:
+                error = type(exc).__name__
+            finally:
+                # A generator cut short releases its response now.
+                close = getattr(jobs, "close", None)
+                if close is not None:
+                    close()
+                metrics.record_source(task.source, task.key, time.perf_counter() - started - waited, count, error)
+                if breakers is not None:
+                    failed = error not in (None, "deadline") or (scope.failed > 0 and not scope.succeeded)
+                    breakers.record(endpoint, not failed)
+                _put((index, _TASK_DONE))
+
+    pool = ThreadPoolExecutor(max_workers=settings.max_workers)
+    # Threads are only created when needed; the per-host cap bounds them.
+    wait_hosts = {task.host for task in tasks if task.long_running}
+    wait_pool = (
+        ThreadPoolExecutor(max_workers=sum(settings.limit_for(host) for host in wait_hosts), thread_name_prefix="wait")
+        if wait_hosts
+        else None
+    )
+    scheduler = _HostScheduler(pool, settings, _run, wait_pool)
+    remaining = len(tasks)
+    try:
+        scheduler.start(tasks)
+        while remaining:
+            timeout = max(0.0, run_deadline - time.monotonic()) if run_deadline is not None else None
+            try:
+                index, job = results.get(timeout=timeout)
+            except queue.Empty:
+                # Out of time: the caller reports whatever arrived.
+                metrics.incr("sources_cut_total", remaining)
+                break
+            if job is _TASK_DONE:
+                remaining -= 1
+                continue
+            yield index, job
+    finally:
+        stop.set()
+        scheduler.close()
+        # Tasks still running have their requests bounded by the deadline.
+        for executor in (pool, wait_pool):
+            if executor is not None:
+                executor.shutdown(wait=not remaining, cancel_futures=bool(remaining))
+
@@ -1,17 +1,104 @@
 import re
-from typing import Dict, List
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Dict, List, Optional, Pattern, Tuple
 
 import requests
 
+from http_client import get_client
+from link_cache import LinkCache
+import metrics
 
-def ok_link(url: str) -> bool:
-    if not url:
-        return False
+
+DEFAULT_LINK_WORKERS = 16
+DEFAULT_LINK_TIMEOUT = 10
+DEFAULT_LINK_TIME_BUDGET = 60
+
+
+def _is_ok_status(status_code: int) -> bool:
+    return 200 <= status_code < 400
+
+
+def check_link(url: str, timeout: float = DEFAULT_LINK_TIMEOUT) -> int:
+    """Return the final HTTP status of ``url`` or 0 if it could not be reached."""
+    status = 0
+    try:
+        response = get_client().head(url, allow_redirects=True, timeout=timeout)
+        status = response.status_code
+        if _is_ok_status(status):
+            return status
+    except requests.RequestException:
+        pass
+    # Many job boards reject or mishandle HEAD, so confirm with a GET that
+    # only reads the status line and headers, never the page body.
     try:
-        response = requests.get(url, allow_redirects=True, timeout=15)
-        return 200 <= response.status_code < 400
+        with get_client().get(url, allow_redirects=True, timeout=timeout, stream=True) as response:
+            return response.status_code
     except requests.RequestException:
+        return status
+
+
+def ok_link(url: str, timeout: float = DEFAULT_LINK_TIMEOUT, cache: Optional[LinkCache] = None) -> bool:
+    if not url:
         return False
+    if cache is not None:
+        cached = cache.get(url)
+        if cached is not None:
+            return cached
+    status = check_link(url, timeout)
+    ok = _is_ok_status(status)
+    if cache is not None:
+        cache.put(url, ok, status)
+    return ok
+
+
+def validate_links(
+    jobs: List[Dict[str, str]], link_config: Optional[Dict] = None, cache: Optional[LinkCache] = None
+) -> List[Dict[str, str]]:
+    """Keep the jobs whose link responds, checking them on a worker pool.
+
+    Each distinct URL is checked once, and answered from ``cache`` when it has
+    a fresh verdict. Links still pending when the ``time_budget`` (seconds)
+    runs out are treated as not validated; they were never marked as seen, so
+    the next run checks them again.
+    """
+    link_config = link_config or {}
+    workers = max(1, int(link_config.get("workers", DEFAULT_LINK_WORKERS)))
+    timeout = float(link_config.get("timeout", DEFAULT_LINK_TIMEOUT))
+    time_budget = float(link_config.get("time_budget", DEFAULT_LINK_TIME_BUDGET))
+
+    urls = list(dict.fromkeys(job.get("url") or "" for job in jobs))
+    urls = [url for url in urls if url]
+    if not urls:
+        return []
+
+    results: Dict[str, bool] = {}
+    if cache is not None:
+        for url in urls:
+            cached = cache.get(url)
+            if cached is not None:
+                results[url] = cached
+        urls = [url for url in urls if url not in results]
+        metrics.incr("link_checks_total", len(results), result="cached")
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls))))
+    try:
+        pending = {pool.submit(ok_link, url, timeout, cache): url for url in urls}
+        for future in as_completed(pending, timeout=time_budget):
+            results[pending[future]] = future.result()
+    except FuturesTimeout:
+        pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if cache is not None:
+            cache.flush()
+    if metrics.enabled():
+        checked = [results[url] for url in urls if url in results]
+        metrics.incr("link_checks_total", sum(checked), result="ok")
+        metrics.incr("link_checks_total", len(checked) - sum(checked), result="broken")
+        metrics.incr("link_checks_total", len(urls) - len(checked), result="unchecked")
+
+    return [job for job in jobs if results.get(job.get("url") or "")]
 
 
 def _text_contains_any(text: str, keywords: List[str]) -> bool:
@@ -46,7 +133,9 @@ def has_exclusion(text: str, exclusion_terms: List[str]) -> bool:
 def exceeds_years(description: str, threshold: int) -> bool:
     if not description:
         return False
-    pattern = re.compile(r"(\d+)\s*(\+|mas|más)?\s*años", re.IGNORECASE)
+    # "anos" too: descriptions are often typed without the ñ, and normalized
+    # ones have it folded away.
+    pattern = re.compile(r"(\d+)\s*(\+|mas|más)?\s*a[ñn]os", re.IGNORECASE)
     for match in pattern.finditer(description):
         try:
             years = int(match.group(1))
@@ -86,3 +175,160 @@ def apply_filters(job: Dict[str, str], filter_config: Dict) -> bool:
         return False
 
     return True
+
+
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+_YEARS_MARKER = "anos"
+_MEMO_LIMIT = 50000
+
+
+def fold_text(text: str) -> str:
+    """Lowercase ``text`` and strip accents so "León" and "Leon" compare equal."""
+    if text.isascii():
+        return text.lower()
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text)).lower()
+
+
+def _compile_terms(terms: List[str]) -> Optional[Pattern[str]]:
+    folded = {fold_text(str(term)) for term in terms or [] if term}
+    folded.discard("")
+    if not folded:
+        return None
+    # Longest first so the longest term wins when two start at the same spot.
+    return re.compile("|".join(re.escape(term) for term in sorted(folded, key=len, reverse=True)))
+
+
+def _search(pattern: Optional[Pattern[str]], text: str) -> bool:
+    return pattern is not None and pattern.search(text) is not None
+
+
+def _skip_spaces(text: str, end: int) -> int:
+    while end and text[end - 1].isspace():
+        end -= 1
+    return end
+
+
+def _years_before(text: str, end: int) -> Optional[int]:
+    """The number ``exceeds_years`` reads before ``text[end:]``: digits, then
+    optionally "+" or "mas", with any whitespace around it."""
+    end = _skip_spaces(text, end)
+    if text.endswith("+", 0, end):
+        end = _skip_spaces(text, end - 1)
+    elif text.endswith("mas", 0, end):
+        end = _skip_spaces(text, end - 3)
+    start = end
+    while start and text[start - 1].isdecimal():
+        start -= 1
+    return int(text[start:end]) if start < end else None
+
+
+class CompiledFilter:
+    """``apply_filters`` compiled once from the ``filters`` config section.
+
+    Every keyword list becomes a single regex alternation that runs over
+    accent-folded text, and the title and description are folded at most
+    once per job. The years rule looks for the literal "anos" and only reads
+    the characters right before it, instead of trying a digit regex at every
+    position of the description.
+    """
+
+    def __init__(self, filter_config: Dict) -> None:
+        filter_config = filter_config or {}
+        self.locations = _compile_terms(filter_config.get("ubicaciones", []))
+        self.titles = _compile_terms(filter_config.get("titulos_permitidos", []))
+        self.levels = _compile_terms(filter_config.get("niveles", []))
+        self.exclusions = _compile_terms(filter_config.get("exclusiones", []))
+        self.years_threshold = int(filter_config.get("exclusion_por_anos", 3))
+        # Titles and locations repeat a lot across boards, so their verdicts
+        # are memoized per filter instead of folding and searching them again.
+        self._location_memo: Dict[str, bool] = {}
+        self._title_memo: Dict[str, Optional[Tuple[bool, bool]]] = {}
+
+    def _remember(self, memo: Dict, key: str, value) -> None:
+        if len(memo) >= _MEMO_LIMIT:
+            memo.clear()
+        memo[key] = value
+
+    def _location_matches(self, location: str) -> bool:
+        matched = self._location_memo.get(location)
+        if matched is None:
+            matched = _search(self.locations, fold_text(location))
+            self._remember(self._location_memo, location, matched)
+        return matched
+
+    def _title_flags(self, title: str) -> Optional[Tuple[bool, bool]]:
+        """``None`` if the title is not allowed, else (has level, has exclusion)."""
+        if title in self._title_memo:
+            return self._title_memo[title]
+        folded = fold_text(title)
+        flags = None
+        if _search(self.titles, folded):
+            flags = (_search(self.levels, folded), _search(self.exclusions, folded))
+        self._remember(self._title_memo, title, flags)
+        return flags
+
+    def exceeds_years(self, description: str) -> bool:
+        """The years rule of ``apply_filters`` over folded ``description``."""
+        index = description.find(_YEARS_MARKER)
+        while index != -1:
+            years = _years_before(description, index)
+            if years is not None and years >= self.years_threshold:
+                return True
+            index = description.find(_YEARS_MARKER, index + len(_YEARS_MARKER))
+        return False
+
+    def prefilter(self, title: str, location: str) -> Optional[str]:
+        """Rules that only need the title and location, for sources that list
+        postings without their description.
+
+        Returns "location", "title" or "exclusion" (an excluded word in the
+        title) for jobs that ``rejection`` would reject whatever their
+        description says, else ``None``.
+        """
+        if not self._location_matches(location):
+            return "location"
+        title_flags = self._title_flags(title)
+        if title_flags is None:
+            return "title"
+        if title_flags[1]:
+            return "exclusion"
+        return None
+
+    def rejection(self, job: Dict[str, str]) -> Optional[str]:
+        """Return the name of the first rule that rejects ``job`` or ``None``.
+
+        Rules are checked in the same order as ``apply_filters``: location,
+        title, level, exclusion and years.
+        """
+        if not self._location_matches(job.get("location") or ""):
+            return "location"
+
+        title_flags = self._title_flags(job.get("title") or "")
+        if title_flags is None:
+            return "title"
+        level_in_title, exclusion_in_title = title_flags
+
+        # Folding is the costly part of a long description, so search the
+        # lowercased text first and only fold it when a non-ASCII description
+        # could still change the verdict. A hit on the lowercased text is
+        # always a hit on the folded one.
+        description = (job.get("description") or "").lower()
+        folded = description.isascii()
+        if not (level_in_title or _search(self.levels, description)):
+            if folded:
+                return "level"
+            description, folded = fold_text(description), True
+            if not _search(self.levels, description):
+                return "level"
+        if exclusion_in_title or _search(self.exclusions, description):
+            return "exclusion"
+        if not folded:
+            description = fold_text(description)
+            if _search(self.exclusions, description):
+                return "exclusion"
+        if self.exceeds_years(description):
+            return "years"
+        return None
+
+    def matches(self, job: Dict[str, str]) -> bool:
+        return self.rejection(job) is None
@@ -0,0 +1,171 @@
+"""Conditional GET cache for the board APIs."""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from http_client import get_client
+from sources.streaming import iter_json_items
+
+
+DEFAULT_CACHE_PATH = "http_cache.sqlite3"
+DEFAULT_EXPIRE_DAYS = 14
+FLUSH_EVERY = 200
+LOAD_CHUNK_SIZE = 64 * 1024
+
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS) -> None:
+        self.expire_days = expire_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " body BLOB NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_fetched_at ON responses (fetched_at)")
+        self._conn.commit()
+        # Fetched entries and URLs answered with 304, written in one
+        # transaction by ``flush`` instead of one per response.
+        self._new: Dict[str, Tuple[Optional[str], Optional[str], bytes]] = {}
+        self._hits: List[str] = []
+
+    @classmethod
+    def from_config(cls, cache_config: Optional[Dict]) -> Optional["ResponseCache"]:
+        cache_config = cache_config or {}
+        if not cache_config.get("enabled", True):
+            return None
+        return cls(
+            cache_config.get("path", DEFAULT_CACHE_PATH),
+            cache_config.get("expire_days", DEFAULT_EXPIRE_DAYS),
+        )
+
+    def get(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], bytes]]:
+        with self._lock:
+            entry = self._new.get(url)
+            if entry is not None:
+                return entry
+            return self._conn.execute(
+                "SELECT etag, last_modified, body FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], parsed: Any) -> None:
+        body = _dump_body(parsed)
+        with self._lock:
+            self._new[url] = (etag, last_modified, body)
+            pending = len(self._new)
+        if pending >= FLUSH_EVERY:
+            self.flush()
+
+    def touch(self, url: str) -> None:
+        """Note that the entry of ``url`` was reused, so ``prune`` keeps it."""
+        with self._lock:
+            self._hits.append(url)
+
+    def flush(self) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                ((url, etag, last_modified, body, now) for url, (etag, last_modified, body) in self._new.items()),
+            )
+            self._conn.executemany(
+                "UPDATE responses SET fetched_at = ? WHERE url = ?", ((now, url) for url in self._hits)
+            )
+            self._new.clear()
+            self._hits.clear()
+
+    def prune(self) -> None:
+        """Drop the entries neither fetched nor reused in the last ``expire_days`` days."""
+        self.flush()
+        if not self.expire_days:
+            return
+        cutoff = time.time() - float(self.expire_days) * 86400
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE fetched_at < ?", (cutoff,))
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def _encode_record(value: Any) -> Any:
+    # Job records are mappings with slots; they are cached as plain objects.
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if hasattr(value, "keys"):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dump_body(parsed: Any) -> bytes:
+    """Compress the JSON of ``parsed`` piece by piece, never holding the whole text."""
+    compressor = zlib.compressobj()
+    parts = []
+    for piece in json.JSONEncoder(ensure_ascii=False, default=_encode_record).iterencode(parsed):
+        parts.append(compressor.compress(piece.encode("utf-8")))
+    parts.append(compressor.flush())
+    return b"".join(parts)
+
+
+def _iter_decompressed(body: bytes) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj()
+    for start in range(0, len(body), LOAD_CHUNK_SIZE):
+        yield decompressor.decompress(body[start : start + LOAD_CHUNK_SIZE])
+    yield decompressor.flush()
+
+
+def _load_body(body: bytes, restore: Optional[Callable[[Any], Any]] = None) -> Any:
+    if restore is None:
+        return json.loads(zlib.decompress(body).decode("utf-8"))
+    # Arrays are decoded item by item and passed through ``restore`` so a big
+    # board never exists as a whole list of dicts.
+    return [restore(item) for item in iter_json_items(_iter_decompressed(body))]
+
+
+def cached_get(
+    url: str,
+    parse: Callable[[requests.Response], Any],
+    cache: Optional[ResponseCache] = None,
+    timeout: float = 15,
+    restore: Optional[Callable[[Any], Any]] = None,
+    **kwargs: Any,
+) -> Any:
+    """GET ``url`` and return ``parse(response)``, reusing the cached result on 304.
+
+    When ``parse`` returns a list, ``restore`` rebuilds each cached item (for
+    example a job record from its dict) as the cached array is decoded.
+
+    Raises ``requests.RequestException`` like a shared-client GET followed by
+    ``raise_for_status``.
+    """
+    entry = cache.get(url) if cache is not None else None
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry is not None:
+        etag, last_modified, _ = entry
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = get_client().get(url, headers=headers, timeout=timeout, **kwargs)
+    if response.status_code == 304 and entry is not None:
+        cache.touch(url)
+        return _load_body(entry[2], restore)
+    response.raise_for_status()
+
+    parsed = parse(response)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if cache is not None and (etag or last_modified):
+        cache.put(url, etag, last_modified, parsed)
+    return parsed
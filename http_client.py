@@ -0,0 +1,389 @@
+"""Shared HTTP client used by every source, the link checker and Telegram."""
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+DEFAULT_POOL_HOSTS = 64
+DEFAULT_POOL_SIZE = 32
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_MAX_RETRY_AFTER = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RequestScope:
+    """Deadline (a ``time.monotonic`` value) and outcome of the requests made on behalf of one task.
+
+    ``slots`` lends the task spare slots of its host's concurrency cap for
+    requests it makes in parallel: ``try_acquire()`` takes one if the host
+    has room and ``release()`` gives it back.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, slots: Optional[Any] = None) -> None:
+        self.deadline = deadline
+        self.slots = slots
+        self.succeeded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def time_left(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+
+_scope: ContextVar[Optional[RequestScope]] = ContextVar("http_scope", default=None)
+
+
+@contextmanager
+def request_scope(deadline: Optional[float] = None, slots: Optional[Any] = None) -> Iterator[RequestScope]:
+    scope = RequestScope(deadline, slots)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def in_scope(func: Callable) -> Callable:
+    """Wrap ``func`` so it runs in the caller's request scope, e.g. on another thread of a pool."""
+    scope = _scope.get()
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        token = _scope.set(scope)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _scope.reset(token)
+
+    return wrapper
+
+
+def host_slots() -> Optional[Any]:
+    """Spare host slots lent to the current request scope, or ``None`` outside the fetcher."""
+    scope = _scope.get()
+    return scope.slots if scope is not None else None
+
+
+def time_left() -> Optional[float]:
+    """Seconds left in the current request scope, or ``None`` without a deadline."""
+    scope = _scope.get()
+    return scope.time_left() if scope is not None else None
+
+
+def _bounded_timeout(timeout: Any, left: Optional[float]) -> Any:
+    if left is None:
+        return timeout
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        return tuple(left if part is None else min(part, left) for part in timeout)
+    return min(timeout, left)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _response_size(response: requests.Response, kwargs: Dict[str, Any]) -> Optional[int]:
+    """Bytes on the wire per ``Content-Length``, or of the body already read."""
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    if kwargs.get("stream"):
+        return None
+    return len(response.content)
+
+
+class HttpClient:
+    def __init__(
+        self,
+        pool_hosts: int = DEFAULT_POOL_HOSTS,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        max_retry_after: float = DEFAULT_MAX_RETRY_AFTER,
+        rate_limits: Optional[Dict[str, float]] = None,
+        hedge_after: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self._buckets = {host.lower(): TokenBucket(float(rate)) for host, rate in (rate_limits or {}).items() if rate}
+        self._hedge_after = {host.lower(): float(delay) for host, delay in (hedge_after or {}).items() if delay}
+        self._pool_size = pool_size
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()
+        # Requests being sent; ``close`` waits for them to finish.
+        self._in_flight = 0
+        self._closed = False
+        self._state_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, http_config: Optional[Dict]) -> "HttpClient":
+        http_config = http_config or {}
+        return cls(
+            pool_hosts=int(http_config.get("pool_hosts", DEFAULT_POOL_HOSTS)),
+            pool_size=int(http_config.get("pool_size", DEFAULT_POOL_SIZE)),
+            retries=int(http_config.get("retries", DEFAULT_RETRIES)),
+            backoff=float(http_config.get("backoff", DEFAULT_BACKOFF)),
+            max_backoff=float(http_config.get("max_backoff", DEFAULT_MAX_BACKOFF)),
+            max_retry_after=float(http_config.get("max_retry_after", DEFAULT_MAX_RETRY_AFTER)),
+            rate_limits=http_config.get("rate_limits") or {},
+            hedge_after=http_config.get("hedge_after") or {},
+        )
+
+    def _throttle(self, url: str) -> None:
+        bucket = self._buckets.get(urlparse(url).netloc.lower())
+        if bucket is not None:
+            bucket.acquire()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_lock:
+            if self._hedge_pool is None:
+                # Room for both copies of as many requests as the connection pool holds.
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=2 * max(1, self._pool_size), thread_name_prefix="hedge"
+                )
+            return self._hedge_pool
+
+    def _send_hedged(self, method: str, url: str, delay: float, kwargs: Dict[str, Any]) -> requests.Response:
+        """Send the request, and a copy of it if no answer came after ``delay`` seconds; the first answer wins."""
+        pool = self._hedge_executor()
+        host = urlparse(url).netloc.lower()
+        started = threading.Event()
+
+        def send_primary() -> requests.Response:
+            started.set()
+            return self.session.request(method, url, **kwargs)
+
+        primary = pool.submit(send_primary)
+        # Time spent queued for a thread does not count towards ``delay``.
+        started.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        self._throttle(url)
+        hedge = pool.submit(self.session.request, method, url, **kwargs)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                metrics.incr("http_hedged_total", host=host, winner="primary" if future is primary else "hedge")
+                # The slower copy is closed as soon as it answers.
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                return future.result()
+        raise error
+
+    def _send(self, method: str, url: str, hedge: bool, kwargs: Dict[str, Any]) -> requests.Response:
+        delay = self._hedge_after.get(urlparse(url).netloc.lower()) if hedge and method in IDEMPOTENT_METHODS else None
+        if delay is None:
+            return self.session.request(method, url, **kwargs)
+        return self._send_hedged(method, url, delay, kwargs)
+
+    def request(
+        self, method: str, url: str, hedge: bool = False, retries: Optional[int] = None, **kwargs: Any
+    ) -> requests.Response:
+        """Send a request; ``retries`` overrides the client's retry count (0 hands 429s straight to the caller)."""
+        with self._state_lock:
+            self._in_flight += 1
+        try:
+            return self._request(method, url, hedge, retries, kwargs)
+        finally:
+            with self._state_lock:
+                self._in_flight -= 1
+                release = self._closed and self._in_flight == 0
+            if release:
+                self._release()
+
+    def _request(
+        self, method: str, url: str, hedge: bool, retries: Optional[int], kwargs: Dict[str, Any]
+    ) -> requests.Response:
+        retries = self.retries if retries is None else retries
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS
+        scope = _scope.get()
+        attempt = 0
+        while True:
+            self._throttle(url)
+            left = scope.time_left() if scope is not None else None
+            if left is not None and left <= 0:
+                raise requests.Timeout(f"Sin tiempo para pedir {url}")
+            kwargs["timeout"] = _bounded_timeout(kwargs.get("timeout"), left)
+            started = time.perf_counter()
+            try:
+                response = self._send(method, url, hedge, kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.record_http(method, url, 0, time.perf_counter() - started, None)
+                delay = self._backoff_delay(attempt)
+                if not idempotent or attempt >= retries or not _fits(scope, delay):
+                    if scope is not None:
+                        scope.record(False)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if metrics.enabled():
+                metrics.record_http(
+                    method, url, response.status_code, time.perf_counter() - started, _response_size(response, kwargs)
+                )
+
+            # A 429 was never processed, so it is safe to retry even for POST.
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            delay = _retry_after_seconds(response) if retryable else None
+            if retryable and delay is None:
+                delay = self._backoff_delay(attempt)
+            if (
+                not retryable
+                or attempt >= retries
+                or delay > self.max_retry_after
+                or not _fits(scope, delay)
+            ):
+                if scope is not None:
+                    scope.record(response.status_code < 400)
+                return response
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        """Release the connections and hedge threads once the requests in flight finish.
+
+        A thread that still holds the client, such as a fetch task a deadline
+        cut left running, can keep using it; it is released again afterwards.
+        """
+        with self._state_lock:
+            self._closed = True
+            release = self._in_flight == 0
+        if release:
+            self._release()
+
+    def _release(self) -> None:
+        with self._hedge_lock:
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+        self.session.close()
+
+
+def _fits(scope: Optional[RequestScope], delay: float) -> bool:
+    """Whether waiting ``delay`` seconds still leaves time in ``scope`` for another attempt."""
+    left = scope.time_left() if scope is not None else None
+    return left is None or delay < left
+
+
+def _close_response(future: Future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def set_client(client: Optional[HttpClient]) -> None:
+    """Install ``client`` as the shared client; ``None`` restores the default."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def configure(http_config: Optional[Dict]) -> HttpClient:
+    """Install a client built from ``http_config`` and close the one it replaces.
+
+    The old client is closed once the requests it is sending finish.
+    """
+    global _client
+    client = HttpClient.from_config(http_config)
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None and hasattr(previous, "close"):
+        previous.close()
+    return client
@@ -0,0 +1,84 @@
+"""Persistent cache of link validation results."""
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+DEFAULT_CACHE_PATH = "link_cache.sqlite3"
+DEFAULT_POSITIVE_TTL = 24 * 3600
+DEFAULT_NEGATIVE_TTL = 3 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+
+
+class LinkCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        positive_ttl: float = DEFAULT_POSITIVE_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " url TEXT PRIMARY KEY,"
+            " ok INTEGER NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " checked_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS links_checked_at ON links (checked_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, link_config: Optional[Dict]) -> "LinkCache":
+        link_config = link_config or {}
+        return cls(
+            path=link_config.get("cache_path", DEFAULT_CACHE_PATH),
+            positive_ttl=float(link_config.get("positive_ttl", DEFAULT_POSITIVE_TTL)),
+            negative_ttl=float(link_config.get("negative_ttl", DEFAULT_NEGATIVE_TTL)),
+            max_entries=int(link_config.get("cache_max_entries", DEFAULT_MAX_ENTRIES)),
+        )
+
+    def get(self, url: str) -> Optional[bool]:
+        """Return the cached verdict for ``url`` or ``None`` if missing or stale."""
+        with self._lock:
+            row = self._conn.execute("SELECT ok, checked_at FROM links WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        ok, checked_at = bool(row[0]), row[1]
+        ttl = self.positive_ttl if ok else self.negative_ttl
+        if time.time() - checked_at > ttl:
+            return None
+        return ok
+
+    def put(self, url: str, ok: bool, status: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO links (url, ok, status, checked_at) VALUES (?, ?, ?, ?)",
+                (url, int(ok), int(status), time.time()),
+            )
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def prune(self) -> None:
+        cutoff = time.time() - max(self.positive_ttl, self.negative_ttl)
+        with self._lock:
+            self._conn.execute("DELETE FROM links WHERE checked_at < ?", (cutoff,))
+            self._conn.execute(
+                "DELETE FROM links WHERE url IN ("
+                " SELECT url FROM links ORDER BY checked_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,285 @@
+"""Streaming report: Telegram messages go out while sources are still downloading."""
+import heapq
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from dedup import DedupIndex
+from filters import DEFAULT_LINK_TIME_BUDGET, DEFAULT_LINK_TIMEOUT, DEFAULT_LINK_WORKERS, ok_link
+from link_cache import LinkCache
+from messaging import ChunkBuilder
+import metrics
+from notify.outbox import Outbox
+from profiles import Profile
+from ranking import RelevanceScorer, TermCounts
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LINGER_SECS = 5.0
+DEFAULT_MAX_LENGTH = 3500
+
+_STOP = object()
+
+# Score of a candidate for each profile position it was offered to.
+Scores = Dict[int, float]
+
+
+class LiveReport:
+    """Report candidates to every profile while the sources are still downloading.
+
+    With a ``scorer`` each profile collects the candidates of a linger window
+    in a heap capped at what it can still receive and sends them best first.
+    A full heap's lowest score is the floor a new candidate must beat before
+    its link is checked.
+    """
+
+    def __init__(
+        self,
+        profiles: List[Profile],
+        outbox: Outbox,
+        deliver: Callable[[], int],
+        link_config: Optional[Dict] = None,
+        link_cache: Optional[LinkCache] = None,
+        dedup: Optional[DedupIndex] = None,
+        report_config: Optional[Dict] = None,
+        scorer: Optional[RelevanceScorer] = None,
+    ) -> None:
+        link_config = link_config or {}
+        report_config = report_config or {}
+        for profile in profiles:
+            if not profile.chat_ids:
+                raise ValueError("TELEGRAM_CHAT_ID es requerido para enviar mensajes")
+        self.profiles = profiles
+        self.outbox = outbox
+        self.deliver = deliver
+        self.link_cache = link_cache
+        self.dedup = dedup
+        self.scorer = scorer
+        self.linger = float(report_config.get("linger_secs", DEFAULT_LINGER_SECS))
+        self.link_timeout = float(link_config.get("timeout", DEFAULT_LINK_TIMEOUT))
+        self.time_budget = float(link_config.get("time_budget", DEFAULT_LINK_TIME_BUDGET))
+        max_length = int(report_config.get("max_length", DEFAULT_MAX_LENGTH))
+        self.reported = [0] * len(profiles)
+        self._remaining: List[Optional[int]] = [profile.limit for profile in profiles]
+        self._builders = [ChunkBuilder(max_length) for _ in profiles]
+        # When the oldest job of each profile's open message arrived.
+        self._opened_at: List[Optional[float]] = [None] * len(profiles)
+        # (score, -arrival, job) of each profile's open window, and the score
+        # a candidate must beat once the window holds all the profile can take.
+        self._windows: List[List[Tuple[float, int, Any]]] = [[] for _ in profiles]
+        self._floors: List[Optional[float]] = [None] * len(profiles)
+        self._arrivals = 0
+        self._started = time.monotonic()
+        self._first_chunk = True
+        # Profiles each URL was offered to; a held-back copy may come back for others.
+        self._offered: Dict[str, int] = {}
+        self._offered_lock = threading.Lock()
+        self._checks: List[Future] = []
+        self._link_pool = ThreadPoolExecutor(
+            max_workers=max(1, int(link_config.get("workers", DEFAULT_LINK_WORKERS))), thread_name_prefix="link"
+        )
+        self._results: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="live-report", daemon=True)
+        self._thread.start()
+
+    def _wanted(self, mask: int) -> bool:
+        """Whether some profile in ``mask`` can still take jobs."""
+        return any(
+            mask & (1 << position) and remaining != 0 for position, remaining in enumerate(self._remaining)
+        )
+
+    def _above_floors(self, mask: int, scores: Scores) -> int:
+        """Profiles of ``mask`` whose open window still has room for a candidate with ``scores``."""
+        for position, floor in enumerate(self._floors):
+            if floor is not None and mask & (1 << position) and scores[position] <= floor:
+                mask &= ~(1 << position)
+        return mask
+
+    def offer(self, job: Dict[str, str], mask: int, counts: Optional[TermCounts] = None) -> None:
+        """Check the link of a new candidate for the profiles in ``mask`` and report it if it works.
+
+        ``counts`` are the candidate's term counts, needed with a ``scorer``.
+        """
+        scores = None
+        if self.scorer is not None:
+            # Every profile's: a held-back copy may come back for the others.
+            scores = {position: self.scorer.score(counts or {}, position) for position in range(len(self.profiles))}
+        self._offer(job, mask, scores)
+
+    def _offer(self, job: Dict[str, str], mask: int, scores: Optional[Scores]) -> None:
+        url = job.get("url") or ""
+        with self._offered_lock:
+            mask &= ~self._offered.get(url, 0)
+            if not url or not mask:
+                return
+            if not self._wanted(mask):
+                metrics.incr("jobs_dropped_total", reason="limit")
+                return
+            if scores is not None:
+                mask = self._above_floors(mask, scores)
+                if not mask:
+                    metrics.incr("jobs_dropped_total", reason="rank")
+                    return
+            self._offered[url] = self._offered.get(url, 0) | mask
+        cached = self.link_cache.get(url) if self.link_cache is not None else None
+        if cached is not None:
+            metrics.incr("link_checks_total", result="cached")
+            if cached:
+                self._results.put((job, mask, scores))
+            else:
+                self._release(url, scores)
+            return
+        try:
+            future = self._link_pool.submit(ok_link, url, self.link_timeout, self.link_cache)
+        except RuntimeError:
+            # A held-back copy released after ``finish`` stopped checking links.
+            return
+        self._checks.append(future)
+        future.add_done_callback(lambda done: self._checked(done, job, mask, scores))
+
+    def _checked(self, future: Future, job: Dict[str, str], mask: int, scores: Optional[Scores]) -> None:
+        if future.cancelled():
+            return
+        try:
+            ok = future.result()
+        except Exception:
+            logger.exception("Falló la validación de %s", job.get("url"))
+            ok = False
+        metrics.incr("link_checks_total", result="ok" if ok else "broken")
+        if ok:
+            self._results.put((job, mask, scores))
+        else:
+            self._release(job.get("url") or "", scores)
+
+    def _release(self, url: str, scores: Optional[Scores]) -> None:
+        """Offer the copies ``dedup`` held back for the profiles of a broken link.
+
+        A copy is a near duplicate of the broken posting, so it takes its scores.
+        """
+        if self.dedup is not None:
+            for job, mask in self.dedup.release(url):
+                self._offer(job, mask, scores)
+
+    def _run(self) -> None:
+        while True:
+            due = [opened + self.linger for opened in self._opened_at if opened is not None]
+            timeout = max(0.0, min(due) - time.monotonic()) if due else None
+            try:
+                item = self._results.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                self._add(*item)
+            self._flush(time.monotonic())
+        self._flush(None)
+
+    def _add(self, job: Dict[str, str], mask: int, scores: Optional[Scores]) -> None:
+        if scores is not None:
+            self._rank(job, mask, scores)
+            return
+        added = False
+        for position in range(len(self.profiles)):
+            remaining = self._remaining[position]
+            if not mask & (1 << position) or remaining == 0:
+                continue
+            if remaining is not None:
+                self._remaining[position] = remaining - 1
+            self.reported[position] += 1
+            added = True
+            builder = self._builders[position]
+            chunks = builder.add(job)
+            if chunks or self._opened_at[position] is None:
+                # A full message went out; the clock starts with what is left.
+                self._opened_at[position] = time.monotonic() if len(builder) else None
+            self._enqueue(position, chunks)
+        if added and self.dedup is not None:
+            self.dedup.record([job.get("url") or ""])
+
+    def _rank(self, job: Dict[str, str], mask: int, scores: Scores) -> None:
+        """Put a checked candidate in the open window of each profile in ``mask``."""
+        self._arrivals += 1
+        for position, window in enumerate(self._windows):
+            remaining = self._remaining[position]
+            if not mask & (1 << position) or remaining == 0:
+                continue
+            item = (scores[position], -self._arrivals, job)
+            if remaining is not None and len(window) >= remaining:
+                if item[:2] <= window[0][:2]:
+                    metrics.incr("jobs_dropped_total", reason="rank")
+                    continue
+                heapq.heapreplace(window, item)
+                metrics.incr("jobs_dropped_total", reason="rank")
+            else:
+                heapq.heappush(window, item)
+            if remaining is not None and len(window) == remaining:
+                self._floors[position] = window[0][0]
+            if self._opened_at[position] is None:
+                self._opened_at[position] = time.monotonic()
+
+    def _send_window(self, position: int) -> None:
+        """Queue the jobs of a profile's window, best first; ties keep their arrival order."""
+        window = sorted(self._windows[position], key=lambda item: item[:2], reverse=True)
+        self._windows[position] = []
+        self._floors[position] = None
+        builder = self._builders[position]
+        for _, _, job in window:
+            remaining = self._remaining[position]
+            if remaining is not None:
+                self._remaining[position] = remaining - 1
+            self.reported[position] += 1
+            self._enqueue(position, builder.add(job))
+            if self.dedup is not None:
+                self.dedup.record([job.get("url") or ""])
+        self._enqueue(position, builder.flush())
+
+    def _flush(self, now: Optional[float]) -> None:
+        """Queue the open messages older than the linger time, or all of them when ``now`` is ``None``."""
+        for position, opened in enumerate(self._opened_at):
+            if opened is not None and (now is None or now - opened >= self.linger):
+                self._opened_at[position] = None
+                if self.scorer is not None:
+                    self._send_window(position)
+                else:
+                    self._enqueue(position, self._builders[position].flush())
+
+    def _enqueue(self, position: int, chunks: List[Tuple[str, List[str]]]) -> None:
+        if not chunks:
+            return
+        profile = self.profiles[position]
+        self.outbox.enqueue(
+            ((chat_id, text, urls) for chat_id in profile.chat_ids for text, urls in chunks), profile.name
+        )
+        if self._first_chunk:
+            self._first_chunk = False
+            metrics.incr("report_first_chunk_seconds", time.monotonic() - self._started)
+        try:
+            self.deliver()
+        except Exception:
+            # Whatever was not sent stays in the outbox for the next delivery.
+            logger.exception("Falló el envío de mensajes")
+
+    def finish(self) -> List[int]:
+        """Wait for the pending link checks (up to ``time_budget``), send the
+        remaining messages and return how many jobs each profile got."""
+        try:
+            deadline = time.monotonic() + self.time_budget
+            unchecked: Set[Future] = set()
+            # A broken link may release a copy whose check starts meanwhile.
+            while not unchecked and not all(future.done() for future in list(self._checks)):
+                _, unchecked = wait(list(self._checks), timeout=max(0.0, deadline - time.monotonic()))
+            if unchecked:
+                # Never reported and never marked as seen: checked again next run.
+                metrics.incr("link_checks_total", len(unchecked), result="unchecked")
+        finally:
+            self._link_pool.shutdown(wait=False, cancel_futures=True)
+            if self.link_cache is not None:
+                self.link_cache.flush()
+            self._results.put(_STOP)
+            self._thread.join()
+        return self.reported
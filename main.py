@@ -1,16 +1,25 @@
+import argparse
 import os
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import yaml
 from dotenv import load_dotenv
 
-from filters import apply_filters, ok_link
+from cpu_pool import DEFAULT_MIN_JOBS, ParallelMatcher
+from dedup import DedupIndex
+from fetcher import FetchTask, stream_tasks
+from filters import validate_links
+from link_cache import LinkCache
+from live_report import LiveReport
 from messaging import send_report
-from sources.greenhouse import fetch_greenhouse_jobs
-from sources.lever import fetch_lever_jobs
-from sources.external import fetch_external_jobs
-from sources.apify_indeed import fetch_apify_indeed_jobs
+import metrics
+from normalize import TextNormalizer
+from profiles import ProfileMatcher
+from ranking import Candidate, RelevanceScorer, TermCounts
+from runtime import Runtime
+from sources.record import drop_description, release_description, terms_of
 import storage
+from watermarks import WatermarkStore
 
 
 CONFIG_PATH = "config.yaml"
@@ -23,57 +32,382 @@ def load_config(path: str = CONFIG_PATH) -> Dict:
         return yaml.safe_load(handle) or {}
 
 
-def collect_jobs(config: Dict) -> List[Dict[str, str]]:
-    greenhouse_tokens = config.get("greenhouse_tokens", [])
-    lever_companies = config.get("lever_companies", [])
-    external_sources = config.get("external_sources", [])
-    apify_indeed_config = config.get("apify_indeed", {})
+def collect_jobs(runtime: Runtime, tasks: Optional[List[FetchTask]] = None) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield ``(task index, job)`` pairs while the sources are still downloading, until the run deadline.
 
-    jobs: List[Dict[str, str]] = []
-    jobs.extend(fetch_greenhouse_jobs(greenhouse_tokens))
-    jobs.extend(fetch_lever_jobs(lever_companies))
-    jobs.extend(fetch_external_jobs(external_sources))
-    apify_token = os.getenv("APIFY_TOKEN")
-    jobs.extend(fetch_apify_indeed_jobs(apify_indeed_config, apify_token))
+    With an archive, every posting is stored on its way to the filters.
+    """
+    if tasks is None:
+        tasks = runtime.build_tasks()
+    jobs = stream_tasks(tasks, runtime.settings, runtime.deadline, runtime.breakers)
+    if runtime.archive is not None:
+        return runtime.archive.record(jobs, [task.source for task in tasks])
     return jobs
 
 
-def filter_jobs(jobs: List[Dict[str, str]], filter_config: Dict, seen: set) -> List[Dict[str, str]]:
-    filtered: List[Dict[str, str]] = []
-    for job in jobs:
-        if not apply_filters(job, filter_config):
-            continue
-        if not ok_link(job.get("url") or ""):
+def _profile_bits(mask: int) -> Iterator[int]:
+    position = 0
+    while mask:
+        if mask & 1:
+            yield position
+        mask >>= 1
+        position += 1
+
+
+def _verdicts(
+    jobs: Iterable[Tuple[int, Dict[str, str]]],
+    matcher: ProfileMatcher,
+    normalizer: Optional[TextNormalizer],
+    watermarks: Optional[WatermarkStore],
+    pool_config: Optional[Dict],
+    signatures: bool,
+    scorer: Optional[RelevanceScorer] = None,
+) -> Iterator[Tuple[int, Dict[str, str], int, Optional[str]]]:
+    """Yield ``(task index, job, profile mask, rejection)`` for every job worth judging.
+
+    Past ``min_jobs`` judged postings, an enabled ``cpu_pool`` takes over the
+    text rules; below it everything stays in this process.
+    """
+    pool_config = pool_config or {}
+    min_jobs = int(pool_config.get("min_jobs", DEFAULT_MIN_JOBS)) if pool_config.get("enabled") else None
+    prepare = normalizer.normalize if normalizer is not None else None
+    parallel: Optional[ParallelMatcher] = None
+    judged = 0
+    try:
+        for index, job in jobs:
+            if watermarks is not None and watermarks.rejection_of(job) is not None:
+                metrics.incr("jobs_dropped_total", reason="known_rejection")
+                drop_description(job)
+                continue
+            if parallel is None and min_jobs is not None and judged >= min_jobs:
+                vocabulary = scorer.pattern if scorer is not None else None
+                parallel = ParallelMatcher(matcher, pool_config, normalizer is not None, signatures, vocabulary)
+            if parallel is not None:
+                yield from parallel.submit(index, job)
+                continue
+            judged += 1
+            mask, rejection = matcher.match(job, prepare)
+            yield index, job, mask, rejection
+        if parallel is not None:
+            yield from parallel.finish()
+    finally:
+        if parallel is not None:
+            parallel.close()
+
+
+def _fresh_candidates(
+    jobs: Iterable[Tuple[int, Dict[str, str]]],
+    matcher: ProfileMatcher,
+    seen: List[storage.SeenStore],
+    queued: List[Set[str]],
+    dedup: Optional[DedupIndex],
+    normalizer: Optional[TextNormalizer],
+    watermarks: Optional[WatermarkStore],
+    pool_config: Optional[Dict],
+    scorer: Optional[RelevanceScorer] = None,
+) -> Iterator[Tuple[int, Dict[str, str], int, Optional[TermCounts]]]:
+    """Yield ``(task index, job, mask, term counts)`` for the jobs some profile accepts and has not seen.
+
+    Term counts are only computed with a ``scorer``, before the description is released.
+    """
+    profiles = matcher.profiles
+    verdicts = _verdicts(jobs, matcher, normalizer, watermarks, pool_config, dedup is not None, scorer)
+    for index, job, mask, rejection in verdicts:
+        if not mask:
+            metrics.incr("filter_rejections_total", rule=rejection)
+            # Title and location verdicts are memoized and cost next to
+            # nothing; only rejections that needed the description are kept.
+            if watermarks is not None and rejection not in ("location", "title"):
+                watermarks.remember(job, rejection)
+            # The task may still hold its job list; the text is what weighs.
+            drop_description(job)
             continue
-        if storage.already_seen(job.get("url") or "", seen):
+        url = job.get("url") or ""
+        fresh = mask
+        reason = "seen"
+        for position in _profile_bits(mask):
+            metrics.incr("jobs_matched_total", profile=profiles[position].name)
+            if url in queued[position]:
+                fresh &= ~(1 << position)
+                reason = "queued"
+            elif storage.already_seen(url, seen[position]):
+                fresh &= ~(1 << position)
+        if not fresh:
+            metrics.incr("jobs_dropped_total", reason=reason)
+            drop_description(job)
             continue
-        filtered.append(job)
-    return filtered
+        # With a normalizer, ``matcher.match`` already left the description as plain text.
+        normalized = normalizer is not None
+        if dedup is not None:
+            dedup.prepare(job, normalized)
+        counts = scorer.count(job, terms_of(job), normalized) if scorer is not None else None
+        release_description(job)
+        metrics.incr("jobs_candidates_total")
+        yield index, job, fresh, counts
 
 
-def main() -> None:
-    load_dotenv()
-    config = load_config()
-    filter_config = config.get("filters", {})
+def _unduplicated_mask(
+    dedup: DedupIndex, job: Dict[str, str], mask: int, seen: List[storage.SeenStore], queued: List[Set[str]]
+) -> int:
+    """Profiles of ``mask`` that should still get ``job`` once duplicates are considered.
+
+    A duplicate is dropped for the profiles that received the original or get
+    another copy in this run; ``dedup`` holds it back for the latter in case
+    that copy's link turns out broken.
+    """
+    original = dedup.duplicate_of(job)
+    if original is None:
+        dedup.claim(job.get("url") or "", mask)
+        return mask
+    for position in _profile_bits(mask):
+        if original in queued[position] or storage.already_seen(original, seen[position]):
+            mask &= ~(1 << position)
+    return dedup.unclaimed(original, job, mask) if mask else 0
+
+
+def filter_jobs(
+    jobs: Iterable[Tuple[int, Dict[str, str]]],
+    matcher: ProfileMatcher,
+    seen: List[storage.SeenStore],
+    link_config: Optional[Dict] = None,
+    link_cache: Optional[LinkCache] = None,
+    queued: Optional[List[Set[str]]] = None,
+    dedup: Optional[DedupIndex] = None,
+    normalizer: Optional[TextNormalizer] = None,
+    watermarks: Optional[WatermarkStore] = None,
+    pool_config: Optional[Dict] = None,
+    scorer: Optional[RelevanceScorer] = None,
+) -> List[List[Dict[str, str]]]:
+    """Return, for each profile of ``matcher``, the new jobs it accepts that have a working link.
+
+    ``seen`` and ``queued`` are aligned with ``matcher.profiles``; URLs
+    already waiting in a profile's outbox count as seen for that profile.
+    With a ``dedup`` index, a posting another source brought in this run is
+    dropped for the profiles that get that copy, unless its link is broken,
+    and one already reported for the profiles that received the original.
+    Each link is checked once, however
+    many profiles want the job. With a ``normalizer``, descriptions are
+    turned into plain text before any rule reads them. With ``watermarks``,
+    postings rejected before and not updated since are skipped unread, and
+    new rejections are remembered. ``pool_config`` (the ``cpu_pool`` section)
+    moves the text rules of large runs to worker processes.
+
+    With a ``scorer`` each profile's jobs come best first, and only the
+    links of its ``limite_envio`` best jobs plus the scorer's margin are
+    checked; otherwise they keep the order of ``config.yaml``.
+    """
+    profiles = matcher.profiles
+    queued = queued or [set() for _ in profiles]
+    candidates: List[Candidate] = []
+    with metrics.stage("collect"):
+        for candidate in _fresh_candidates(
+            jobs, matcher, seen, queued, dedup, normalizer, watermarks, pool_config, scorer
+        ):
+            if scorer is not None:
+                scorer.observe(candidate[3])
+            candidates.append(candidate)
+    # Sources finish in any order; sorting by task index keeps the config order.
+    candidates.sort(key=lambda candidate: candidate[0])
+    if dedup is not None:
+        order = {id(job): position for position, (_, job, _, _) in enumerate(candidates)}
+        with metrics.stage("dedup"):
+            unique: List[Candidate] = []
+            for index, job, mask, counts in candidates:
+                mask = _unduplicated_mask(dedup, job, mask, seen, queued)
+                if mask:
+                    unique.append((index, job, mask, counts))
+        metrics.incr("jobs_dropped_total", len(candidates) - len(unique), reason="duplicate")
+        candidates = unique
+    if scorer is None:
+        ranked = [
+            [job for _, job, mask, _ in candidates if mask & (1 << position)] for position in range(len(profiles))
+        ]
+    else:
+        with metrics.stage("rank"):
+            ranked = scorer.top_k(candidates)
+    # Each link is checked once, however many profiles kept the job.
+    to_check = list({id(job): job for profile_jobs in ranked for job in profile_jobs}.values())
+    if scorer is not None:
+        metrics.incr("jobs_dropped_total", len(candidates) - len(to_check), reason="rank")
+    with metrics.stage("validate_links"):
+        valid = {id(job) for job in validate_links(to_check, link_config, link_cache)}
+    reports = [[job for job in profile_jobs if id(job) in valid] for profile_jobs in ranked]
+    broken = [job for job in to_check if id(job) not in valid] if dedup is not None else []
+    extended: Set[int] = set()
+    while broken:
+        # Copies held back for the profiles of a broken link get their turn.
+        released = [held for job in broken for held in dedup.release(job.get("url") or "")]
+        if not released:
+            break
+        with metrics.stage("validate_links"):
+            working = {id(job) for job in validate_links([job for job, _ in released], link_config, link_cache)}
+        for job, mask in released:
+            if id(job) in working:
+                for position in _profile_bits(mask):
+                    reports[position].append(job)
+                    extended.add(position)
+        broken = [job for job, _ in released if id(job) not in working]
+    if scorer is None:
+        for position in extended:
+            reports[position].sort(key=lambda job: order[id(job)])
+    return reports
+
 
-    seen_jobs = storage.load_seen()
-    all_jobs = collect_jobs(config)
-    valid_jobs = filter_jobs(all_jobs, filter_config, seen_jobs)
+def stream_jobs(
+    jobs: Iterable[Tuple[int, Dict[str, str]]],
+    matcher: ProfileMatcher,
+    seen: List[storage.SeenStore],
+    report: LiveReport,
+    queued: Optional[List[Set[str]]] = None,
+    dedup: Optional[DedupIndex] = None,
+    normalizer: Optional[TextNormalizer] = None,
+    watermarks: Optional[WatermarkStore] = None,
+    pool_config: Optional[Dict] = None,
+) -> None:
+    """``filter_jobs`` for the live report: each candidate goes to ``report`` as soon as it qualifies.
 
-    limit = filter_config.get("limite_envio")
-    if limit:
+    With the report's ``scorer`` every candidate also feeds the document
+    frequencies the scores of later ones use.
+    """
+    queued = queued or [set() for _ in matcher.profiles]
+    scorer = report.scorer
+    with metrics.stage("collect"):
+        candidates = _fresh_candidates(jobs, matcher, seen, queued, dedup, normalizer, watermarks, pool_config, scorer)
+        for _, job, mask, counts in candidates:
+            if scorer is not None:
+                scorer.observe(counts)
+            if dedup is not None:
+                mask = _unduplicated_mask(dedup, job, mask, seen, queued)
+                if not mask:
+                    metrics.incr("jobs_dropped_total", reason="duplicate")
+                    continue
+            report.offer(job, mask, counts)
+
+
+def _report_live(runtime: Runtime, tasks: Optional[List[FetchTask]]) -> None:
+    profiles = runtime.profiles
+    report = LiveReport(
+        profiles,
+        runtime.outbox,
+        runtime.deliver,
+        runtime.link_config,
+        runtime.link_cache,
+        runtime.dedup,
+        runtime.report_config,
+        RelevanceScorer.from_config(profiles, runtime.config.get("ranking")),
+    )
+    try:
+        with metrics.stage("filter_jobs"):
+            stream_jobs(
+                collect_jobs(runtime, tasks),
+                runtime.matcher,
+                [runtime.seen(profile.name) for profile in profiles],
+                report,
+                runtime.queued,
+                runtime.dedup,
+                runtime.normalizer,
+                runtime.watermarks,
+                runtime.config.get("cpu_pool"),
+            )
+    finally:
+        with metrics.stage("send_report"):
+            reported = report.finish()
+    for profile, count in zip(profiles, reported):
+        metrics.incr("jobs_reported_total", count, profile=profile.name)
+
+
+def _report_batch(runtime: Runtime, tasks: Optional[List[FetchTask]]) -> None:
+    profiles = runtime.profiles
+    with metrics.stage("filter_jobs"):
+        matched = filter_jobs(
+            collect_jobs(runtime, tasks),
+            runtime.matcher,
+            [runtime.seen(profile.name) for profile in profiles],
+            runtime.link_config,
+            runtime.link_cache,
+            runtime.queued,
+            runtime.dedup,
+            runtime.normalizer,
+            runtime.watermarks,
+            runtime.config.get("cpu_pool"),
+            RelevanceScorer.from_config(profiles, runtime.config.get("ranking")),
+        )
+    reports = []
+    for profile, valid_jobs in zip(profiles, matched):
+        if profile.limit:
+            valid_jobs = valid_jobs[: profile.limit]
+        metrics.incr("jobs_reported_total", len(valid_jobs), profile=profile.name)
+        reports.append((profile, valid_jobs))
+    if runtime.dedup is not None:
+        runtime.dedup.record(job.get("url") or "" for _, valid_jobs in reports for job in valid_jobs)
+
+    with metrics.stage("send_report"):
+        for profile, valid_jobs in reports:
+            send_report(valid_jobs, runtime.outbox, profile.chat_ids, profile.name)
+
+
+def run_once(runtime: Runtime, tasks: Optional[List[FetchTask]] = None) -> None:
+    """Fetch ``tasks`` (every configured source by default), filter and report to every profile.
+
+    With ``report.streaming`` (the default) messages go out while the
+    sources are still downloading, the best of each linger window first;
+    otherwise the report is built once every job was filtered, best first.
+    ``ranking.enabled: false`` keeps the order jobs qualify in. When
+    ``deadline.run_secs`` runs out, the jobs fetched so far are reported and
+    the rest wait for the next run.
+    """
+    metrics.start_run()
+    try:
+        # Chunks left over from an interrupted run go out before anything else.
+        with metrics.stage("deliver", phase="pending"):
+            runtime.deliver()
+
+        runtime.refresh_queued()
         try:
-            limit_value = int(limit)
-            valid_jobs = valid_jobs[:limit_value]
-        except (TypeError, ValueError):
-            pass
+            if runtime.report_config.get("streaming", True):
+                _report_live(runtime, tasks)
+            else:
+                _report_batch(runtime, tasks)
+        finally:
+            if runtime.dedup is not None:
+                runtime.dedup.forget_pending()
+            if runtime.normalizer is not None:
+                runtime.normalizer.flush()
+            if runtime.watermarks is not None:
+                runtime.watermarks.flush()
+            if runtime.breakers is not None:
+                runtime.breakers.flush()
+            if runtime.archive is not None:
+                runtime.archive.flush()
+            if runtime.response_cache is not None:
+                runtime.response_cache.flush()
+
+        with metrics.stage("deliver", phase="report"):
+            runtime.deliver()
+    finally:
+        metrics.finish_run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Busca vacantes y envía un resumen por Telegram.")
+    parser.add_argument("--config", default=CONFIG_PATH, help="ruta de config.yaml")
+    parser.add_argument(
+        "--daemon", action="store_true", help="se queda corriendo y consulta cada fuente según su intervalo"
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.daemon:
+        from daemon import run_daemon
 
-    send_report(valid_jobs)
+        run_daemon(args.config)
+        return
 
-    for job in valid_jobs:
-        job_url = job.get("url") or ""
-        if job_url:
-            storage.mark_seen(job_url, seen_jobs)
+    runtime = Runtime(load_config(args.config))
+    try:
+        run_once(runtime)
+    finally:
+        runtime.close()
 
 
 if __name__ == "__main__":
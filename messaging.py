@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Tuple
 
-from notify.telegram import send_message
+from notify.outbox import Outbox
 
 TECH_KEYWORDS = [
     "Python",
@@ -52,21 +52,77 @@ def format_job_entry(job: dict) -> str:
 
 def chunk_text(text: str, max_length: int = 3500) -> List[str]:
     chunks: List[str] = []
-    current = ""
+    current: List[str] = []
+    length = 0
     for line in text.split("\n"):
-        if len(current) + len(line) + 1 > max_length:
-            chunks.append(current.rstrip())
-            current = ""
-        current += line + "\n"
-    if current.strip():
-        chunks.append(current.rstrip())
+        if length + len(line) + 1 > max_length:
+            chunks.append("\n".join(current).rstrip())
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current and "\n".join(current).strip():
+        chunks.append("\n".join(current).rstrip())
     return chunks
 
 
-def send_report(jobs: List[dict]) -> None:
+class ChunkBuilder:
+    """Packs job entries into messages one job at a time.
+
+    ``add`` returns the messages a job completed, ``flush`` the one still
+    open; each message is ``(text, urls of the jobs it carries)``.
+    """
+
+    def __init__(self, max_length: int = 3500) -> None:
+        self.max_length = max_length
+        self._entries: List[str] = []
+        self._urls: List[str] = []
+        self._length = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, job: dict) -> List[Tuple[str, List[str]]]:
+        entry = format_job_entry(job)
+        url = job.get("url") or ""
+        if len(entry) > self.max_length:
+            # The open message goes first so jobs keep their order.
+            chunks = self.flush()
+            pieces = chunk_text(entry, self.max_length)
+            chunks.extend((piece, []) for piece in pieces[:-1])
+            chunks.append((pieces[-1], [url] if url else []))
+            return chunks
+        chunks = []
+        if self._entries and self._length + 1 + len(entry) > self.max_length:
+            chunks = self.flush()
+        self._entries.append(entry)
+        if url:
+            self._urls.append(url)
+        self._length += len(entry) + (1 if self._length else 0)
+        return chunks
+
+    def flush(self) -> List[Tuple[str, List[str]]]:
+        if not self._entries:
+            return []
+        chunk = ("\n".join(self._entries).rstrip(), self._urls)
+        self._entries, self._urls, self._length = [], [], 0
+        return [chunk]
+
+
+def build_chunks(jobs: List[dict], max_length: int = 3500) -> List[Tuple[str, List[str]]]:
+    """Pack job entries into messages, keeping the job URLs each message carries."""
+    builder = ChunkBuilder(max_length)
+    chunks: List[Tuple[str, List[str]]] = []
+    for job in jobs:
+        chunks.extend(builder.add(job))
+    chunks.extend(builder.flush())
+    return chunks
+
+
+def send_report(jobs: List[dict], outbox: Outbox, chat_ids: List[str], profile: str = "") -> None:
+    """Queue the report of ``profile`` for every chat; ``notify.outbox.deliver`` sends it."""
     if not jobs:
         return
-    entries = [format_job_entry(job) for job in jobs]
-    report_text = "\n".join(entries)
-    for chunk in chunk_text(report_text):
-        send_message(chunk)
+    if not chat_ids:
+        raise ValueError("TELEGRAM_CHAT_ID es requerido para enviar mensajes")
+    chunks = build_chunks(jobs)
+    outbox.enqueue(((chat_id, text, urls) for chat_id in chat_ids for text, urls in chunks), profile)
@@ -0,0 +1,197 @@
+"""Run instrumentation: stage timings, per-source and per-host counters."""
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JSON_LOG = "metrics.jsonl"
+DEFAULT_TEXTFILE = "botjobs.prom"
+DEFAULT_PROFILE_DIR = "profiles"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_NOOP = contextlib.nullcontext()
+
+
+class Recorder:
+    def __init__(self, metrics_config: Dict) -> None:
+        self.json_log = metrics_config.get("json_log", DEFAULT_JSON_LOG)
+        self.textfile = metrics_config.get("textfile", DEFAULT_TEXTFILE)
+        self.profile_stages = set(metrics_config.get("profile") or [])
+        self.profile_dir = metrics_config.get("profile_dir", DEFAULT_PROFILE_DIR)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self.counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+            self.sources: List[Dict[str, Any]] = []
+
+    def add(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted((label, str(text)) for label, text in labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def add_source(self, source: str, key: str, seconds: float, jobs: int, error: Optional[str]) -> None:
+        event = {"source": source, "key": key, "seconds": round(seconds, 4), "jobs": jobs, "error": error}
+        with self._lock:
+            self.sources.append(event)
+        self.add("source_fetch_seconds_total", seconds, source=source, key=key)
+        self.add("source_jobs_total", jobs, source=source, key=key)
+        if error:
+            self.add("source_errors_total", 1, source=source, key=key)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **labels: str) -> Iterator[None]:
+        profiler = cProfile.Profile() if name in self.profile_stages else None
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread.
+                profiler = None
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                self._dump_profile(name, profiler)
+            self.add("stage_seconds_total", elapsed, stage=name, **labels)
+            self.add("stage_calls_total", 1, stage=name, **labels)
+
+    def _dump_profile(self, name: str, profiler: cProfile.Profile) -> None:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.profile_dir, f"{name}-{stamp}-{threading.get_ident()}.prof")
+        profiler.dump_stats(path)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            sources = list(self.sources)
+        grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for (name, labels), value in sorted(counters.items()):
+            grouped[name].append({**dict(labels), "value": round(value, 4)})
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(time.perf_counter() - self._started, 4),
+            "metrics": dict(grouped),
+            "sources": sources,
+        }
+
+    def prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self.counters)
+        lines = [
+            "# TYPE botjobs_run_timestamp_seconds gauge",
+            f"botjobs_run_timestamp_seconds {self.started_at:.3f}",
+            "# TYPE botjobs_run_duration_seconds gauge",
+            f"botjobs_run_duration_seconds {time.perf_counter() - self._started:.4f}",
+        ]
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            metric = f"botjobs_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            if labels:
+                rendered = ",".join(f'{label}="{_escape(text)}"' for label, text in labels)
+                lines.append(f"{metric}{{{rendered}}} {_format(value)}")
+            else:
+                lines.append(f"{metric} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        if self.json_log:
+            with open(self.json_log, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(self.summary(), ensure_ascii=False) + "\n")
+        if self.textfile:
+            # Written next to the target and renamed so the node exporter
+            # never reads a half-written file.
+            temporary = f"{self.textfile}.tmp"
+            with open(temporary, "w", encoding="utf-8") as handle:
+                handle.write(self.prometheus())
+            os.replace(temporary, self.textfile)
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_recorder: Optional[Recorder] = None
+
+
+def configure(metrics_config: Optional[Dict]) -> Optional[Recorder]:
+    """Enable or disable instrumentation from the ``metrics`` config section."""
+    global _recorder
+    metrics_config = metrics_config or {}
+    _recorder = Recorder(metrics_config) if metrics_config.get("enabled") else None
+    return _recorder
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def stage(name: str, **labels: str):
+    """Time the ``with`` block as stage ``name``; a no-op while disabled."""
+    recorder = _recorder
+    if recorder is None:
+        return _NOOP
+    return recorder.stage(name, **labels)
+
+
+def incr(name: str, value: float = 1, **labels: str) -> None:
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add(name, value, **labels)
+
+
+def record_source(source: str, key: str, seconds: float, jobs: int, error: Optional[str] = None) -> None:
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add_source(source, key, seconds, jobs, error)
+
+
+def record_http(method: str, url: str, status: int, seconds: float, size: Optional[int]) -> None:
+    recorder = _recorder
+    if recorder is None:
+        return
+    host = urlparse(url).netloc.lower()
+    recorder.add("http_requests_total", 1, host=host, method=method, status=str(status))
+    recorder.add("http_request_seconds_total", seconds, host=host)
+    if size:
+        recorder.add("http_response_bytes_total", size, host=host)
+
+
+def start_run() -> None:
+    recorder = _recorder
+    if recorder is not None:
+        recorder.reset()
+
+
+def finish_run() -> None:
+    recorder = _recorder
+    if recorder is None:
+        return
+    try:
+        recorder.export()
+    except OSError:
+        logger.exception("No se pudieron escribir las métricas")
@@ -0,0 +1,129 @@
+"""HTML-to-text normalization of job descriptions, done once per posting."""
+import hashlib
+import html
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from filters import fold_text
+import metrics
+
+
+DEFAULT_CACHE_PATH = "text_cache.sqlite3"
+DEFAULT_EXPIRE_DAYS = 30
+FLUSH_EVERY = 500
+
+_TAG = re.compile(r"<[^>]*>")
+_SPACE = re.compile(r"\s+")
+
+
+def _fold(text: str) -> str:
+    return _SPACE.sub(" ", fold_text(text)).strip()
+
+
+def html_to_text(raw: str) -> str:
+    """Lowercase, accent-folded plain text of ``raw`` HTML (escaped or not)."""
+    if not raw:
+        return ""
+    if "<" not in raw and "&" not in raw:
+        return _fold(raw)
+    # The first pass turns escaped markup into tags; entities that were
+    # inside the escaped markup are only readable once the tags are gone.
+    text = _TAG.sub(" ", html.unescape(raw))
+    if "&" in text:
+        text = html.unescape(text)
+    return _fold(text)
+
+
+def _digest(raw: str) -> str:
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TextNormalizer:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS) -> None:
+        self.expire_days = expire_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS texts ("
+            " digest TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS texts_used_at ON texts (used_at)")
+        self._conn.commit()
+        # Only the digests stay in memory; a description never seen before is
+        # parsed without a query, which would release the GIL mid-loop.
+        self._known: Set[str] = {row[0] for row in self._conn.execute("SELECT digest FROM texts")}
+        # Written in one transaction by ``flush`` instead of one per posting.
+        self._new: Dict[str, str] = {}
+        self._hits: List[str] = []
+
+    @classmethod
+    def from_config(cls, normalize_config: Optional[Dict]) -> Optional["TextNormalizer"]:
+        normalize_config = normalize_config or {}
+        if not normalize_config.get("enabled", True):
+            return None
+        return cls(
+            normalize_config.get("cache_path", DEFAULT_CACHE_PATH),
+            normalize_config.get("expire_days", DEFAULT_EXPIRE_DAYS),
+        )
+
+    def text_of(self, raw: str) -> str:
+        """``html_to_text(raw)``, answered from the cache when ``raw`` was seen before."""
+        if not raw or ("<" not in raw and "&" not in raw):
+            return html_to_text(raw)
+        digest = _digest(raw)
+        with self._lock:
+            text = self._new.get(digest)
+            if text is None and digest in self._known:
+                row = self._conn.execute("SELECT text FROM texts WHERE digest = ?", (digest,)).fetchone()
+                if row is not None:
+                    text = row[0]
+                    self._hits.append(digest)
+        if text is not None:
+            metrics.incr("normalize_total", result="cached")
+            return text
+        text = html_to_text(raw)
+        metrics.incr("normalize_total", result="parsed")
+        with self._lock:
+            self._new[digest] = text
+            self._known.add(digest)
+            pending = len(self._new)
+        if pending >= FLUSH_EVERY:
+            self.flush()
+        return text
+
+    def normalize(self, job: Dict[str, str]) -> None:
+        """Replace the description of ``job`` with its normalized text."""
+        description = job.get("description")
+        if description:
+            job["description"] = self.text_of(description)
+
+    def flush(self) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO texts (digest, text, used_at) VALUES (?, ?, ?)",
+                ((digest, text, now) for digest, text in self._new.items()),
+            )
+            self._conn.executemany(
+                "UPDATE texts SET used_at = ? WHERE digest = ?", ((now, digest) for digest in self._hits)
+            )
+            self._new.clear()
+            self._hits.clear()
+
+    def prune(self) -> None:
+        if not self.expire_days:
+            return
+        cutoff = time.time() - float(self.expire_days) * 86400
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM texts WHERE used_at < ?", (cutoff,))
+            self._known = {row[0] for row in self._conn.execute("SELECT digest FROM texts")}
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
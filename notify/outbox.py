@@ -0,0 +1,190 @@
+"""Persistent outbound queue for Telegram messages."""
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+from http_client import TokenBucket
+from notify.telegram import TelegramRateLimited, send_message
+
+
+DEFAULT_OUTBOX_PATH = "outbox.sqlite3"
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_FAILED_EXPIRE_DAYS = 7
+DEFAULT_CHAT_INTERVAL = 1.0
+DEFAULT_GLOBAL_RATE = 25.0
+DEFAULT_MAX_RETRY_WAIT = 120.0
+
+
+class Outbox:
+    def __init__(
+        self,
+        path: str = DEFAULT_OUTBOX_PATH,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        failed_expire_days: Optional[float] = DEFAULT_FAILED_EXPIRE_DAYS,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.failed_expire_days = failed_expire_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " chat_id TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " urls TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " profile TEXT NOT NULL DEFAULT '')"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(messages)")]
+        if "profile" not in columns:
+            self._conn.execute("ALTER TABLE messages ADD COLUMN profile TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_chat_status ON messages (chat_id, status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_status_created ON messages (status, created_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, telegram_config: Optional[Dict]) -> "Outbox":
+        telegram_config = telegram_config or {}
+        return cls(
+            telegram_config.get("outbox_path", DEFAULT_OUTBOX_PATH),
+            int(telegram_config.get("max_attempts", DEFAULT_MAX_ATTEMPTS)),
+            telegram_config.get("failed_expire_days", DEFAULT_FAILED_EXPIRE_DAYS),
+        )
+
+    def enqueue(self, messages: Iterable[Tuple[str, str, List[str]]], profile: str = "") -> None:
+        """Queue ``(chat_id, text, urls)`` messages of ``profile`` in one transaction."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO messages (chat_id, text, urls, created_at, profile) VALUES (?, ?, ?, ?, ?)",
+                ((str(chat_id), text, json.dumps(urls), now, profile) for chat_id, text, urls in messages),
+            )
+
+    def pending(self, chat_id: str) -> List[Tuple[int, str, List[str], str]]:
+        """``(id, text, urls, profile)`` of the messages still to send to ``chat_id``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, text, urls, profile FROM messages WHERE chat_id = ? AND status = 'pending' ORDER BY id",
+                (chat_id,),
+            ).fetchall()
+        return [(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def pending_chats(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT chat_id FROM messages WHERE status = 'pending'").fetchall()
+        return [row[0] for row in rows]
+
+    def _urls(self, statuses: Tuple[str, ...], profile: Optional[str]) -> Set[str]:
+        urls: Set[str] = set()
+        query = f"SELECT urls FROM messages WHERE status IN ({', '.join('?' * len(statuses))})"
+        params: Tuple = statuses
+        if profile is not None:
+            query += " AND profile = ?"
+            params += (profile,)
+        with self._lock:
+            for (raw,) in self._conn.execute(query, params):
+                urls.update(json.loads(raw))
+        return urls
+
+    def pending_urls(self, profile: Optional[str] = None) -> Set[str]:
+        """URLs waiting to be sent, for one ``profile`` or for all of them."""
+        return self._urls(("pending",), profile)
+
+    def queued_urls(self, profile: Optional[str] = None) -> Set[str]:
+        """URLs waiting to be sent or whose message failed; neither should be queued again.
+
+        A failed message keeps its jobs out of new reports until ``prune``
+        drops it, ``failed_expire_days`` after it was queued.
+        """
+        return self._urls(("pending", "failed"), profile)
+
+    def mark_delivered(self, message_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+
+    def record_failure(self, message_id: int, permanent: bool = False) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE messages SET attempts = attempts + 1 WHERE id = ?", (message_id,))
+            self._conn.execute(
+                "UPDATE messages SET status = 'failed' WHERE id = ? AND (? OR attempts >= ?)",
+                (message_id, int(permanent), self.max_attempts),
+            )
+
+    def prune(self) -> None:
+        """Drop failed messages older than ``failed_expire_days``; their jobs may then be reported once more."""
+        if not self.failed_expire_days:
+            return
+        cutoff = time.time() - float(self.failed_expire_days) * 86400
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE status = 'failed' AND created_at < ?", (cutoff,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _is_permanent(error: requests.RequestException) -> bool:
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500
+
+
+def deliver(
+    outbox: Outbox,
+    on_delivered: Optional[Callable[[List[str], str], None]] = None,
+    telegram_config: Optional[Dict] = None,
+    bot_token: Optional[str] = None,
+) -> int:
+    """Send every pending message, one worker per chat. Returns how many were sent.
+
+    ``on_delivered(urls, profile)`` runs after each confirmed message.
+
+    A chat stops at its first network or server error so its messages stay in
+    order; they are retried on the next call. 4xx answers other than 429 mark
+    the message as failed.
+    """
+    telegram_config = telegram_config or {}
+    chat_interval = float(telegram_config.get("chat_interval", DEFAULT_CHAT_INTERVAL))
+    max_retry_wait = float(telegram_config.get("max_retry_wait", DEFAULT_MAX_RETRY_WAIT))
+    global_bucket = TokenBucket(float(telegram_config.get("global_rate", DEFAULT_GLOBAL_RATE)))
+    callback_lock = threading.Lock()
+
+    def _drain(chat_id: str) -> int:
+        sent = 0
+        last_sent = 0.0
+        for message_id, text, urls, profile in outbox.pending(chat_id):
+            while True:
+                time.sleep(max(0.0, last_sent + chat_interval - time.monotonic()))
+                global_bucket.acquire()
+                try:
+                    send_message(text, bot_token, chat_id)
+                except TelegramRateLimited as error:
+                    if error.retry_after > max_retry_wait:
+                        return sent
+                    time.sleep(error.retry_after)
+                    continue
+                except requests.RequestException as error:
+                    outbox.record_failure(message_id, permanent=_is_permanent(error))
+                    if _is_permanent(error):
+                        break
+                    return sent
+                last_sent = time.monotonic()
+                outbox.mark_delivered(message_id)
+                sent += 1
+                if on_delivered is not None:
+                    with callback_lock:
+                        on_delivered(urls, profile)
+                break
+        return sent
+
+    chats = outbox.pending_chats()
+    if not chats:
+        return 0
+    with ThreadPoolExecutor(max_workers=len(chats)) as pool:
+        return sum(future.result() for future in [pool.submit(_drain, chat_id) for chat_id in chats])
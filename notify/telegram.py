@@ -1,10 +1,38 @@
 import os
-from typing import Optional
+from typing import List, Optional
 
 import requests
 
+from http_client import get_client
+
 
 TELEGRAM_API_TEMPLATE = "https://api.telegram.org/bot{token}/sendMessage"
+DEFAULT_RETRY_AFTER = 5
+
+
+class TelegramRateLimited(requests.HTTPError):
+    """Telegram answered 429; ``retry_after`` is how many seconds it asked to wait."""
+
+    def __init__(self, retry_after: float, response: Optional[requests.Response] = None) -> None:
+        super().__init__(f"Telegram pidió esperar {retry_after} s", response=response)
+        self.retry_after = retry_after
+
+
+def _retry_after(response: requests.Response) -> float:
+    try:
+        return float((response.json().get("parameters") or {})["retry_after"])
+    except (ValueError, AttributeError, TypeError, KeyError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+    except ValueError:
+        return float(DEFAULT_RETRY_AFTER)
+
+
+def default_chat_ids() -> List[str]:
+    """Chat IDs from ``TELEGRAM_CHAT_ID``, which may list several separated by commas."""
+    raw = os.getenv("TELEGRAM_CHAT_ID") or ""
+    return [chat_id.strip() for chat_id in raw.split(",") if chat_id.strip()]
 
 
 def send_message(text: str, bot_token: Optional[str] = None, chat_id: Optional[str] = None) -> None:
@@ -20,5 +48,8 @@ def send_message(text: str, bot_token: Optional[str] = None, chat_id: Optional[s
         "disable_web_page_preview": True,
     }
     url = TELEGRAM_API_TEMPLATE.format(token=token)
-    response = requests.post(url, json=payload, timeout=15)
+    # The outbox waits out 429s itself, within ``max_retry_wait``.
+    response = get_client().post(url, json=payload, timeout=15, retries=0)
+    if response.status_code == 429:
+        raise TelegramRateLimited(_retry_after(response), response)
     response.raise_for_status()
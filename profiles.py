@@ -0,0 +1,164 @@
+"""Several people's filters matched against one fetch pass."""
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from filters import CompiledFilter, _MEMO_LIMIT, fold_text
+from notify.telegram import default_chat_ids
+
+
+DEFAULT_PROFILE = ""
+
+
+@dataclass
+class Profile:
+    name: str
+    filter_config: Dict
+    chat_ids: List[str]
+    limit: Optional[int] = None
+    job_filter: CompiledFilter = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.job_filter = CompiledFilter(self.filter_config)
+
+
+def _limit(value) -> Optional[int]:
+    try:
+        return int(value) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def load_profiles(config: Dict) -> List[Profile]:
+    """Profiles from ``config["profiles"]``, or the default profile."""
+    telegram_config = config.get("telegram") or {}
+    default_chats = [str(chat_id) for chat_id in telegram_config.get("chat_ids") or []] or default_chat_ids()
+    entries = config.get("profiles") or []
+    if not entries:
+        filter_config = config.get("filters") or {}
+        return [Profile(DEFAULT_PROFILE, filter_config, default_chats, _limit(filter_config.get("limite_envio")))]
+
+    profiles = []
+    for position, entry in enumerate(entries):
+        filter_config = entry.get("filters") or {}
+        chat_ids = entry.get("chat_ids") or ([entry["chat_id"]] if entry.get("chat_id") else default_chats)
+        profiles.append(
+            Profile(
+                str(entry.get("name") or f"perfil{position + 1}"),
+                filter_config,
+                [str(chat_id) for chat_id in chat_ids],
+                _limit(entry.get("limite_envio", filter_config.get("limite_envio"))),
+            )
+        )
+    return profiles
+
+
+class _TermIndex:
+    """Which profiles have at least one of their terms in a text."""
+
+    def __init__(self, term_lists: Iterable[Iterable[str]]) -> None:
+        owners: Dict[str, int] = {}
+        for position, terms in enumerate(term_lists):
+            for term in terms or []:
+                folded = fold_text(str(term)) if term else ""
+                if folded:
+                    owners[folded] = owners.get(folded, 0) | (1 << position)
+        # The lookahead reports, at each position, only the longest term that
+        # starts there; shorter terms that are prefixes of it match there too,
+        # so each term also carries the profiles of its prefixes.
+        self._masks = {
+            term: _union(mask for other, mask in owners.items() if term.startswith(other))
+            for term in owners
+        }
+        self._pattern: Optional[Pattern[str]] = None
+        if owners:
+            alternation = "|".join(re.escape(term) for term in sorted(owners, key=len, reverse=True))
+            self._pattern = re.compile(f"(?=({alternation}))")
+
+    def profiles_in(self, folded: str) -> int:
+        if self._pattern is None:
+            return 0
+        mask = 0
+        for match in self._pattern.finditer(folded):
+            mask |= self._masks[match.group(1)]
+        return mask
+
+
+def _union(masks: Iterable[int]) -> int:
+    result = 0
+    for mask in masks:
+        result |= mask
+    return result
+
+
+class ProfileMatcher:
+    def __init__(self, profiles: List[Profile]) -> None:
+        self.profiles = profiles
+        self.all_profiles = (1 << len(profiles)) - 1
+        self._locations = _TermIndex(profile.filter_config.get("ubicaciones") for profile in profiles)
+        self._titles = _TermIndex(profile.filter_config.get("titulos_permitidos") for profile in profiles)
+        self._location_memo: Dict[str, int] = {}
+        self._title_memo: Dict[str, int] = {}
+
+    def _memo(self, memo: Dict[str, int], index: _TermIndex, text: str) -> int:
+        mask = memo.get(text)
+        if mask is None:
+            mask = index.profiles_in(fold_text(text))
+            if len(memo) >= _MEMO_LIMIT:
+                memo.clear()
+            memo[text] = mask
+        return mask
+
+    def candidates(self, title: str, location: str) -> Tuple[int, Optional[str]]:
+        """Profiles whose locations and titles both match, or the rule none passed."""
+        mask = self._memo(self._location_memo, self._locations, location)
+        if not mask:
+            return 0, "location"
+        mask &= self._memo(self._title_memo, self._titles, title)
+        if not mask:
+            return 0, "title"
+        return mask, None
+
+    def _each(self, mask: int) -> Iterable[Tuple[int, Profile]]:
+        for position, profile in enumerate(self.profiles):
+            if mask & (1 << position):
+                yield position, profile
+
+    def prefilter(self, title: str, location: str) -> Optional[str]:
+        """``CompiledFilter.prefilter`` over every profile: ``None`` if any may accept."""
+        mask, rejection = self.candidates(title, location)
+        if rejection is not None:
+            return rejection
+        for _, profile in self._each(mask):
+            rejection = profile.job_filter.prefilter(title, location)
+            if rejection is None:
+                return None
+        return rejection
+
+    def match(
+        self, job: Dict[str, str], prepare: Optional[Callable[[Dict[str, str]], None]] = None
+    ) -> Tuple[int, Optional[str]]:
+        """Bitmask of the profiles that accept ``job``.
+
+        When none does, the second item names the rule that rejected it for
+        the first candidate profile, as ``CompiledFilter.rejection`` would.
+        ``prepare`` runs on jobs that pass some profile's location and title,
+        before their description is read.
+        """
+        mask, rejection = self.candidates(job.get("title") or "", job.get("location") or "")
+        if rejection is not None:
+            return 0, rejection
+        if prepare is not None:
+            prepare(job)
+        accepted = 0
+        first_rejection = None
+        for position, profile in self._each(mask):
+            rejection = profile.job_filter.rejection(job)
+            if rejection is None:
+                accepted |= 1 << position
+            elif first_rejection is None:
+                first_rejection = rejection
+        return accepted, (None if accepted else first_rejection)
+
+    def names(self, mask: int) -> List[str]:
+        return [profile.name for _, profile in self._each(mask)]
@@ -0,0 +1,132 @@
+"""TF-IDF relevance ranking of the reports."""
+import heapq
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from filters import fold_text
+from messaging import TECH_KEYWORDS
+from normalize import html_to_text
+from profiles import Profile
+
+
+DEFAULT_TITLE_WEIGHT = 3
+DEFAULT_MARGIN = 5
+
+TermCounts = Dict[str, int]
+# (task index, job, profile mask, term counts)
+Candidate = Tuple[int, Dict[str, str], int, TermCounts]
+
+
+def _profile_weights(profile: Profile) -> Dict[str, float]:
+    config = profile.filter_config or {}
+    keywords = config.get("palabras_clave")
+    if keywords is None:
+        keywords = TECH_KEYWORDS
+    if not isinstance(keywords, dict):
+        keywords = {keyword: 1.0 for keyword in keywords}
+    weights: Dict[str, float] = {}
+    for term in list(config.get("titulos_permitidos") or []) + list(config.get("niveles") or []):
+        weights[fold_text(str(term))] = 1.0
+    for term, weight in keywords.items():
+        weights[fold_text(str(term))] = float(weight)
+    weights.pop("", None)
+    return weights
+
+
+def compile_vocabulary(terms: Iterable[str]) -> Optional[Pattern[str]]:
+    terms = sorted(set(terms), key=len, reverse=True)
+    if not terms:
+        return None
+    alternation = "|".join(re.escape(term) for term in terms)
+    return re.compile(rf"(?<![a-z0-9])(?:{alternation})(?![a-z0-9])")
+
+
+def count_terms(pattern: Optional[Pattern[str]], text: str, weight: int = 1) -> TermCounts:
+    """How often each vocabulary term appears in ``text`` (already folded), times ``weight``."""
+    counts: TermCounts = {}
+    if pattern is None or not text:
+        return counts
+    for term in pattern.findall(text):
+        counts[term] = counts.get(term, 0) + weight
+    return counts
+
+
+def merge_counts(first: TermCounts, second: TermCounts) -> TermCounts:
+    merged = dict(first)
+    for term, count in second.items():
+        merged[term] = merged.get(term, 0) + count
+    return merged
+
+
+class RelevanceScorer:
+    def __init__(
+        self, profiles: List[Profile], title_weight: int = DEFAULT_TITLE_WEIGHT, margin: int = DEFAULT_MARGIN
+    ) -> None:
+        self.profiles = profiles
+        self.title_weight = title_weight
+        self.margin = max(0, margin)
+        self._weights = [_profile_weights(profile) for profile in profiles]
+        self.pattern = compile_vocabulary(term for weights in self._weights for term in weights)
+        self.documents = 0
+        self._frequencies: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, profiles: List[Profile], ranking_config: Optional[Dict]) -> Optional["RelevanceScorer"]:
+        ranking_config = ranking_config or {}
+        if not ranking_config.get("enabled", True):
+            return None
+        return cls(
+            profiles,
+            int(ranking_config.get("title_weight", DEFAULT_TITLE_WEIGHT)),
+            int(ranking_config.get("margin", DEFAULT_MARGIN)),
+        )
+
+    def count(
+        self, job: Dict[str, str], description_counts: Optional[TermCounts] = None, normalized: bool = False
+    ) -> TermCounts:
+        """Term counts of ``job``; ``description_counts`` when a worker process already counted its description.
+
+        ``normalized`` says the description already went through ``html_to_text``.
+        """
+        if description_counts is None:
+            description = job.get("description") or ""
+            description_counts = count_terms(self.pattern, description if normalized else html_to_text(description))
+        title_counts = count_terms(self.pattern, fold_text(job.get("title") or ""), self.title_weight)
+        return merge_counts(description_counts, title_counts)
+
+    def observe(self, counts: TermCounts) -> None:
+        """Add a candidate to the document frequencies."""
+        self.documents += 1
+        for term in counts:
+            self._frequencies[term] = self._frequencies.get(term, 0) + 1
+
+    def score(self, counts: TermCounts, position: int) -> float:
+        weights = self._weights[position]
+        total = 0.0
+        for term, count in counts.items():
+            weight = weights.get(term)
+            if weight:
+                idf = math.log((1 + self.documents) / (1 + self._frequencies.get(term, 0))) + 1
+                total += weight * (1 + math.log(count)) * idf
+        return total
+
+    def top_k(self, candidates: Iterable[Candidate]) -> List[List[Dict[str, str]]]:
+        """Best candidates of each profile, best first, at most ``limit + margin`` per limited profile.
+
+        Each limited profile keeps a heap of that size, so only those
+        candidates' links get checked; ties keep the order of ``candidates``.
+        """
+        heaps: List[List[Tuple[float, int, Any]]] = [[] for _ in self.profiles]
+        capacities = [profile.limit + self.margin if profile.limit else None for profile in self.profiles]
+        for order, (_, job, mask, counts) in enumerate(candidates):
+            for position, heap in enumerate(heaps):
+                if not mask & (1 << position):
+                    continue
+                item = (self.score(counts, position), -order, job)
+                capacity = capacities[position]
+                if capacity is None or len(heap) < capacity:
+                    heapq.heappush(heap, item)
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+        return [[job for _, _, job in sorted(heap, key=lambda item: item[:2], reverse=True)] for heap in heaps]
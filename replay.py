@@ -0,0 +1,128 @@
+"""Offline re-filtering of the archived postings.
+
+    python replay.py --config otra_config.yaml --since 90
+"""
+import argparse
+import time
+from collections import Counter
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from archive import JobArchive
+from main import CONFIG_PATH, load_config
+from profiles import Profile, ProfileMatcher, load_profiles
+from ranking import Candidate, RelevanceScorer
+from sources.record import JobRecord
+
+
+# (score, source, job); the score is 0 without ranking.
+Result = Tuple[float, str, JobRecord]
+
+
+def replay(
+    config: Dict,
+    archive: JobArchive,
+    since_days: Optional[float] = None,
+    query: Optional[str] = None,
+    sources: Optional[List[str]] = None,
+    unlimited: bool = False,
+) -> Tuple[List[Profile], List[List[Result]], Counter]:
+    """Run the filters and ranking of ``config`` over ``archive``.
+
+    Returns the profiles, each profile's accepted postings (up to its
+    ``limite_envio`` unless ``unlimited``) and how many postings each rule
+    rejected, with ``"accepted"`` counting the ones some profile took and
+    ``"listing"`` the ones skipped because they were archived without their
+    description (Greenhouse postings the two-phase fetch prefiltered).
+    """
+    profiles = load_profiles(config)
+    if unlimited:
+        profiles = [replace(profile, limit=None) for profile in profiles]
+    matcher = ProfileMatcher(profiles)
+    scorer = RelevanceScorer.from_config(profiles, config.get("ranking"))
+    verdicts: Counter = Counter()
+
+    def keep(title: str, location: str) -> bool:
+        _, rejection = matcher.candidates(title, location)
+        if rejection is not None:
+            verdicts[rejection] += 1
+        return rejection is None
+
+    since = time.time() - since_days * 86400 if since_days else None
+    candidates: List[Candidate] = []
+    origin: Dict[int, str] = {}
+    # Judging them on an empty description would accept what the text rules reject.
+    listings = archive.count_listings(since, query, sources)
+    if listings:
+        verdicts["listing"] = listings
+    for source, job in archive.iter_postings(since, query, sources, keep, listings=False):
+        mask, rejection = matcher.match(job)
+        if not mask:
+            verdicts[rejection] += 1
+            continue
+        verdicts["accepted"] += 1
+        # The archive hands descriptions back already normalized.
+        counts = scorer.count(job, normalized=True) if scorer is not None else {}
+        if scorer is not None:
+            scorer.observe(counts)
+        origin[id(job)] = source
+        candidates.append((len(candidates), job, mask, counts))
+
+    if scorer is not None:
+        counts_of = {id(job): counts for _, job, _, counts in candidates}
+        results = [
+            [(scorer.score(counts_of[id(job)], position), origin[id(job)], job) for job in jobs]
+            for position, jobs in enumerate(scorer.top_k(candidates))
+        ]
+    else:
+        results = [
+            [(0.0, origin[id(job)], job) for _, job, mask, _ in candidates if mask & (1 << position)]
+            for position in range(len(profiles))
+        ]
+        results = [
+            profile_results[: profile.limit] if profile.limit else profile_results
+            for profile, profile_results in zip(profiles, results)
+        ]
+    return profiles, results, verdicts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vuelve a filtrar las vacantes archivadas sin consultar las fuentes.")
+    parser.add_argument("--config", default=CONFIG_PATH, help="ruta de config.yaml con los filtros a probar")
+    parser.add_argument("--since", type=float, metavar="DIAS", help="solo vacantes descargadas en los últimos DIAS días")
+    parser.add_argument("--query", help='búsqueda de texto completo (FTS5), p. ej. "python AND django"')
+    parser.add_argument("--source", action="append", help="solo esta fuente (greenhouse, lever, external, apify_indeed)")
+    parser.add_argument("--all", action="store_true", help="muestra todas las aceptadas, sin aplicar limite_envio")
+    args = parser.parse_args()
+
+    load_dotenv()
+    config = load_config(args.config)
+    archive = JobArchive.from_config({**(config.get("archive") or {}), "enabled": True})
+    started = time.perf_counter()
+    try:
+        profiles, results, verdicts = replay(config, archive, args.since, args.query, args.source, args.all)
+    finally:
+        archive.close()
+    elapsed = time.perf_counter() - started
+
+    skipped = verdicts.pop("listing", 0)
+    reviewed = sum(verdicts.values())
+    print(f"{reviewed} vacantes revisadas en {elapsed:.2f} s; {verdicts['accepted']} aceptadas")
+    if skipped:
+        print(
+            f"aviso: {skipped} vacantes se archivaron sin descripción (el prefiltro de Greenhouse las descartó) "
+            "y no se revisaron"
+        )
+    rejected = ", ".join(f"{rule} {count}" for rule, count in verdicts.most_common() if rule != "accepted")
+    if rejected:
+        print(f"descartadas por regla: {rejected}")
+    for profile, profile_results in zip(profiles, results):
+        print(f"\nPerfil {profile.name or '(predeterminado)'}: {len(profile_results)} vacantes")
+        for score, source, job in profile_results:
+            print(f"  {score:6.2f}  [{source}] {job.title} | {job.company} | {job.location} | {job.url}")
+
+
+if __name__ == "__main__":
+    main()
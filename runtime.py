@@ -0,0 +1,160 @@
+"""State shared by a one-shot run and the daemon."""
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from archive import JobArchive
+from breakers import CircuitBreakers
+from dedup import DedupIndex
+from fetcher import ConcurrencySettings, DeadlineSettings, FetchTask, build_tasks, wait_idle
+from http_cache import ResponseCache
+import http_client
+import metrics
+from link_cache import LinkCache
+from normalize import TextNormalizer
+from notify.outbox import Outbox, deliver
+from profiles import Profile, ProfileMatcher, load_profiles
+import storage
+from watermarks import WatermarkStore, config_hash
+
+
+logger = logging.getLogger(__name__)
+
+# How long a reload waits for fetch tasks left running by a deadline cut
+# before it closes the stores they write to.
+STRAGGLER_WAIT_SECS = 60
+
+# (attribute, config section, opener) of every store kept on disk.
+_STORES: List[Tuple[str, str, Callable[[Optional[Dict]], Any]]] = [
+    ("link_cache", "link_check", LinkCache.from_config),
+    ("response_cache", "http_cache", ResponseCache.from_config),
+    ("outbox", "telegram", Outbox.from_config),
+    ("dedup", "dedup", DedupIndex.from_config),
+    ("normalizer", "normalize", TextNormalizer.from_config),
+    ("watermarks", "watermarks", WatermarkStore.from_config),
+    ("breakers", "circuit_breaker", CircuitBreakers.from_config),
+    ("archive", "archive", JobArchive.from_config),
+]
+
+
+class Runtime:
+    link_cache: LinkCache
+    response_cache: Optional[ResponseCache]
+    outbox: Outbox
+    dedup: Optional[DedupIndex]
+    normalizer: Optional[TextNormalizer]
+    watermarks: Optional[WatermarkStore]
+    breakers: Optional[CircuitBreakers]
+    archive: Optional[JobArchive]
+
+    def __init__(self, config: Dict) -> None:
+        # One store per profile name, opened the first time a profile is used.
+        self.seen_stores: Dict[str, storage.SeenStore] = {}
+        # The config section each open store was built from, by section name.
+        self._store_configs: Dict[str, Any] = {}
+        # URLs waiting in (or failed out of) each profile's outbox, read at the start of every run.
+        self.queued: List[Set[str]] = []
+        self.apply_config(config)
+
+    def _open_stores(self, config: Dict) -> None:
+        """Open the stores whose config section is new or changed, closing the ones they replace."""
+        sections = ["storage"] + [section for _, section, _ in _STORES]
+        changed = {
+            section
+            for section in sections
+            if section not in self._store_configs or self._store_configs[section] != config.get(section)
+        }
+        if not changed:
+            return
+        if self._store_configs and not wait_idle(STRAGGLER_WAIT_SECS):
+            logger.warning("Hay fuentes que siguen descargando; se cierran sus almacenes de todos modos")
+        if "storage" in changed:
+            for store in self.seen_stores.values():
+                store.close()
+            self.seen_stores = {}
+            self.storage_config = config.get("storage")
+        for attr, section, opener in _STORES:
+            if section in changed:
+                previous = getattr(self, attr, None)
+                if previous is not None:
+                    previous.close()
+                setattr(self, attr, opener(config.get(section)))
+        for section in changed:
+            self._store_configs[section] = config.get(section)
+
+    def apply_config(self, config: Dict) -> None:
+        """Install ``config``; stores whose section changed (a new ``path``, say) are reopened."""
+        self._open_stores(config)
+        self.config = config
+        self.profiles: List[Profile] = load_profiles(config)
+        self.matcher = ProfileMatcher(self.profiles)
+        if self.watermarks is not None:
+            # Verdicts judged with other filters no longer apply.
+            self.watermarks.filters_hash = config_hash(config)
+        self.link_config = config.get("link_check") or {}
+        self.telegram_config = config.get("telegram") or {}
+        self.report_config = config.get("report") or {}
+        self.settings = ConcurrencySettings.from_config(config.get("concurrency"))
+        self.deadline = DeadlineSettings.from_config(config.get("deadline"))
+        metrics.configure(config.get("metrics"))
+        http_client.configure(config.get("http"))
+
+    def seen(self, profile: str = storage.DEFAULT_PROFILE) -> storage.SeenStore:
+        store = self.seen_stores.get(profile)
+        if store is None:
+            store = storage.load_seen_from_config(self.storage_config, profile)
+            self.seen_stores[profile] = store
+        return store
+
+    def refresh_queued(self) -> List[Set[str]]:
+        self.queued = [self.outbox.queued_urls(profile.name) for profile in self.profiles]
+        return self.queued
+
+    def sent_to_everyone(self, url: str) -> bool:
+        """Whether every profile already received ``url`` or has it queued."""
+        if not url or len(self.queued) != len(self.profiles):
+            return False
+        return all(
+            url in queued or storage.already_seen(url, self.seen(profile.name))
+            for profile, queued in zip(self.profiles, self.queued)
+        )
+
+    def build_tasks(self) -> List[FetchTask]:
+        return build_tasks(
+            self.config,
+            os.getenv("APIFY_TOKEN"),
+            self.response_cache,
+            self.matcher,
+            self.watermarks,
+            self.sent_to_everyone,
+            self.archive,
+        )
+
+    def on_delivered(self, urls: List[str], profile: str) -> None:
+        storage.mark_seen_batch(urls, self.seen(profile))
+
+    def deliver(self) -> int:
+        return deliver(self.outbox, self.on_delivered, self.telegram_config)
+
+    def close(self) -> None:
+        self.link_cache.prune()
+        self.link_cache.close()
+        if self.response_cache is not None:
+            self.response_cache.prune()
+            self.response_cache.close()
+        self.outbox.prune()
+        self.outbox.close()
+        if self.dedup is not None:
+            self.dedup.close()
+        if self.normalizer is not None:
+            self.normalizer.prune()
+            self.normalizer.close()
+        if self.watermarks is not None:
+            self.watermarks.close()
+        if self.breakers is not None:
+            self.breakers.close()
+        if self.archive is not None:
+            self.archive.prune()
+            self.archive.close()
+        for store in self.seen_stores.values():
+            store.close()
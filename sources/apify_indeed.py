@@ -2,106 +2,179 @@
 from __future__ import annotations
 
 import time
-from typing import Dict, List, Any
+from typing import Dict, Iterator, Any
 
 import requests
 
+from http_client import get_client, time_left
+import metrics
+from sources.record import JobRecord
+from sources.streaming import iter_json_items
+
 APIFY_BASE_URL = "https://api.apify.com/v2"
 ACT_ID = "apify~indeed-scraper"
-DEFAULT_WAIT_SECS = 2
-MAX_POLLS = 10
+LONG_POLL_SECS = 60
+DEFAULT_MAX_WAIT_SECS = 600
+DEFAULT_READ_RESERVE_SECS = 30
+MIN_BACKOFF_SECS = 1
+MAX_BACKOFF_SECS = 15
+DEFAULT_PAGE_SIZE = 1000
+DATASET_FIELDS = "title,companyName,company,location,url,shareLink,jobDescription,description"
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"}
+# Timed-out runs and runs we stopped waiting for still hold partial results.
+READABLE_STATUSES = {"SUCCEEDED", "TIMED-OUT", "READY", "RUNNING"}
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 def _run_actor(token: str, input_payload: Dict[str, Any]) -> Dict[str, Any] | None:
     url = f"{APIFY_BASE_URL}/acts/{ACT_ID}/runs"
     try:
-        response = requests.post(url, params={"token": token}, json=input_payload, timeout=30)
+        response = get_client().post(url, params={"token": token}, json=input_payload, timeout=30)
         response.raise_for_status()
         return response.json().get("data")
     except requests.RequestException:
         return None
 
 
-def _poll_run(run_id: str, token: str) -> Dict[str, Any] | None:
+def _wait_for_run(run_id: str, token: str, max_wait_secs: float) -> Dict[str, Any] | None:
+    """Long-poll the run until it reaches a terminal status or ``max_wait_secs`` pass.
+
+    Returns the last run data seen, which may still be ``RUNNING``.
+    """
     url = f"{APIFY_BASE_URL}/actor-runs/{run_id}"
-    for _ in range(MAX_POLLS):
+    deadline = time.monotonic() + max_wait_secs
+    backoff = MIN_BACKOFF_SECS
+    data = None
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return data
+        wait_secs = max(1, int(min(LONG_POLL_SECS, remaining)))
+        started = time.monotonic()
         try:
-            response = requests.get(url, params={"token": token}, timeout=20)
+            response = get_client().get(url, params={"token": token, "waitForFinish": wait_secs}, timeout=wait_secs + 15)
             response.raise_for_status()
             data = response.json().get("data") or {}
-        except requests.RequestException:
-            return None
-        status = data.get("status")
-        if status in {"SUCCEEDED", "FAILED", "TIMED_OUT", "ABORTED"}:
-            return data
-        time.sleep(DEFAULT_WAIT_SECS)
-    return data if "status" in locals() else None
+            if data.get("status") in TERMINAL_STATUSES:
+                return data
+            answered_early = time.monotonic() - started < wait_secs
+        except (requests.RequestException, ValueError):
+            answered_early = True
+        if answered_early:
+            # The API returned before the long-poll elapsed without the run
+            # finishing (an error or a capped wait), so back off before asking again.
+            time.sleep(min(backoff, max(0, deadline - time.monotonic())))
+            backoff = min(backoff * 2, MAX_BACKOFF_SECS)
+        else:
+            backoff = MIN_BACKOFF_SECS
+
+
+def _abort_run(run_id: str, token: str) -> None:
+    """Stop a run nobody will wait for; a graceful abort keeps what it already stored."""
+    url = f"{APIFY_BASE_URL}/actor-runs/{run_id}/abort"
+    try:
+        get_client().post(url, params={"token": token, "gracefully": "true"}, timeout=15).close()
+    except requests.RequestException:
+        pass
 
 
-def _fetch_dataset_items(dataset_id: str, token: str) -> List[Dict[str, Any]]:
+def _iter_dataset_page(dataset_id: str, token: str, offset: int, limit: int) -> Iterator[Dict[str, Any]]:
     url = f"{APIFY_BASE_URL}/datasets/{dataset_id}/items"
-    params = {"token": token, "format": "json"}
+    params = {
+        "token": token,
+        "format": "json",
+        "clean": "true",
+        "offset": offset,
+        "limit": limit,
+        "fields": DATASET_FIELDS,
+    }
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = get_client().get(url, params=params, timeout=30, stream=True)
         response.raise_for_status()
-        data = response.json()
-        if isinstance(data, list):
-            return data
     except requests.RequestException:
-        return []
-    except ValueError:
-        return []
-    return []
-
-
-def _normalize_job(item: Dict[str, Any]) -> Dict[str, str]:
-    return {
-        "title": str(item.get("title", "")),
-        "company": str(item.get("companyName", item.get("company", ""))),
-        "location": str(item.get("location", "")),
-        "url": str(item.get("url", item.get("shareLink", ""))),
-        "description": str(item.get("jobDescription", item.get("description", ""))),
+        return
+    with response:
+        try:
+            yield from iter_json_items(response.iter_content(STREAM_CHUNK_SIZE))
+        except (requests.RequestException, ValueError):
+            return
+
+
+def _iter_dataset_items(dataset_id: str, token: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    offset = 0
+    while True:
+        count = 0
+        for item in _iter_dataset_page(dataset_id, token, offset, page_size):
+            count += 1
+            yield item
+        if count < page_size:
+            return
+        offset += count
+
+
+def _normalize_job(item: Dict[str, Any]) -> JobRecord:
+    return JobRecord(
+        str(item.get("title", "")),
+        str(item.get("companyName", item.get("company", ""))),
+        str(item.get("location", "")),
+        str(item.get("url", item.get("shareLink", ""))),
+        str(item.get("jobDescription", item.get("description", ""))),
+    )
+
+
+def _start_query(query: Dict[str, Any], apify_config: Dict[str, Any], token: str) -> str | None:
+    search_query = query.get("query") if isinstance(query, dict) else None
+    location_query = query.get("location") if isinstance(query, dict) else None
+    if not search_query:
+        return None
+    input_payload = {
+        "searchQuery": search_query,
+        "locationQuery": location_query or "",
+        "country": apify_config.get("country", "mx"),
+        "jobsLimit": apify_config.get("items_limit", 30),
+        "maxPages": query.get("max_pages", 1),
+        "saveOnlyUniqueItems": True,
     }
+    run_data = _run_actor(token, input_payload)
+    if not run_data:
+        return None
+    return run_data.get("id")
+
+
+def _collect_run(run_id: str, apify_config: Dict[str, Any], token: str) -> Iterator[JobRecord]:
+    max_wait_secs = float(apify_config.get("max_wait_secs", DEFAULT_MAX_WAIT_SECS))
+    left = time_left()
+    if left is not None:
+        reserve = float(apify_config.get("read_reserve_secs", DEFAULT_READ_RESERVE_SECS))
+        max_wait_secs = min(max_wait_secs, left - min(reserve, left / 2))
+    page_size = max(1, int(apify_config.get("page_size", DEFAULT_PAGE_SIZE)))
+    with metrics.stage("apify_wait"):
+        final_run = _wait_for_run(run_id, token, max_wait_secs)
+    if final_run is None or final_run.get("status") not in TERMINAL_STATUSES:
+        _abort_run(run_id, token)
+    if not final_run or final_run.get("status") not in READABLE_STATUSES:
+        return
+    dataset_id = final_run.get("defaultDatasetId")
+    if not dataset_id:
+        return
+    for item in _iter_dataset_items(dataset_id, token, page_size):
+        if not isinstance(item, dict):
+            continue
+        yield _normalize_job(item)
 
 
-def fetch_apify_indeed_jobs(apify_config: Dict[str, Any], token: str | None) -> List[Dict[str, str]]:
-    if not token or not apify_config:
-        return []
+def fetch_apify_indeed_query(query: Dict[str, Any], apify_config: Dict[str, Any], token: str) -> Iterator[JobRecord]:
+    run_id = _start_query(query, apify_config, token)
+    if run_id:
+        yield from _collect_run(run_id, apify_config, token)
 
-    queries = apify_config.get("queries") or []
-    country = apify_config.get("country", "mx")
-    items_limit = apify_config.get("items_limit", 30)
-    jobs: List[Dict[str, str]] = []
 
-    for query in queries:
-        search_query = query.get("query") if isinstance(query, dict) else None
-        location_query = query.get("location") if isinstance(query, dict) else None
-        if not search_query:
-            continue
-        input_payload = {
-            "searchQuery": search_query,
-            "locationQuery": location_query or "",
-            "country": country,
-            "jobsLimit": items_limit,
-            "maxPages": query.get("max_pages", 1) if isinstance(query, dict) else 1,
-            "saveOnlyUniqueItems": True,
-        }
-
-        run_data = _run_actor(token, input_payload)
-        if not run_data:
-            continue
-        run_id = run_data.get("id")
-        if not run_id:
-            continue
-        final_run = _poll_run(run_id, token)
-        if not final_run or final_run.get("status") != "SUCCEEDED":
-            continue
-        dataset_id = final_run.get("defaultDatasetId")
-        if not dataset_id:
-            continue
-        dataset_items = _fetch_dataset_items(dataset_id, token)
-        for item in dataset_items:
-            if not isinstance(item, dict):
-                continue
-            jobs.append(_normalize_job(item))
-    return jobs
+def fetch_apify_indeed_jobs(apify_config: Dict[str, Any], token: str | None) -> Iterator[JobRecord]:
+    if not token or not apify_config:
+        return
+
+    # Start every run before waiting on any of them so they execute in parallel on Apify.
+    run_ids = [_start_query(query, apify_config, token) for query in apify_config.get("queries") or []]
+    for run_id in run_ids:
+        if run_id:
+            yield from _collect_run(run_id, apify_config, token)
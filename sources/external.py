@@ -5,27 +5,28 @@ Computrabajo o LinkedIn) returning JSON with job fields. Each source
 entry in config.yaml must specify an endpoint and can optionally define
 headers/params and mapping keys.
 """
-from typing import Dict, List, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
 
 import requests
 
+from http_client import get_client
+from sources.pagination import DEFAULT_MAX_PAGES, DEFAULT_PAGE_WORKERS, iter_pages
+from sources.record import JobRecord
+from sources.streaming import iter_json_items
+
 
 DEFAULT_TITLE_KEY = "title"
 DEFAULT_COMPANY_KEY = "company"
 DEFAULT_LOCATION_KEY = "location"
 DEFAULT_URL_KEY = "url"
 DEFAULT_DESCRIPTION_KEY = "description"
+DEFAULT_NEXT_KEY = "next"
+STREAM_CHUNK_SIZE = 64 * 1024
+PAGINATION_STYLES = ("page", "offset", "cursor")
 
-
-def _select_records(payload: Any, data_key: str | None) -> List[Dict[str, Any]]:
-    if isinstance(payload, list):
-        return payload
-    if isinstance(payload, dict):
-        if data_key and isinstance(payload.get(data_key), list):
-            return payload[data_key]
-        if isinstance(payload.get("results"), list):
-            return payload["results"]
-    return []
+# (title, company, location, url, description) keys of a source's records.
+FieldKeys = Tuple[str, str, str, str, str]
 
 
 def _get_value(item: Dict[str, Any], key: str) -> str:
@@ -35,42 +36,159 @@ def _get_value(item: Dict[str, Any], key: str) -> str:
     return str(value)
 
 
-def fetch_external_jobs(external_sources: List[Dict[str, Any]]) -> List[Dict[str, str]]:
-    jobs: List[Dict[str, str]] = []
-    for source in external_sources or []:
-        endpoint = source.get("endpoint")
-        if not endpoint:
-            continue
-        headers = source.get("headers") or {}
-        params = source.get("params") or {}
-        data_key = source.get("data_key")
-        title_key = source.get("title_key", DEFAULT_TITLE_KEY)
-        company_key = source.get("company_key", DEFAULT_COMPANY_KEY)
-        location_key = source.get("location_key", DEFAULT_LOCATION_KEY)
-        url_key = source.get("url_key", DEFAULT_URL_KEY)
-        description_key = source.get("description_key", DEFAULT_DESCRIPTION_KEY)
+def _get_path(document: Any, path: str) -> Any:
+    """Value at a dotted ``path`` such as ``"meta.next"``, or ``None``."""
+    for part in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+def _field_keys(source: Dict[str, Any]) -> FieldKeys:
+    return (
+        source.get("title_key", DEFAULT_TITLE_KEY),
+        source.get("company_key", DEFAULT_COMPANY_KEY),
+        source.get("location_key", DEFAULT_LOCATION_KEY),
+        source.get("url_key", DEFAULT_URL_KEY),
+        source.get("description_key", DEFAULT_DESCRIPTION_KEY),
+    )
+
+
+def _jobs_of(records: Iterable[Any], keys: FieldKeys) -> Iterator[JobRecord]:
+    for record in records:
+        if isinstance(record, dict):
+            yield JobRecord(*(_get_value(record, key) for key in keys))
 
+
+def _get(source: Dict[str, Any], url: str, params: Optional[Dict[str, Any]], stream: bool) -> requests.Response:
+    response = get_client().get(
+        url, headers=source.get("headers") or {}, params=params, timeout=25, stream=stream, hedge=True
+    )
+    response.raise_for_status()
+    return response
+
+
+def _stream_jobs(source: Dict[str, Any], params: Dict[str, Any], keys: FieldKeys) -> Iterator[JobRecord]:
+    """Yield the jobs of one response while its body is still downloading."""
+    try:
+        response = _get(source, source["endpoint"], params, stream=True)
+    except requests.RequestException:
+        return
+    with response:
         try:
-            response = requests.get(endpoint, headers=headers, params=params, timeout=25)
-            response.raise_for_status()
-            payload = response.json()
+            chunks = response.iter_content(STREAM_CHUNK_SIZE)
+            yield from _jobs_of(iter_json_items(chunks, source.get("data_key")), keys)
         except (requests.RequestException, ValueError):
-            continue
-
-        records = _select_records(payload, data_key)
-        if not isinstance(records, list):
-            continue
-
-        for record in records:
-            if not isinstance(record, dict):
-                continue
-            jobs.append(
-                {
-                    "title": _get_value(record, title_key),
-                    "company": _get_value(record, company_key),
-                    "location": _get_value(record, location_key),
-                    "url": _get_value(record, url_key),
-                    "description": _get_value(record, description_key),
-                }
-            )
-    return jobs
+            return
+
+
+def _numbered_pages(
+    source: Dict[str, Any], pagination: Dict[str, Any], keys: FieldKeys
+) -> Iterator[List[JobRecord]]:
+    """Pages of a page-number or offset feed, several in flight at a time."""
+    style = pagination.get("style", "page")
+    param = pagination.get("param", style)
+    size_param = pagination.get("size_param")
+    page_size = int(pagination["page_size"]) if pagination.get("page_size") else None
+    start = int(pagination.get("start", 1 if style == "page" else 0))
+    params = source.get("params") or {}
+    # Offsets advance by the page size; without one, by the size of the first page.
+    step = page_size
+
+    def fetch_page(number: int) -> Optional[List[JobRecord]]:
+        nonlocal step
+        if style == "page":
+            value = start + number
+        else:
+            value = start + number * (step or 0)
+        page_params = {**params, param: value}
+        if size_param and page_size:
+            page_params[size_param] = page_size
+        try:
+            response = _get(source, source["endpoint"], page_params, stream=True)
+            with response:
+                chunks = response.iter_content(STREAM_CHUNK_SIZE)
+                jobs = list(_jobs_of(iter_json_items(chunks, source.get("data_key")), keys))
+        except (requests.RequestException, ValueError):
+            return None
+        if number == 0 and step is None:
+            step = len(jobs)
+        return jobs
+
+    return iter_pages(
+        fetch_page,
+        page_size,
+        int(pagination.get("max_pages", DEFAULT_MAX_PAGES)),
+        int(pagination.get("workers", DEFAULT_PAGE_WORKERS)),
+    )
+
+
+def _cursor_pages(
+    source: Dict[str, Any], pagination: Dict[str, Any], keys: FieldKeys
+) -> Iterator[List[JobRecord]]:
+    """Pages of a cursor feed, one after the other.
+
+    The value at ``next_key`` is either a cursor, sent back in ``param``, or
+    the URL of the next page.
+    """
+    param = pagination.get("param", "cursor")
+    next_key = pagination.get("next_key", DEFAULT_NEXT_KEY)
+    size_param = pagination.get("size_param")
+    params = dict(source.get("params") or {})
+    if size_param and pagination.get("page_size"):
+        params[size_param] = int(pagination["page_size"])
+    url: str = source["endpoint"]
+    page_params: Optional[Dict[str, Any]] = params
+    seen = set()
+    for _ in range(max(1, int(pagination.get("max_pages", DEFAULT_MAX_PAGES)))):
+        try:
+            # The cursor may come after the array, so the body is read whole.
+            document = _get(source, url, page_params, stream=False).json()
+        except (requests.RequestException, ValueError):
+            return
+        if isinstance(document, dict):
+            data_key = source.get("data_key") or "results"
+            records = document.get(data_key)
+            if records is None:
+                records = document.get("results")
+        else:
+            records = document
+        if not isinstance(records, list) or not records:
+            return
+        yield list(_jobs_of(records, keys))
+        cursor = _get_path(document, next_key)
+        if cursor in (None, "", False) or str(cursor) in seen:
+            return
+        seen.add(str(cursor))
+        if isinstance(cursor, str) and (cursor.startswith("/") or "://" in cursor):
+            # The next URL carries its own query string.
+            url, page_params = urljoin(url, cursor), None
+        else:
+            page_params = {**params, param: cursor}
+
+
+def fetch_external_source(source: Dict[str, Any]) -> Iterator[JobRecord]:
+    """Yield the normalized jobs of one source as they arrive.
+
+    Without ``pagination`` the single response is parsed while its body is
+    still downloading; with it, jobs are yielded page by page.
+    """
+    if not source.get("endpoint"):
+        return
+    keys = _field_keys(source)
+    pagination = source.get("pagination")
+    if not pagination:
+        yield from _stream_jobs(source, source.get("params") or {}, keys)
+        return
+    style = pagination.get("style", "page")
+    if style not in PAGINATION_STYLES:
+        raise ValueError(f"Estilo de paginación desconocido en {source.get('name') or source['endpoint']}: {style}")
+    pages = _cursor_pages(source, pagination, keys) if style == "cursor" else _numbered_pages(source, pagination, keys)
+    for page in pages:
+        yield from page
+
+
+def fetch_external_jobs(external_sources: List[Dict[str, Any]]) -> Iterator[JobRecord]:
+    for source in external_sources or []:
+        yield from fetch_external_source(source)
@@ -1,25 +1,153 @@
 import requests
 
+from http_cache import cached_get
+import metrics
+from sources.parallel import fetch_in_order
+from sources.record import JobRecord
+from sources.streaming import iter_json_items
 
-def fetch_greenhouse_jobs(tokens):
+
+API_BASE = "https://boards-api.greenhouse.io/v1/boards"
+DEFAULT_HYDRATE_WORKERS = 8
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _posting_key(token, job):
+    return f"greenhouse:{token}:{job['id']}" if job.get("id") is not None else None
+
+
+def _job_record(token, job, description):
+    return JobRecord(
+        (job.get("title") or "").strip(),
+        token,
+        ((job.get("location") or {}).get("name")) or "",
+        job.get("absolute_url") or "",
+        description,
+        _posting_key(token, job),
+        job.get("updated_at"),
+    )
+
+
+def _parse_board(token, response):
     jobs = []
-    for token in tokens:
-        api_url = f"https://boards-api.greenhouse.io/v1/boards/{token}/jobs?content=true"
-        try:
-            response = requests.get(api_url, timeout=15)
-            response.raise_for_status()
-        except requests.RequestException:
+    for job in iter_json_items(response.iter_content(STREAM_CHUNK_SIZE), "jobs"):
+        if isinstance(job, dict):
+            jobs.append(_job_record(token, job, job.get("content") or ""))
+    return jobs
+
+
+def _parse_listing(response):
+    # Only what the prefilter and the detail request need; the listing
+    # without ``content=true`` carries no description.
+    return [
+        {
+            "id": job.get("id"),
+            "title": job.get("title"),
+            "location": job.get("location"),
+            "absolute_url": job.get("absolute_url"),
+            "updated_at": job.get("updated_at"),
+        }
+        for job in response.json().get("jobs", [])
+    ]
+
+
+def _fetch_content(token, job_id, cache=None):
+    api_url = f"{API_BASE}/{token}/jobs/{job_id}"
+    try:
+        return cached_get(
+            api_url, lambda response: response.json().get("content") or "", cache, timeout=15, hedge=True
+        )
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def _fetch_board_two_phase(token, cache, job_filter, hydrate_workers, watermarks=None, known=None, archive=None):
+    api_url = f"{API_BASE}/{token}/jobs"
+    try:
+        listing = cached_get(api_url, _parse_listing, cache, timeout=15, hedge=True)
+    except requests.RequestException:
+        return
+
+    candidates = []
+    for job in listing:
+        if job.get("id") is None:
+            continue
+        rejection = job_filter.prefilter(
+            (job.get("title") or "").strip(), ((job.get("location") or {}).get("name")) or ""
+        )
+        if rejection is not None:
+            metrics.incr("filter_rejections_total", rule=rejection)
+            if archive is not None:
+                # Never hydrated, so the archive only gets what the listing has.
+                archive.add("greenhouse", _job_record(token, job, ""), listing=True)
             continue
+        if watermarks is not None and watermarks.known_rejection(_posting_key(token, job), job.get("updated_at")):
+            # Rejected on its description last time and not edited since.
+            metrics.incr("jobs_dropped_total", reason="known_rejection")
+            continue
+        if known is not None and known(job.get("absolute_url") or ""):
+            # Every profile already got it or has it queued.
+            metrics.incr("jobs_dropped_total", reason="seen")
+            continue
+        candidates.append(job)
+
+    # Details go out on the host slots the fetcher lends, so boards never
+    # exceed ``per_host`` together.
+    contents = fetch_in_order(lambda job: _fetch_content(token, job["id"], cache), candidates, hydrate_workers)
+    for job, content in zip(candidates, contents):
+        # A posting whose detail could not be read is left for the next run
+        # rather than judged without its description.
+        if content is not None:
+            yield _job_record(token, job, content)
 
-        payload = response.json()
-        for job in payload.get("jobs", []):
-            jobs.append(
-                {
-                    "title": (job.get("title") or "").strip(),
-                    "company": token,
-                    "location": ((job.get("location") or {}).get("name")) or "",
-                    "url": job.get("absolute_url") or "",
-                    "description": job.get("content") or "",
-                }
-            )
+
+def fetch_greenhouse_board(
+    token,
+    cache=None,
+    job_filter=None,
+    hydrate_workers=DEFAULT_HYDRATE_WORKERS,
+    watermarks=None,
+    known=None,
+    archive=None,
+):
+    """Fetch one board.
+
+    With a ``job_filter`` the board is listed without descriptions, postings
+    are prefiltered on title and location, and only the survivors are fetched
+    from ``/jobs/{id}``, ``hydrate_workers`` at a time within the host's
+    concurrency cap; postings ``watermarks`` knows were rejected and not
+    updated since, and those ``known(url)`` says every profile already has,
+    are not fetched either; the prefiltered postings go to ``archive``
+    without a description. Without one, the whole board is downloaded with
+    ``content=true``.
+    """
+    if job_filter is not None:
+        return _fetch_board_two_phase(token, cache, job_filter, hydrate_workers, watermarks, known, archive)
+    api_url = f"{API_BASE}/{token}/jobs?content=true"
+    try:
+        return cached_get(
+            api_url,
+            lambda response: _parse_board(token, response),
+            cache,
+            timeout=15,
+            restore=JobRecord.from_dict,
+            stream=True,
+            hedge=True,
+        )
+    except (requests.RequestException, ValueError):
+        return []
+
+
+def fetch_greenhouse_jobs(
+    tokens,
+    cache=None,
+    job_filter=None,
+    hydrate_workers=DEFAULT_HYDRATE_WORKERS,
+    watermarks=None,
+    known=None,
+    archive=None,
+):
+    jobs = []
+    for token in tokens:
+        jobs.extend(fetch_greenhouse_board(token, cache, job_filter, hydrate_workers, watermarks, known, archive))
     return jobs
@@ -1,26 +1,85 @@
 import requests
 
+from http_cache import cached_get
+from sources.pagination import iter_pages
+from sources.record import JobRecord
+from sources.streaming import iter_json_items
 
-def fetch_lever_jobs(companies):
+
+API_BASE = "https://api.lever.co/v0/postings"
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGES = 20
+DEFAULT_PAGE_WORKERS = 4
+
+
+def _updated_at(job):
+    value = job.get("updatedAt") or job.get("createdAt")
+    return str(value) if value is not None else None
+
+
+def _parse_postings(company, response):
     jobs = []
-    for company in companies:
-        api_url = f"https://api.lever.co/v0/postings/{company}?mode=json"
-        try:
-            response = requests.get(api_url, timeout=15)
-            response.raise_for_status()
-        except requests.RequestException:
+    for job in iter_json_items(response.iter_content(STREAM_CHUNK_SIZE)):
+        if not isinstance(job, dict):
             continue
-
-        for job in response.json():
-            jobs.append(
-                {
-                    "title": (job.get("text") or "").strip(),
-                    "company": job.get("company") or company,
-                    "location": (job.get("categories") or {}).get("location") or "",
-                    "url": job.get("hostedUrl") or job.get("applyUrl") or "",
-                    "description": job.get("descriptionPlain")
-                    or job.get("description")
-                    or "",
-                }
+        jobs.append(
+            JobRecord(
+                (job.get("text") or "").strip(),
+                job.get("company") or company,
+                (job.get("categories") or {}).get("location") or "",
+                job.get("hostedUrl") or job.get("applyUrl") or "",
+                job.get("descriptionPlain")
+                or job.get("description")
+                or "",
+                f"lever:{company}:{job['id']}" if job.get("id") else None,
+                _updated_at(job),
             )
+        )
+    return jobs
+
+
+def _fetch_page(company, cache, skip, limit):
+    api_url = f"{API_BASE}/{company}?mode=json"
+    if limit:
+        api_url += f"&skip={skip}&limit={limit}"
+    try:
+        return cached_get(
+            api_url,
+            lambda response: _parse_postings(company, response),
+            cache,
+            timeout=15,
+            restore=JobRecord.from_dict,
+            stream=True,
+            hedge=True,
+        )
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def fetch_lever_company(
+    company,
+    cache=None,
+    page_size=DEFAULT_PAGE_SIZE,
+    max_pages=DEFAULT_MAX_PAGES,
+    page_workers=DEFAULT_PAGE_WORKERS,
+):
+    """Yield a company's postings page by page (``skip``/``limit``); ``page_size`` 0 asks for all of them at once."""
+    if not page_size:
+        yield from _fetch_page(company, cache, 0, 0) or []
+        return
+    pages = iter_pages(
+        lambda number: _fetch_page(company, cache, number * page_size, page_size),
+        page_size,
+        max_pages,
+        page_workers,
+    )
+    for page in pages:
+        yield from page
+
+
+def fetch_lever_jobs(companies, cache=None):
+    jobs = []
+    for company in companies:
+        jobs.extend(fetch_lever_company(company, cache))
     return jobs
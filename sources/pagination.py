@@ -0,0 +1,50 @@
+"""Page-by-page fetching shared by the paginated sources."""
+from typing import Callable, Iterator, List, Optional, TypeVar
+
+from sources.parallel import fetch_in_order
+
+
+DEFAULT_MAX_PAGES = 50
+DEFAULT_PAGE_WORKERS = 4
+
+Item = TypeVar("Item")
+
+
+def iter_pages(
+    fetch_page: Callable[[int], Optional[List[Item]]],
+    page_size: Optional[int] = None,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    workers: int = DEFAULT_PAGE_WORKERS,
+) -> Iterator[List[Item]]:
+    """Yield the items of pages 0, 1, ... of ``fetch_page``, which returns ``None`` for a failed page.
+
+    Page 0 is fetched alone so small tenants cost one request; after a full
+    page, up to ``workers`` following pages are in flight within the host's
+    concurrency cap. Pages are yielded in order as soon as they and the ones
+    before them arrived, and the walk stops at the first short, empty or
+    failed page or after ``max_pages``. A page is full when it holds
+    ``page_size`` items, or any item when the page size is unknown.
+    """
+    max_pages = max(1, max_pages)
+
+    def _full(items: List[Item]) -> bool:
+        return len(items) >= page_size if page_size else bool(items)
+
+    first = fetch_page(0)
+    if not first:
+        return
+    yield first
+    if not _full(first) or max_pages == 1:
+        return
+
+    # Following pages go out on the host slots the fetcher lends the task.
+    pages = fetch_in_order(fetch_page, range(1, max_pages), workers)
+    try:
+        for items in pages:
+            if not items:
+                return
+            yield items
+            if not _full(items):
+                return
+    finally:
+        pages.close()
@@ -0,0 +1,57 @@
+"""Parallel requests of one fetch task, kept within its host's concurrency cap."""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Iterable, Iterator, Optional, TypeVar
+
+from http_client import host_slots, in_scope
+
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+_END = object()
+
+
+def fetch_in_order(fetch: Callable[[Item], Result], items: Iterable[Item], workers: int) -> Iterator[Result]:
+    """Yield ``fetch(item)`` for each of ``items`` in order, up to ``workers`` at a time.
+
+    One request runs on the task's own host slot; the others only start on
+    slots the fetcher lends (``http_client.host_slots``), so the task never
+    pushes its host past ``per_host``. Items are pulled lazily and closing the
+    generator cancels the requests that have not started.
+    """
+    slots = host_slots()
+    call = in_scope(fetch)
+    items = iter(items)
+    workers = max(1, workers)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+    pending: Deque[Future] = deque()
+    own: Optional[Future] = None
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < workers:
+                borrowed = own is not None and not own.done()
+                if borrowed and slots is not None and not slots.try_acquire():
+                    break
+                item = next(items, _END)
+                if item is _END:
+                    exhausted = True
+                    if borrowed and slots is not None:
+                        slots.release()
+                    break
+                future = pool.submit(call, item)
+                if not borrowed:
+                    own = future
+                elif slots is not None:
+                    future.add_done_callback(lambda _future: slots.release())
+                pending.append(future)
+            if not pending:
+                return
+            if pending[0].done():
+                yield pending.popleft().result()
+            else:
+                # Any request finishing may free a slot for the next item.
+                wait([future for future in pending if not future.done()], return_when=FIRST_COMPLETED)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
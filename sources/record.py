@@ -0,0 +1,122 @@
+"""Compact job record shared by every source."""
+import sys
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from messaging import extract_keywords
+
+
+FIELDS = ("title", "company", "location", "url", "description")
+# Where the posting comes from, for sources whose API has stable ids: the
+# watermark store keys its verdicts on ``posting_key`` and ``updated_at``.
+METADATA = ("posting_key", "updated_at")
+
+
+class JobRecord:
+    __slots__ = FIELDS + METADATA + ("signature", "terms")
+
+    def __init__(
+        self,
+        title: str = "",
+        company: str = "",
+        location: str = "",
+        url: str = "",
+        description: str = "",
+        posting_key: Optional[str] = None,
+        updated_at: Optional[str] = None,
+    ) -> None:
+        self.title = title
+        self.company = sys.intern(company)
+        self.location = sys.intern(location)
+        self.url = url
+        self.description = description
+        self.posting_key = posting_key
+        self.updated_at = updated_at
+        # MinHash of the full description, set by the dedup index before release.
+        self.signature = None
+        # Ranking term counts of the description, when a cpu_pool worker read it.
+        self.terms = None
+
+    @classmethod
+    def from_dict(cls, job: Dict[str, Any]) -> "JobRecord":
+        return cls(
+            *(str(job.get(field) or "") for field in FIELDS),
+            **{field: job[field] for field in METADATA if job.get(field) is not None},
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Fields plus the metadata that is set, as cached by ``http_cache``."""
+        data = dict(self.items())
+        for field in METADATA:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> str:
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: str) -> None:
+        if key not in FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def keys(self) -> Tuple[str, ...]:
+        return FIELDS
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        return ((field, getattr(self, field)) for field in FIELDS)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (JobRecord, dict)):
+            return all(getattr(self, field) == other.get(field) for field in FIELDS)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"JobRecord(title={self.title!r}, company={self.company!r}, url={self.url!r})"
+
+    def release_description(self) -> None:
+        """Keep only the description keywords ``messaging`` turns into the message."""
+        self.description = " ".join(extract_keywords(self.description))
+
+
+def drop_description(job: Any) -> None:
+    """Free the description of a rejected ``JobRecord``; dicts are left alone."""
+    if isinstance(job, JobRecord):
+        job.description = ""
+
+
+def release_description(job: Any) -> None:
+    """``JobRecord.release_description`` for records; plain dicts are left alone."""
+    if isinstance(job, JobRecord):
+        job.release_description()
+
+
+def signature_of(job: Any) -> Optional[Any]:
+    return job.signature if isinstance(job, JobRecord) else None
+
+
+def terms_of(job: Any) -> Optional[Dict[str, int]]:
+    return job.terms if isinstance(job, JobRecord) else None
+
+
+def posting_key_of(job: Any) -> Optional[Tuple[str, Optional[str]]]:
+    """``(posting_key, updated_at)`` of a record from a source with posting ids."""
+    if isinstance(job, JobRecord) and job.posting_key:
+        return job.posting_key, job.updated_at
+    return None
@@ -0,0 +1,118 @@
+"""Incremental parsing of large JSON job feeds."""
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# What may follow a number or literal; until one arrives the scalar may go on.
+_SCALAR_END = re.compile(r"[\s,:\]}]")
+_COMPACT_AFTER = 1 << 16
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._eof = False
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        if self.pos > _COMPACT_AFTER:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer += self._decoder.decode(chunk)
+                return True
+        self.buffer += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Se esperaba '{char}' en la posición {self.pos} del JSON")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            # A number or literal cut by a chunk boundary decodes short ("12."
+            # as 12), so it is only decoded once something follows it.
+            if (
+                not self._eof
+                and self.buffer[self.pos : self.pos + 1] not in ("{", "[", '"')
+                and not _SCALAR_END.search(self.buffer, self.pos)
+            ):
+                self._fill()
+                continue
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(reader: _Reader) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"JSON inválido en la posición {reader.pos}")
+
+
+def iter_json_items(chunks: Iterable[bytes], data_key: Optional[str] = None) -> Iterator[Any]:
+    """Yield the records of a JSON feed without loading the whole body.
+
+    A top-level array is streamed directly. For an object, the array under
+    ``data_key`` is streamed, falling back to the ``results`` array when
+    ``data_key`` is missing. Anything else yields nothing.
+    """
+    reader = _Reader(chunks)
+    first = reader.peek()
+    if first == "[":
+        yield from _iter_array(reader)
+        return
+    if first != "{":
+        return
+
+    primary = data_key or "results"
+    fallback_key = "results" if data_key and data_key != "results" else None
+    fallback = None
+    reader.expect("{")
+    while reader.peek() not in ("}", ""):
+        key = reader.value()
+        reader.expect(":")
+        if key == primary and reader.peek() == "[":
+            yield from _iter_array(reader)
+            return
+        value = reader.value()
+        if key == fallback_key and isinstance(value, list):
+            fallback = value
+        if reader.peek() == ",":
+            reader.pos += 1
+    if fallback is not None:
+        yield from fallback
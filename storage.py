@@ -1,31 +1,165 @@
+"""Per-profile store of job URLs that were already sent."""
 import json
 import os
-from typing import Set
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
 
+import metrics
 
-DEFAULT_STORAGE_PATH = "seen_jobs.json"
 
+DEFAULT_STORAGE_PATH = "seen_jobs.sqlite3"
+LEGACY_JSON_PATH = "seen_jobs.json"
+DEFAULT_EXPIRE_DAYS = 90
+DEFAULT_PROFILE = ""
 
-def load_seen(filepath: str = DEFAULT_STORAGE_PATH) -> Set[str]:
-    if not os.path.exists(filepath):
-        return set()
-    try:
-        with open(filepath, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-            return set(data)
-    except (json.JSONDecodeError, OSError):
-        return set()
 
+class SeenStore:
+    """Seen URLs of one profile; every profile shares the same table."""
 
-def save_seen(seen: Set[str], filepath: str = DEFAULT_STORAGE_PATH) -> None:
-    with open(filepath, "w", encoding="utf-8") as handle:
-        json.dump(sorted(seen), handle, ensure_ascii=False, indent=2)
+    def __init__(
+        self,
+        filepath: str = DEFAULT_STORAGE_PATH,
+        expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS,
+        legacy_path: Optional[str] = LEGACY_JSON_PATH,
+        profile: str = DEFAULT_PROFILE,
+    ) -> None:
+        self.filepath = filepath
+        self.expire_days = expire_days
+        self.profile = profile
+        self._urls: set = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filepath, check_same_thread=False)
+        self._create_table()
+        if legacy_path:
+            self._migrate_json(legacy_path)
+        if expire_days:
+            self.expire(expire_days)
+        else:
+            self._load()
 
+    def _create_table(self) -> None:
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(seen)")]
+        with self._conn:
+            if columns and "profile" not in columns:
+                # Stores from before profiles existed belong to the default profile.
+                self._conn.execute("ALTER TABLE seen RENAME TO seen_single")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                " profile TEXT NOT NULL DEFAULT '',"
+                " url TEXT NOT NULL,"
+                " seen_at REAL NOT NULL,"
+                " PRIMARY KEY (profile, url))"
+            )
+            if columns and "profile" not in columns:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO seen (profile, url, seen_at) SELECT ?, url, seen_at FROM seen_single",
+                    (DEFAULT_PROFILE,),
+                )
+                self._conn.execute("DROP TABLE seen_single")
+                self._conn.execute("DROP INDEX IF EXISTS seen_seen_at")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS seen_profile_seen_at ON seen (profile, seen_at)")
 
-def already_seen(url: str, seen: Set[str]) -> bool:
+    def _load(self) -> None:
+        self._urls = {row[0] for row in self._conn.execute("SELECT url FROM seen WHERE profile = ?", (self.profile,))}
+
+    def _migrate_json(self, legacy_path: str) -> None:
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as handle:
+                urls = json.load(handle)
+        except (json.JSONDecodeError, OSError):
+            return
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (profile, url, seen_at) VALUES (?, ?, ?)",
+                ((self.profile, str(url), now) for url in urls if url),
+            )
+        os.replace(legacy_path, legacy_path + ".migrated")
+
+    def expire(self, days: float) -> None:
+        cutoff = time.time() - float(days) * 86400
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM seen WHERE profile = ? AND seen_at < ?", (self.profile, cutoff))
+            self._load()
+
+    def __contains__(self, url: object) -> bool:
+        return url in self._urls
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._urls)
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def add(self, url: str) -> None:
+        self.add_many([url])
+
+    def add_many(self, urls: Iterable[str]) -> None:
+        """Insert ``urls`` in one transaction, committed before returning.
+
+        Every profile has its own connection to the same file, so no write
+        transaction is left open for another profile's insert to run into.
+        """
+        with self._lock:
+            new = [url for url in dict.fromkeys(urls) if url and url not in self._urls]
+            if not new:
+                return
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO seen (profile, url, seen_at) VALUES (?, ?, ?)",
+                    ((self.profile, url, now) for url in new),
+                )
+            self._urls.update(new)
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def load_seen(
+    filepath: str = DEFAULT_STORAGE_PATH,
+    expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS,
+    legacy_path: Optional[str] = LEGACY_JSON_PATH,
+    profile: str = DEFAULT_PROFILE,
+) -> SeenStore:
+    return SeenStore(filepath, expire_days, legacy_path, profile)
+
+
+def load_seen_from_config(storage_config: Optional[Dict], profile: str = DEFAULT_PROFILE) -> SeenStore:
+    storage_config = storage_config or {}
+    return load_seen(
+        storage_config.get("path", DEFAULT_STORAGE_PATH),
+        storage_config.get("expire_days", DEFAULT_EXPIRE_DAYS),
+        # The old seen_jobs.json predates profiles and belongs to the default one.
+        storage_config.get("legacy_path", LEGACY_JSON_PATH) if profile == DEFAULT_PROFILE else None,
+        profile,
+    )
+
+
+def save_seen(seen: SeenStore) -> None:
+    with metrics.stage("storage_commit"):
+        seen.commit()
+
+
+def already_seen(url: str, seen: SeenStore) -> bool:
     return url in seen
 
 
-def mark_seen(url: str, seen: Set[str], filepath: str = DEFAULT_STORAGE_PATH) -> None:
-    seen.add(url)
-    save_seen(seen, filepath)
+def mark_seen(url: str, seen: SeenStore) -> None:
+    mark_seen_batch([url], seen)
+
+
+def mark_seen_batch(urls: Iterable[str], seen: SeenStore) -> None:
+    with metrics.stage("storage_commit"):
+        seen.add_many(urls)
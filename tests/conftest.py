@@ -0,0 +1,33 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Slots:
+    """Stand-in for the host slots the fetcher lends through ``request_scope``."""
+
+    def __init__(self, free):
+        self.free = free
+        self.attempts = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        with self.lock:
+            self.attempts += 1
+            if self.free == 0:
+                return False
+            self.free -= 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.free += 1
+
+
+@pytest.fixture
+def host_slots():
+    return _Slots
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+import requests
+
+import http_client
+from sources import apify_indeed
+
+
+class _Client:
+    def __init__(self, status):
+        self.status = status
+        self.posts = []
+
+    def _response(self, payload):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = payload
+        response.raw = io.BytesIO(payload)
+        return response
+
+    def get(self, url, params=None, **kwargs):
+        if "/datasets/" in url:
+            return self._response(b'[{"title": "Backend", "url": "https://example.com/1"}]')
+        return self._response(b'{"data": {"status": "%s", "defaultDatasetId": "d1"}}' % self.status.encode())
+
+    def post(self, url, params=None, **kwargs):
+        self.posts.append((url, params))
+        return self._response(b"{}")
+
+
+@pytest.fixture
+def client_with(monkeypatch):
+    monkeypatch.setattr(apify_indeed.time, "sleep", lambda secs: None)
+
+    def install(status):
+        client = _Client(status)
+        http_client.set_client(client)
+        return client
+
+    yield install
+    http_client.set_client(None)
+
+
+def test_a_run_still_going_when_the_wait_ends_is_aborted_and_read(client_with):
+    client = client_with("RUNNING")
+    jobs = list(apify_indeed._collect_run("run1", {"max_wait_secs": 0.01}, "token"))
+
+    assert [job.url for job in jobs] == ["https://example.com/1"]
+    assert [url for url, _ in client.posts] == [f"{apify_indeed.APIFY_BASE_URL}/actor-runs/run1/abort"]
+
+
+def test_a_finished_run_is_not_aborted(client_with):
+    client = client_with("SUCCEEDED")
+    assert len(list(apify_indeed._collect_run("run1", {"max_wait_secs": 5}, "token"))) == 1
+    assert client.posts == []
@@ -0,0 +1,116 @@
+import sqlite3
+import time
+import zlib
+
+import pytest
+
+from archive import JobArchive
+from replay import replay
+from sources.record import JobRecord
+
+
+def _posting(updated_at, description="<p>Python &amp; Django</p>", title="Backend Engineer"):
+    return JobRecord(title, "Acme", "Monterrey", "https://example.com/1", description, "greenhouse:acme:1", updated_at)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = JobArchive(str(tmp_path / "archive.sqlite3"))
+    yield archive
+    archive.close()
+
+
+def _stored(archive):
+    return [(job.title, job.description, job.updated_at) for _, job in archive.iter_postings()]
+
+
+def test_descriptions_are_stored_raw_and_normalized_when_read(archive):
+    assert archive.add("greenhouse", _posting("1"))
+    archive.flush()
+
+    blob = archive._conn.execute("SELECT description FROM postings").fetchone()[0]
+    assert zlib.decompress(blob).decode("utf-8") == "<p>Python &amp; Django</p>"
+    assert _stored(archive) == [("Backend Engineer", "python & django", "1")]
+
+
+def test_queries_index_what_was_stored_since_the_last_one(archive):
+    if not archive.fts:
+        pytest.skip("SQLite sin FTS5")
+    archive.add("greenhouse", _posting("1"))
+    assert [job.title for _, job in archive.iter_postings(query="django")] == ["Backend Engineer"]
+
+    archive.add("greenhouse", _posting("2", description="<b>Rust</b>"))
+    assert [job.title for _, job in archive.iter_postings(query="django")] == []
+    assert [job.updated_at for _, job in archive.iter_postings(query="rust")] == ["2"]
+
+
+def test_a_listing_row_never_replaces_the_full_posting(archive):
+    archive.add("greenhouse", _posting("1"))
+    archive.flush()
+
+    archive.add("greenhouse", _posting("1", description=""), listing=True)
+    assert _stored(archive) == [("Backend Engineer", "python & django", "1")]
+
+    # A newer listing does: the stored description is out of date.
+    archive.add("greenhouse", _posting("2", description=""), listing=True)
+    assert _stored(archive) == [("Backend Engineer", "", "2")]
+    assert archive.count_listings() == 1
+
+    # A hydrated version replaces the listing again.
+    archive.add("greenhouse", _posting("3"))
+    assert archive.count_listings() == 0
+
+
+def test_replaced_and_pruned_versions_leave_memory(archive):
+    archive.add("greenhouse", _posting("1"))
+    archive.add("greenhouse", _posting("2"))
+    archive.flush()
+    assert len(archive._versions) == 1
+    archive.add("greenhouse", _posting("3"))
+    archive.flush()
+    assert len(archive._versions) == 1
+
+    archive._conn.execute("UPDATE postings SET fetched_at = ?", (time.time() - 400 * 86400,))
+    archive.prune()
+    assert archive._versions == set()
+    assert _stored(archive) == []
+
+
+def test_archives_from_before_lazy_indexing_keep_their_index(tmp_path):
+    path = str(tmp_path / "archive.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE postings (id INTEGER PRIMARY KEY, source TEXT NOT NULL, posting_id TEXT NOT NULL,"
+        " version INTEGER NOT NULL, title TEXT NOT NULL, company TEXT NOT NULL, location TEXT NOT NULL,"
+        " url TEXT NOT NULL, description BLOB NOT NULL, updated_at TEXT, fetched_at REAL NOT NULL,"
+        " UNIQUE (source, posting_id))"
+    )
+    conn.execute(
+        "INSERT INTO postings VALUES (1, 'lever', 'x', 7, 'Data Analyst', 'Acme', 'Monterrey', 'u', ?, NULL, ?)",
+        (zlib.compress(b"SQL"), time.time()),
+    )
+    conn.commit()
+    conn.close()
+
+    archive = JobArchive(path)
+    try:
+        assert archive._conn.execute("SELECT indexed, listing FROM postings").fetchone() == (1, 0)
+        assert [job.description for _, job in archive.iter_postings()] == ["sql"]
+    finally:
+        archive.close()
+
+
+def test_replay_skips_and_counts_postings_archived_without_description(archive):
+    title = "Junior Backend Engineer"
+    archive.add("greenhouse", _posting("1", description="<p>Se requieren 5 años de experiencia</p>", title=title))
+    # Without its description it would pass the years rule.
+    listing = JobRecord(title, "Acme", "Monterrey", "https://example.com/2", "", "greenhouse:acme:2", "1")
+    archive.add("greenhouse", listing, listing=True)
+    rules = {"ubicaciones": ["Monterrey"], "niveles": ["Junior"], "titulos_permitidos": ["Engineer"]}
+    config = {"filters": {**rules, "exclusion_por_anos": 3}}
+
+    _, results, verdicts = replay(config, archive)
+
+    assert results == [[]]
+    assert verdicts == {"years": 1, "listing": 1}
+    assert [job.url for _, job in archive.iter_postings(listings=False)] == ["https://example.com/1"]
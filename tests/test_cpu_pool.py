@@ -0,0 +1,77 @@
+import pytest
+
+from cpu_pool import ParallelMatcher
+from dedup import minhash
+from messaging import extract_keywords
+from normalize import html_to_text
+from profiles import Profile, ProfileMatcher
+from ranking import RelevanceScorer, count_terms
+from sources.record import JobRecord
+
+PROFILES = [
+    Profile("a", {"ubicaciones": ["Monterrey"], "titulos_permitidos": ["Engineer"], "niveles": ["Junior"]}, ["1"], None),
+    Profile(
+        "b",
+        {
+            "ubicaciones": ["Monterrey", "Remoto"],
+            "titulos_permitidos": ["Engineer", "Analyst"],
+            "niveles": ["Junior", "Trainee"],
+            "exclusiones": ["Senior"],
+            "exclusion_por_anos": 3,
+        },
+        ["2"],
+        None,
+    ),
+]
+DESCRIPTIONS = [
+    "<p>Buscamos <b>Junior</b> con Python, Django y SQL para el equipo de pagos &amp; cobros en Monterrey</p>",
+    "<p>Trainee de datos: SQL, Excel y Power BI; se requieren 5+ a&ntilde;os</p>",
+    "Perfil Junior o Trainee que reporte al Senior lead, con Git y React",
+    "Mid level, Java",
+    "",
+]
+TITLES = ["Backend Engineer", "Data Analyst", "Senior Engineer", "Recruiter"]
+LOCATIONS = ["Monterrey, NL", "Remoto", "Guadalajara"]
+
+
+def _jobs():
+    return [
+        JobRecord(title, "Acme", location, f"https://example.com/{n}", description)
+        for n, (title, location, description) in enumerate(
+            (title, location, description) for title in TITLES for location in LOCATIONS for description in DESCRIPTIONS
+        )
+    ]
+
+
+@pytest.mark.parametrize("normalize", [True, False])
+def test_spawned_workers_give_the_in_process_verdicts(normalize):
+    matcher = ProfileMatcher(PROFILES)
+    scorer = RelevanceScorer(PROFILES)
+    expected = []
+    for job in _jobs():
+        if normalize:
+            job.description = html_to_text(job.description)
+        mask, rejection = matcher.match(job)
+        text = job.description if normalize else html_to_text(job.description)
+        keywords = " ".join(extract_keywords(job.description))
+        extras = (keywords, minhash(text, normalized=True), count_terms(scorer.pattern, text))
+        expected.append((mask, rejection, extras if mask else None))
+
+    parallel = ParallelMatcher(matcher, {"workers": 1, "chunk_size": 7}, normalize, True, scorer.pattern)
+    try:
+        jobs = _jobs()
+        verdicts = []
+        for index, job in enumerate(jobs):
+            verdicts.extend(parallel.submit(index, job))
+        verdicts.extend(parallel.finish())
+    finally:
+        parallel.close()
+
+    # Title and location rejections come back at once, the rest per chunk.
+    verdicts.sort(key=lambda verdict: verdict[0])
+    assert [index for index, *_ in verdicts] == list(range(len(jobs)))
+    assert any(mask for _, _, mask, _ in verdicts)
+    for (index, job, mask, rejection), (expected_mask, expected_rejection, extras) in zip(verdicts, expected):
+        assert (mask, rejection) == (expected_mask, expected_rejection), jobs[index].title
+        if mask:
+            assert (job.description, job.signature, job.terms) == extras
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+import yaml
+
+import http_client
+from daemon import _reload_if_changed, _Schedule
+from fetcher import FetchTask
+from main import load_config
+from runtime import Runtime
+
+
+def _task(key):
+    return FetchTask("greenhouse", key, "boards-api.greenhouse.io", lambda: [], ())
+
+
+def test_tasks_come_due_in_order_and_reschedules_replace_the_old_entry():
+    schedule = _Schedule()
+    schedule.replace_tasks([_task("a"), _task("b"), _task("c")], now=100)
+    schedule.set_due(("greenhouse", "a"), 130)
+    schedule.set_due(("greenhouse", "b"), 110)
+    schedule.set_due(("greenhouse", "b"), 120)
+
+    assert [task.key for task in schedule.pop_due(100)] == ["c"]
+    assert schedule.next_due() == 120
+    assert schedule.pop_due(119) == []
+    assert [task.key for task in schedule.pop_due(130)] == ["b", "a"]
+    assert schedule.next_due() is None
+
+
+def test_a_new_task_list_keeps_the_due_time_of_tasks_that_remain():
+    schedule = _Schedule()
+    schedule.replace_tasks([_task("a"), _task("b")], now=100)
+    schedule.set_due(("greenhouse", "a"), 500)
+    schedule.set_due(("greenhouse", "b"), 600)
+
+    schedule.replace_tasks([_task("a"), _task("c")], now=200)
+
+    assert [task.key for task in schedule.pop_due(200)] == ["c"]
+    assert schedule.next_due() == 500
+    assert [task.key for task in schedule.pop_due(1000)] == ["a"]
+
+
+def _write_config(path, tokens, cache_path, mtime):
+    config = {
+        "greenhouse_tokens": tokens,
+        "link_check": {"cache_path": cache_path},
+        "http_cache": {"enabled": False},
+        "metrics": {"enabled": False},
+    }
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def runtime_for(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runtimes = []
+
+    def build(config_path):
+        runtime = Runtime(load_config(str(config_path)))
+        runtimes.append(runtime)
+        return runtime
+
+    yield build
+    for runtime in runtimes:
+        runtime.close()
+    http_client.set_client(None)
+
+
+def test_a_changed_config_file_is_reloaded_with_its_tasks_and_stores(tmp_path, runtime_for):
+    config_path = tmp_path / "config.yaml"
+    _write_config(config_path, ["acme"], "links_a.sqlite3", 1000)
+    runtime = runtime_for(config_path)
+    schedule = _Schedule()
+    schedule.replace_tasks(runtime.build_tasks(), 0)
+    link_cache, outbox = runtime.link_cache, runtime.outbox
+
+    assert _reload_if_changed(str(config_path), 1000, runtime, schedule) is None
+
+    _write_config(config_path, ["acme", "globex"], "links_b.sqlite3", 2000)
+    assert _reload_if_changed(str(config_path), 1000, runtime, schedule) == 2000
+
+    assert sorted(key for _, key in schedule.tasks) == ["acme", "globex"]
+    # The link cache moved to its new path; the untouched outbox stayed open.
+    assert runtime.link_cache is not link_cache
+    assert (tmp_path / "links_b.sqlite3").exists()
+    assert runtime.outbox is outbox
+
+
+def test_a_broken_config_file_keeps_the_previous_config(tmp_path, runtime_for):
+    config_path = tmp_path / "config.yaml"
+    _write_config(config_path, ["acme"], "links.sqlite3", 1000)
+    runtime = runtime_for(config_path)
+    schedule = _Schedule()
+    schedule.replace_tasks(runtime.build_tasks(), 0)
+
+    config_path.write_text("greenhouse_tokens: [acme", encoding="utf-8")
+    os.utime(config_path, (3000, 3000))
+
+    assert _reload_if_changed(str(config_path), 1000, runtime, schedule) == 3000
+    assert runtime.config["greenhouse_tokens"] == ["acme"]
+    assert [key for _, key in schedule.tasks] == ["acme"]
@@ -0,0 +1,119 @@
+import pytest
+
+import live_report
+import main
+import normalize
+from dedup import DedupIndex, canonical_url, fingerprint, minhash
+from live_report import LiveReport
+from profiles import Profile
+from storage import SeenStore
+
+GREENHOUSE_URL = "https://boards.greenhouse.io/acme/jobs/1"
+INDEED_URL = "https://www.indeed.com/viewjob?jk=abc123&gh_jid=1"
+PROFILE_A = 0b01
+PROFILE_B = 0b10
+
+
+def _job(url, location, title="Backend Engineer"):
+    return {"title": title, "company": "Acme", "location": location, "url": url, "description": ""}
+
+
+def _seen(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    return [SeenStore(path, legacy_path=None, profile=name) for name in ("a", "b")]
+
+
+def test_a_duplicate_still_reaches_the_profiles_the_first_copy_missed(tmp_path):
+    dedup = DedupIndex(str(tmp_path / "dedup.sqlite3"))
+    seen, queued = _seen(tmp_path), [set(), set()]
+    monterrey = _job(GREENHOUSE_URL, "Monterrey")
+    remoto = _job(INDEED_URL, "Remoto")
+
+    assert main._unduplicated_mask(dedup, monterrey, PROFILE_A, seen, queued) == PROFILE_A
+    assert main._unduplicated_mask(dedup, remoto, PROFILE_A | PROFILE_B, seen, queued) == PROFILE_B
+    # A third copy finds both profiles covered.
+    assert main._unduplicated_mask(dedup, _job(GREENHOUSE_URL + "?gh_src=x", "Remoto"), 0b11, seen, queued) == 0
+
+
+def test_a_broken_first_copy_lets_its_duplicate_through_in_the_batch_report(tmp_path, monkeypatch):
+    dedup = DedupIndex(str(tmp_path / "dedup.sqlite3"))
+    first = _job(GREENHOUSE_URL, "Monterrey")
+    other = _job("https://example.com/jobs/2", "Monterrey", title="Data Analyst")
+    copy = _job(INDEED_URL, "Monterrey")
+    candidates = [(0, first, PROFILE_A, None), (1, copy, PROFILE_A | PROFILE_B, None), (0, other, PROFILE_A, None)]
+    monkeypatch.setattr(main, "_fresh_candidates", lambda *args: iter(candidates))
+    monkeypatch.setattr(
+        main, "validate_links", lambda jobs, *args: [job for job in jobs if job["url"] != GREENHOUSE_URL]
+    )
+    matcher = type("Matcher", (), {"profiles": [None, None]})()
+
+    reports = main.filter_jobs([], matcher, _seen(tmp_path), dedup=dedup)
+
+    # The copy takes the broken link's place, in config order.
+    assert reports == [[other, copy], [copy]]
+
+
+class _Outbox:
+    def __init__(self):
+        self.urls = {}
+
+    def enqueue(self, messages, profile):
+        for _, _, urls in messages:
+            self.urls.setdefault(profile, []).extend(urls)
+
+
+def test_a_broken_first_copy_lets_its_duplicate_through_in_the_live_report(tmp_path, monkeypatch):
+    dedup = DedupIndex(str(tmp_path / "dedup.sqlite3"))
+    seen, queued = _seen(tmp_path), [set(), set()]
+    monkeypatch.setattr(live_report, "ok_link", lambda url, *args: url != GREENHOUSE_URL)
+    outbox = _Outbox()
+    profiles = [Profile("a", {}, ["1"]), Profile("b", {}, ["2"])]
+    report = LiveReport(profiles, outbox, lambda: 0, dedup=dedup, report_config={"linger_secs": 0})
+
+    for job, mask in ((_job(GREENHOUSE_URL, "Monterrey"), PROFILE_A), (_job(INDEED_URL, "Remoto"), 0b11)):
+        mask = main._unduplicated_mask(dedup, job, mask, seen, queued)
+        if mask:
+            report.offer(job, mask)
+
+    assert report.finish() == [1, 1]
+    assert outbox.urls == {"a": [INDEED_URL], "b": [INDEED_URL]}
+
+
+def test_an_already_normalized_description_gets_the_same_signature():
+    raw = "<p>Buscamos <b>Backend</b> engineer con Python, Django y SQL para el equipo de pagos &amp; cobros</p>"
+    assert minhash(raw) is not None
+    assert minhash(normalize.html_to_text(raw), normalized=True) == minhash(raw)
+
+
+@pytest.mark.parametrize(
+    "url, key",
+    [
+        # Redirect wrappers, nested and percent-encoded.
+        ("https://click.example.com/r?url=https%3A%2F%2Fboards.greenhouse.io%2Facme%2Fjobs%2F42", "greenhouse:42"),
+        ("https://t.co/x?dest=https://out.example.com/go?u=https://jobs.lever.co/acme/"
+         "0b6e3e4a-1c2d-4e5f-8a9b-0c1d2e3f4a5b", "lever:0b6e3e4a-1c2d-4e5f-8a9b-0c1d2e3f4a5b"),
+        # Known boards reduced to the posting id.
+        ("https://boards.greenhouse.io/acme/jobs/42?gh_src=abc", "greenhouse:42"),
+        ("https://acme.com/careers/?gh_jid=42", "greenhouse:42"),
+        ("https://jobs.lever.co/acme/0b6e3e4a-1c2d-4e5f-8a9b-0c1d2e3f4a5b/apply?lever-source=linkedin",
+         "lever:0b6e3e4a-1c2d-4e5f-8a9b-0c1d2e3f4a5b"),
+        ("https://mx.indeed.com/viewjob?jk=abc123&from=serp&vjs=3", "indeed:abc123"),
+        ("https://www.linkedin.com/jobs/view/backend-engineer-at-acme-3901234567/?trk=public", "linkedin:3901234567"),
+        ("https://www.linkedin.com/jobs/search/?currentJobId=3901234567&keywords=python", "linkedin:3901234567"),
+        # Anything else keeps its path and meaningful parameters, without tracking ones.
+        ("http://www.Example.com/jobs/7/?utm_source=x&fbclid=y&page=2&ref=home&_hsenc=z", "https://example.com/jobs/7?page=2"),
+        ("https://example.com/jobs?b=2&a=1", "https://example.com/jobs?a=1&b=2"),
+    ],
+)
+def test_canonical_url(url, key):
+    assert canonical_url(url) == key
+
+
+def test_fingerprint_ignores_accents_company_suffixes_and_what_follows_the_city():
+    job = {"title": "Ingeniero de Datos", "company": "Acme Inc.", "location": "Monterrey, N.L., MX"}
+    same = {"title": "INGENIERO DE DATOS", "company": "ACME", "location": "Monterrey, Nuevo León"}
+    other_city = {**same, "location": "León, Guanajuato"}
+
+    assert fingerprint(job) == fingerprint(same)
+    assert fingerprint(job) != fingerprint(other_city)
+    assert fingerprint({**job, "company": ""}) is None
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from fetcher import ConcurrencySettings, DeadlineSettings, FetchTask, build_tasks, stream_tasks, wait_idle
+from sources.parallel import fetch_in_order
+
+
+def test_long_running_tasks_do_not_hold_fetch_workers():
+    release = threading.Event()
+
+    def long_poll(name):
+        release.wait(5)
+        yield name
+
+    def board(name):
+        yield name
+
+    tasks = [FetchTask("apify_indeed", str(n), "apify", long_poll, (f"a{n}",), long_running=True) for n in range(4)]
+    tasks += [FetchTask("greenhouse", str(n), "boards", board, (f"b{n}",)) for n in range(6)]
+    settings = ConcurrencySettings(max_workers=2, per_host=2, hosts={"apify": 4})
+
+    arrived = []
+    started = time.monotonic()
+    for _, job in stream_tasks(tasks, settings):
+        arrived.append(job)
+        if len(arrived) == 6:
+            boards_done = time.monotonic() - started
+            release.set()
+    assert sorted(arrived[:6]) == [f"b{n}" for n in range(6)]
+    assert sorted(arrived[6:]) == [f"a{n}" for n in range(4)]
+    assert boards_done < 2
+
+
+class _Gauge:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.current -= 1
+
+
+def test_per_host_cap_bounds_tasks():
+    gauges = {"a": _Gauge(), "b": _Gauge()}
+
+    def request(host):
+        with gauges[host]:
+            time.sleep(0.02)
+        yield host
+
+    tasks = [FetchTask("greenhouse", str(n), host, request, (host,)) for n in range(10) for host in ("a", "b")]
+    settings = ConcurrencySettings(max_workers=16, per_host=2, hosts={"b": 3})
+    assert len(list(stream_tasks(tasks, settings))) == 20
+    assert gauges["a"].peak == 2
+    assert gauges["b"].peak == 3
+
+
+def test_parallel_requests_of_tasks_share_the_host_cap():
+    gauge = _Gauge()
+
+    def fetch(item):
+        with gauge:
+            time.sleep(0.01)
+        return item
+
+    def board(name):
+        yield from fetch_in_order(fetch, [f"{name}-{n}" for n in range(12)], 8)
+
+    tasks = [FetchTask("greenhouse", str(n), "boards", board, (str(n),)) for n in range(4)]
+    settings = ConcurrencySettings(max_workers=8, per_host=3)
+    jobs = [job for _, job in stream_tasks(tasks, settings)]
+    assert sorted(jobs) == sorted(f"{n}-{i}" for n in range(4) for i in range(12))
+    assert gauge.peak <= 3
+
+
+def test_wait_idle_waits_for_tasks_a_deadline_cut_left_running():
+    release = threading.Event()
+
+    def slow_board(name):
+        release.wait(5)
+        yield name
+
+    tasks = [FetchTask("greenhouse", "slow", "boards", slow_board, ("slow",))]
+    assert list(stream_tasks(tasks, deadline=DeadlineSettings(run_secs=0.05))) == []
+
+    assert not wait_idle(0.05)
+    release.set()
+    assert wait_idle(2)
+
+
+def test_an_unknown_pagination_style_skips_the_source(caplog):
+    config = {
+        "external_sources": [
+            {"name": "feed", "endpoint": "https://feed.example/jobs", "pagination": {"style": "page"}},
+            {"name": "broken", "endpoint": "https://broken.example/jobs", "pagination": {"style": "pages"}},
+            {"name": "plain", "endpoint": "https://plain.example/jobs"},
+        ]
+    }
+    assert [task.key for task in build_tasks(config, None)] == ["feed", "plain"]
+    assert "broken" in caplog.text
@@ -0,0 +1,61 @@
+import pytest
+
+from filters import CompiledFilter, apply_filters
+from normalize import html_to_text
+
+FILTERS = {
+    "ubicaciones": ["Monterrey"],
+    "titulos_permitidos": ["engineer"],
+    "niveles": ["junior"],
+    "exclusiones": ["senior"],
+    "exclusion_por_anos": 3,
+}
+
+YEARS_CASES = [
+    ("Requisitos: 5+ años de experiencia", False),
+    ("Requisitos: 5 + años de experiencia", False),
+    ("Más de 3 años con Python", False),
+    ("mas de 2 años con Python", True),
+    ("Experiencia de 3 - 5 años", False),
+    ("Experiencia de 1 - 2 años", True),
+    ("5 más años", False),
+    ("5 mas años", False),
+    ("10años en la industria", False),
+    ("Participarás en 5 proyectos a lo largo de los años", True),
+    ("5" + " " * 40 + "años", False),
+    ("Reparación de 5 daños menores", True),
+    ("5 AÑOS", False),
+    ("5 Años", False),
+    ("5 anos", False),
+    ("5 ANOS", False),
+    ("2 anos", True),
+    ("2 años", True),
+    ("Sin requisito de experiencia", True),
+]
+
+
+@pytest.mark.parametrize("description, accepted", YEARS_CASES)
+def test_the_years_rule_gives_the_verdicts_of_apply_filters(description, accepted):
+    job = {"title": "Junior Engineer", "location": "Monterrey", "description": description}
+    compiled = CompiledFilter(FILTERS)
+
+    assert apply_filters(job, FILTERS) is accepted
+    assert compiled.matches(job) is accepted
+    # Descriptions reach the filters normalized, with accents and case folded.
+    assert compiled.matches({**job, "description": html_to_text(description)}) is accepted
+
+
+@pytest.mark.parametrize(
+    "job",
+    [
+        {"title": "Junior Engineer", "location": "León", "description": "junior"},
+        {"title": "Junior Engineer", "location": "Monterrey, NL", "description": "junior"},
+        {"title": "Data Analyst", "location": "Monterrey", "description": "junior"},
+        {"title": "Engineer", "location": "Monterrey", "description": "Buscamos perfil JUNIOR"},
+        {"title": "Engineer", "location": "Monterrey", "description": "Mid level"},
+        {"title": "Senior Engineer", "location": "Monterrey", "description": "junior"},
+        {"title": "Junior Engineer", "location": "Monterrey", "description": "Reporta al SENIOR lead"},
+    ],
+)
+def test_the_other_rules_give_the_verdicts_of_apply_filters(job):
+    assert CompiledFilter(FILTERS).matches(job) is apply_filters(job, FILTERS)
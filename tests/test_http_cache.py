@@ -0,0 +1,74 @@
+import io
+
+import pytest
+import requests
+
+import http_cache
+import http_client
+from http_cache import ResponseCache, cached_get
+
+
+class _Client:
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        response = requests.Response()
+        if headers and headers.get("If-None-Match") == '"v1"':
+            response.status_code = 304
+            payload = b""
+        else:
+            response.status_code = 200
+            payload = b'[{"id": 1}]'
+        response._content = payload
+        response.raw = io.BytesIO(payload)
+        response.headers["ETag"] = '"v1"'
+        return response
+
+
+@pytest.fixture
+def client():
+    installed = _Client()
+    http_client.set_client(installed)
+    yield installed
+    http_client.set_client(None)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "http_cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def _rows(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def test_responses_are_written_by_flush_and_revalidated_before_it(client, cache):
+    assert cached_get("https://api/jobs", lambda response: response.json(), cache) == [{"id": 1}]
+    assert _rows(cache) == 0
+
+    # Not on disk yet, but the next request already sends its validator.
+    assert cached_get("https://api/jobs", lambda response: response.json(), cache) == [{"id": 1}]
+    assert client.requests[1][1] == {"If-None-Match": '"v1"'}
+
+    cache.flush()
+    assert _rows(cache) == 1
+
+
+def test_full_batches_are_written_at_once_and_close_writes_the_rest(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "FLUSH_EVERY", 3)
+    path = str(tmp_path / "http_cache.sqlite3")
+    cache = ResponseCache(path)
+    for number in range(4):
+        cache.put(f"https://api/jobs/{number}", '"e"', None, {"id": number})
+    assert _rows(cache) == 3
+    cache.close()
+
+    reopened = ResponseCache(path)
+    try:
+        assert _rows(reopened) == 4
+    finally:
+        reopened.close()
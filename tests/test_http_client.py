@@ -0,0 +1,110 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import http_client
+from notify.telegram import TelegramRateLimited, send_message
+
+
+class _Session:
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers["Retry-After"] = "1"
+        response._content = b"{}"
+        response.raw = io.BytesIO(b"{}")
+        return response
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def client():
+    client = http_client.HttpClient(retries=3, backoff=0)
+    http_client.set_client(client)
+    yield client
+    http_client.set_client(None)
+
+
+def test_telegram_rate_limit_reaches_the_outbox_unretried(client):
+    client.session = _Session(429)
+    with pytest.raises(TelegramRateLimited):
+        send_message("hola", "token", "123")
+    assert client.session.calls == 1
+
+
+def test_get_still_retries_rate_limits(client, monkeypatch):
+    monkeypatch.setattr(http_client.time, "sleep", lambda secs: None)
+    client.session = _Session(429)
+    assert client.get("http://example.test/").status_code == 429
+    assert client.session.calls == client.retries + 1
+
+
+def test_configure_closes_the_client_it_replaces(client):
+    old_session = client.session = _Session(200)
+    new_client = http_client.configure({})
+    try:
+        assert old_session.closed
+        assert http_client.get_client() is new_client
+    finally:
+        new_client.close()
+
+
+class _SlowSession(_Session):
+    def request(self, method, url, **kwargs):
+        time.sleep(0.03)
+        return super().request(method, url, **kwargs)
+
+
+class _BlockingSession(_Session):
+    def __init__(self, status):
+        super().__init__(status)
+        self.sending = threading.Event()
+        self.release = threading.Event()
+
+    def request(self, method, url, **kwargs):
+        self.sending.set()
+        self.release.wait(5)
+        assert not self.closed
+        return super().request(method, url, **kwargs)
+
+
+def test_a_replaced_client_stays_open_until_its_requests_finish(client):
+    old_session = client.session = _BlockingSession(200)
+    straggler = ThreadPoolExecutor(max_workers=1)
+    response = straggler.submit(client.get, "http://example.test/")
+    old_session.sending.wait(5)
+    new_client = http_client.configure({})
+    try:
+        assert not old_session.closed
+        old_session.release.set()
+        assert response.result(5).status_code == 200
+        assert old_session.closed
+    finally:
+        straggler.shutdown()
+        new_client.close()
+
+
+def test_the_hedge_timer_starts_when_the_primary_does():
+    client = http_client.HttpClient(pool_size=1, hedge_after={"example.test": 0.05})
+    client.session = _SlowSession(200)
+    pool = client._hedge_executor()
+    try:
+        # Both hedge threads are busy for longer than the hedge delay.
+        busy = [pool.submit(time.sleep, 0.1) for _ in range(2)]
+        assert client.get("http://example.test/", hedge=True).status_code == 200
+        assert all(future.done() for future in busy)
+        assert client.session.calls == 1
+    finally:
+        client.close()
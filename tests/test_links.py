@@ -0,0 +1,119 @@
+import pytest
+import requests
+
+import http_client
+import link_cache
+from filters import check_link, validate_links
+from link_cache import LinkCache
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Client:
+    """Answers HEAD and GET from per-URL tables; a missing entry raises."""
+
+    def __init__(self, head=None, get=None):
+        self.head_status = head or {}
+        self.get_status = get or {}
+        self.calls = []
+
+    def _answer(self, method, table, url, kwargs):
+        self.calls.append((method, url, kwargs.get("stream", False)))
+        if url not in table:
+            raise requests.ConnectionError(url)
+        return _Response(table[url])
+
+    def head(self, url, **kwargs):
+        return self._answer("HEAD", self.head_status, url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self._answer("GET", self.get_status, url, kwargs)
+
+
+@pytest.fixture
+def client():
+    def install(**tables):
+        installed = _Client(**tables)
+        http_client.set_client(installed)
+        return installed
+
+    yield install
+    http_client.set_client(None)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LinkCache(str(tmp_path / "links.sqlite3"), positive_ttl=100, negative_ttl=10, max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_a_working_head_needs_no_get(client):
+    installed = client(head={"https://a": 200})
+    assert check_link("https://a") == 200
+    assert [method for method, _, _ in installed.calls] == ["HEAD"]
+
+
+def test_a_rejected_or_failed_head_is_confirmed_with_a_streamed_get(client):
+    installed = client(head={"https://a": 405}, get={"https://a": 200, "https://b": 200})
+    assert check_link("https://a") == 200
+    assert check_link("https://b") == 200
+    assert [call for call in installed.calls if call[0] == "GET"] == [
+        ("GET", "https://a", True),
+        ("GET", "https://b", True),
+    ]
+
+
+def test_the_head_status_stands_when_the_get_fails_too(client):
+    client(head={"https://a": 404})
+    assert check_link("https://a") == 404
+    assert check_link("https://b") == 0
+
+
+def test_validate_links_keeps_working_links_and_caches_both_verdicts(client, cache):
+    installed = client(head={"https://ok": 200, "https://gone": 404})
+    jobs = [{"url": "https://ok"}, {"url": "https://gone"}, {"url": "https://ok"}, {"url": ""}]
+
+    assert validate_links(jobs, {"workers": 2}, cache) == [jobs[0], jobs[2]]
+    assert cache.get("https://ok") is True
+    assert cache.get("https://gone") is False
+
+    installed.calls.clear()
+    assert validate_links(jobs, {"workers": 2}, cache) == [jobs[0], jobs[2]]
+    assert installed.calls == []
+
+
+def test_verdicts_expire_after_their_own_ttl(cache, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(link_cache.time, "time", lambda: now)
+    cache.put("https://ok", True, 200)
+    cache.put("https://gone", False, 404)
+
+    now = 1011.0
+    assert cache.get("https://ok") is True
+    assert cache.get("https://gone") is None
+    now = 1101.0
+    assert cache.get("https://ok") is None
+
+
+def test_prune_drops_expired_rows_then_the_oldest_over_max_entries(cache, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(link_cache.time, "time", lambda: now)
+    cache.put("https://stale", True, 200)
+    for offset, url in enumerate(["https://1", "https://2", "https://3", "https://4"]):
+        now = 1200.0 + offset
+        cache.put(url, True, 200)
+
+    cache.prune()
+
+    rows = cache._conn.execute("SELECT url FROM links ORDER BY checked_at").fetchall()
+    assert [url for url, in rows] == ["https://2", "https://3", "https://4"]
@@ -0,0 +1,34 @@
+from messaging import ChunkBuilder, build_chunks
+
+
+def _job(number, title="Backend Engineer"):
+    return {"title": title, "company": "Acme", "location": "Monterrey", "url": f"https://example.com/{number}"}
+
+
+def test_jobs_keep_their_order_around_an_oversized_entry():
+    jobs = [_job(1), _job(2, title="Backend " * 45), _job(3)]
+
+    chunks = build_chunks(jobs, max_length=400)
+
+    assert all(len(text) <= 400 for text, _ in chunks)
+    assert [url for _, urls in chunks for url in urls] == [job["url"] for job in jobs]
+    links = [line for text, _ in chunks for line in text.splitlines() if line.startswith("Link: ")]
+    assert links == [f"Link: {job['url']}" for job in jobs]
+
+
+def test_the_open_message_goes_out_before_the_pieces():
+    builder = ChunkBuilder(400)
+    assert builder.add(_job(1)) == []
+
+    chunks = builder.add(_job(2, title="Backend " * 45))
+
+    assert chunks[0][1] == ["https://example.com/1"]
+    assert chunks[-1][1] == ["https://example.com/2"]
+    assert len(builder) == 0
+    assert builder.flush() == []
+
+
+def test_entries_share_a_message_while_they_fit():
+    chunks = build_chunks([_job(number) for number in range(10)], max_length=3500)
+    assert len(chunks) == 1
+    assert chunks[0][1] == [f"https://example.com/{number}" for number in range(10)]
@@ -0,0 +1,87 @@
+import json
+import pstats
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = metrics.configure(
+        {
+            "enabled": True,
+            "json_log": str(tmp_path / "metrics.jsonl"),
+            "textfile": str(tmp_path / "botjobs.prom"),
+            "profile": ["filter_jobs"],
+            "profile_dir": str(tmp_path / "profiles"),
+        }
+    )
+    yield recorder
+    metrics.configure(None)
+
+
+def _record_run():
+    metrics.start_run()
+    with metrics.stage("collect"):
+        pass
+    metrics.incr("jobs_rejected_total", 3, rule="location")
+    metrics.incr("jobs_rejected_total", 1, rule='ti"tle')
+    metrics.record_source("greenhouse", "acme", 0.25, 12)
+    metrics.record_source("lever", "globex", 1.5, 0, "Timeout")
+    metrics.record_http("GET", "https://API.lever.co/v0/postings/globex", 200, 0.5, 2048)
+    metrics.finish_run()
+
+
+def test_the_textfile_is_prometheus_exposition_format(tmp_path, recorder):
+    _record_run()
+    lines = (tmp_path / "botjobs.prom").read_text(encoding="utf-8").splitlines()
+
+    assert lines[0] == "# TYPE botjobs_run_timestamp_seconds gauge"
+    assert "# TYPE botjobs_jobs_rejected_total counter" in lines
+    assert 'botjobs_jobs_rejected_total{rule="location"} 3' in lines
+    assert 'botjobs_jobs_rejected_total{rule="ti\\"tle"} 1' in lines
+    assert 'botjobs_source_jobs_total{key="acme",source="greenhouse"} 12' in lines
+    assert 'botjobs_source_errors_total{key="globex",source="lever"} 1' in lines
+    assert 'botjobs_http_requests_total{host="api.lever.co",method="GET",status="200"} 1' in lines
+    assert 'botjobs_stage_calls_total{stage="collect"} 1' in lines
+    # One TYPE line per metric, every sample under its own.
+    types = [line for line in lines if line.startswith("# TYPE")]
+    assert len(types) == len(set(types))
+    assert not (tmp_path / "botjobs.prom.tmp").exists()
+
+
+def test_every_run_appends_one_json_summary(tmp_path, recorder):
+    _record_run()
+    _record_run()
+    runs = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text(encoding="utf-8").splitlines()]
+
+    assert len(runs) == 2
+    summary = runs[1]
+    assert summary["metrics"]["jobs_rejected_total"] == [
+        {"rule": "location", "value": 3},
+        {"rule": 'ti"tle', "value": 1},
+    ]
+    assert summary["sources"] == [
+        {"source": "greenhouse", "key": "acme", "seconds": 0.25, "jobs": 12, "error": None},
+        {"source": "lever", "key": "globex", "seconds": 1.5, "jobs": 0, "error": "Timeout"},
+    ]
+
+
+def test_profiled_stages_leave_a_readable_prof_file(tmp_path, recorder):
+    with metrics.stage("filter_jobs"):
+        sum(range(1000))
+    with metrics.stage("collect"):
+        pass
+
+    dumps = list((tmp_path / "profiles").iterdir())
+    assert len(dumps) == 1 and dumps[0].name.startswith("filter_jobs-")
+    assert pstats.Stats(str(dumps[0])).total_calls > 0
+
+
+def test_disabled_metrics_record_nothing(tmp_path):
+    metrics.configure({"enabled": False})
+    assert metrics.stage("collect") is metrics.stage("filter_jobs")
+    metrics.incr("jobs_rejected_total")
+    metrics.finish_run()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,21 @@
+from notify.outbox import Outbox
+
+
+def test_failed_messages_block_their_jobs_until_pruned(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), max_attempts=2, failed_expire_days=7)
+    outbox.enqueue([("1", "texto", ["https://a.test/1"])], "perfil")
+    (message_id, _, _, _), = outbox.pending("1")
+    outbox.record_failure(message_id)
+    assert outbox.pending("1")
+    outbox.record_failure(message_id)
+    assert outbox.pending("1") == []
+    assert outbox.pending_urls("perfil") == set()
+    assert outbox.queued_urls("perfil") == {"https://a.test/1"}
+
+    outbox.prune()
+    assert outbox.queued_urls("perfil") == {"https://a.test/1"}
+    with outbox._conn:
+        outbox._conn.execute("UPDATE messages SET created_at = created_at - 8 * 86400")
+    outbox.prune()
+    assert outbox.queued_urls("perfil") == set()
+    outbox.close()
@@ -0,0 +1,58 @@
+import random
+import threading
+import time
+
+import http_client
+from sources.pagination import iter_pages
+
+
+def _pages(total, size):
+    fetched = []
+
+    def fetch_page(number):
+        fetched.append(number)
+        time.sleep(random.uniform(0, 0.01))
+        return list(range(number * size, min(total, (number + 1) * size)))
+
+    return fetch_page, fetched
+
+
+def test_pages_come_back_in_order_up_to_the_short_one():
+    fetch_page, _ = _pages(95, 10)
+    pages = list(iter_pages(fetch_page, 10, 50, 4))
+    assert [len(page) for page in pages] == [10] * 9 + [5]
+    assert [item for page in pages for item in page] == list(range(95))
+
+
+def test_a_short_first_page_is_the_only_request():
+    fetch_page, fetched = _pages(7, 10)
+    assert list(iter_pages(fetch_page, 10, 50, 4)) == [list(range(7))]
+    assert fetched == [0]
+
+
+def test_max_pages_and_failed_pages_end_the_walk():
+    fetch_page, _ = _pages(1000, 10)
+    assert len(list(iter_pages(fetch_page, 10, 3, 4))) == 3
+    assert list(iter_pages(lambda number: [number] if number < 2 else None, None, 50, 4)) == [[0], [1]]
+
+
+def test_following_pages_stay_within_the_lent_slots(host_slots):
+    slots = host_slots(1)
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def fetch_page(number):
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.01)
+        with lock:
+            state["current"] -= 1
+        return [number] * 10 if number < 12 else []
+
+    with http_client.request_scope(slots=slots):
+        pages = list(iter_pages(fetch_page, 10, 50, 8))
+    assert [page[0] for page in pages] == list(range(12))
+    assert state["peak"] == 2
+    time.sleep(0.1)
+    assert slots.free == 1
@@ -0,0 +1,57 @@
+import random
+import threading
+import time
+
+import http_client
+from sources.parallel import fetch_in_order
+
+
+def test_results_keep_the_order_of_items():
+    def fetch(item):
+        time.sleep(random.uniform(0, 0.01))
+        return item * 2
+
+    assert list(fetch_in_order(fetch, range(30), 6)) == [item * 2 for item in range(30)]
+
+
+def test_only_lent_slots_add_concurrency(host_slots):
+    slots = host_slots(2)
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def fetch(item):
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.01)
+        with lock:
+            state["current"] -= 1
+        return item
+
+    with http_client.request_scope(slots=slots):
+        assert list(fetch_in_order(fetch, range(20), 8)) == list(range(20))
+    assert state["peak"] == 3
+    assert slots.free == 2
+
+
+def test_closing_early_returns_borrowed_slots(host_slots):
+    slots = host_slots(4)
+    with http_client.request_scope(slots=slots):
+        results = fetch_in_order(lambda item: time.sleep(0.01) or item, range(100), 5)
+        assert next(results) == 0
+        results.close()
+    time.sleep(0.1)
+    assert slots.free == 4
+
+
+def test_a_busy_host_is_not_polled_in_a_loop(host_slots):
+    slots = host_slots(1)
+
+    def fetch(item):
+        # Later items finish first, so finished futures wait behind the head.
+        time.sleep(0.05 if item == 0 else 0.001)
+        return item
+
+    with http_client.request_scope(slots=slots):
+        assert list(fetch_in_order(fetch, range(10), 4)) == list(range(10))
+    assert slots.attempts < 50
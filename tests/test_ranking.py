@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+import live_report
+from live_report import LiveReport
+from profiles import Profile
+from ranking import RelevanceScorer
+
+
+def _profile(limit, keywords):
+    return Profile("p", {"palabras_clave": keywords}, ["1"], limit)
+
+
+def _candidates(scorer, descriptions, mask=0b1):
+    candidates = []
+    for index, description in enumerate(descriptions):
+        job = {"title": f"job{index}", "description": description}
+        counts = scorer.count(job)
+        scorer.observe(counts)
+        candidates.append((0, job, mask, counts))
+    return candidates
+
+
+def test_ranking_is_on_unless_disabled():
+    profiles = [_profile(2, ["python"])]
+    assert RelevanceScorer.from_config(profiles, None) is not None
+    assert RelevanceScorer.from_config(profiles, {"enabled": False}) is None
+
+
+def test_top_k_keeps_the_best_limit_plus_margin_best_first():
+    scorer = RelevanceScorer([_profile(2, {"python": 1, "django": 2})], margin=1)
+    descriptions = ["java", "python", "django", "python django", "python python python", "go", "django django"]
+
+    ranked = scorer.top_k(_candidates(scorer, descriptions))
+
+    assert [job["description"] for job in ranked[0]] == ["django django", "python django", "python python python"]
+
+
+def test_ties_keep_candidate_order_and_unlimited_profiles_keep_everything():
+    scorer = RelevanceScorer([_profile(None, ["python"]), _profile(1, ["python"])], margin=0)
+    candidates = _candidates(scorer, ["python", "rust", "python", "python"], mask=0b11)
+
+    unlimited, limited = scorer.top_k(candidates)
+
+    assert [job["title"] for job in unlimited] == ["job0", "job2", "job3", "job1"]
+    assert [job["title"] for job in limited] == ["job0"]
+
+
+class _Outbox:
+    def __init__(self):
+        self.urls = []
+
+    def enqueue(self, messages, profile):
+        for _, _, urls in messages:
+            self.urls.extend(urls)
+
+
+@pytest.fixture
+def checked(monkeypatch):
+    checked = []
+    lock = threading.Lock()
+
+    def ok_link(url, *args):
+        with lock:
+            checked.append(url)
+        return True
+
+    monkeypatch.setattr(live_report, "ok_link", ok_link)
+    return checked
+
+
+def _offer(report, description):
+    job = {"title": "Dev", "company": "Acme", "location": "Remoto", "url": f"https://example.com/{description}"}
+    job["description"] = description
+    counts = report.scorer.count(job)
+    report.scorer.observe(counts)
+    report.offer(job, 0b1, counts)
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_the_live_report_sends_each_window_best_first(checked):
+    scorer = RelevanceScorer([_profile(None, {"python": 1, "django": 2})])
+    outbox = _Outbox()
+    report = LiveReport(scorer.profiles, outbox, lambda: 0, report_config={"linger_secs": 60}, scorer=scorer)
+    for description in ["java", "python", "django django", "python django"]:
+        _offer(report, description)
+
+    assert report.finish() == [4]
+    best_first = ["django django", "python django", "python", "java"]
+    assert outbox.urls == [f"https://example.com/{description}" for description in best_first]
+
+
+def test_a_full_window_only_checks_links_that_beat_its_worst(checked):
+    scorer = RelevanceScorer([_profile(2, {"python": 1, "django": 2})])
+    outbox = _Outbox()
+    report = LiveReport(scorer.profiles, outbox, lambda: 0, report_config={"linger_secs": 60}, scorer=scorer)
+    _offer(report, "python")
+    _offer(report, "django")
+    _wait_for(lambda: report._floors[0] is not None)
+    _offer(report, "java")
+    _offer(report, "django django")
+
+    assert report.finish() == [2]
+    assert outbox.urls == ["https://example.com/django django", "https://example.com/django"]
+    assert "https://example.com/java" not in checked
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+import threading
+
+import storage
+from storage import SeenStore
+
+
+def test_the_legacy_json_is_imported_once_and_renamed(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    legacy = tmp_path / "seen_jobs.json"
+    legacy.write_text(json.dumps(["https://a", "https://b", ""]), encoding="utf-8")
+
+    store = SeenStore(path, legacy_path=str(legacy))
+    assert sorted(store) == ["https://a", "https://b"]
+    store.close()
+    assert not legacy.exists()
+    assert json.loads((tmp_path / "seen_jobs.json.migrated").read_text(encoding="utf-8")) == [
+        "https://a",
+        "https://b",
+        "",
+    ]
+
+    store = SeenStore(path, legacy_path=str(legacy))
+    assert sorted(store) == ["https://a", "https://b"]
+    store.close()
+
+
+def test_an_unreadable_legacy_json_is_left_in_place(tmp_path):
+    legacy = tmp_path / "seen_jobs.json"
+    legacy.write_text("[\"https://a\"", encoding="utf-8")
+
+    store = SeenStore(str(tmp_path / "seen.sqlite3"), legacy_path=str(legacy))
+    assert len(store) == 0
+    store.close()
+    assert legacy.exists()
+
+
+def test_a_store_from_before_profiles_moves_to_the_default_profile(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE seen (url TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+    conn.execute("INSERT INTO seen VALUES ('https://a', strftime('%s', 'now'))")
+    conn.commit()
+    conn.close()
+
+    default = SeenStore(path, legacy_path=None)
+    other = SeenStore(path, legacy_path=None, profile="b")
+    try:
+        assert "https://a" in default
+        assert "https://a" not in other
+    finally:
+        default.close()
+        other.close()
+
+
+def test_a_write_does_not_leave_the_file_locked_for_other_profiles(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    first = SeenStore(path, legacy_path=None, profile="a")
+    second = SeenStore(path, legacy_path=None, profile="b")
+    # Fail at once instead of waiting out the busy timeout.
+    second._conn.execute("PRAGMA busy_timeout = 0")
+    try:
+        first.add("https://a")
+        second.add("https://b")
+    finally:
+        first.close()
+        second.close()
+
+
+def test_profiles_writing_at_once_all_land(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    stores = [SeenStore(path, legacy_path=None, profile=name) for name in ("a", "b", "c")]
+
+    def write(store):
+        for batch in range(40):
+            storage.mark_seen_batch([f"https://{store.profile}/{batch}/{n}" for n in range(5)], store)
+
+    threads = [threading.Thread(target=write, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for store in stores:
+        store.close()
+
+    reopened = SeenStore(path, legacy_path=None, profile="b")
+    try:
+        assert len(reopened) == 200
+    finally:
+        reopened.close()
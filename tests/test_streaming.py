@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from sources.streaming import iter_json_items
+
+
+DOCUMENTS = [
+    '[1, 25000000000.0, -3e-7, 12.75, true, false, null, "x"]',
+    '{"score": 12.75, "data": [{"id": 1, "pay": 1.5e3}, {"id": 22, "ok": true}], "total": 2}',
+    '{"meta": {"n": 3}, "results": [{"title": "Dev \\u00e1gil", "n": 10}, {"title": "QA", "n": -0.5}]}',
+    '[{"a": [1, 2, {"b": 3.25}]}, 4, "fin"]',
+    ' [ 1 , 2 , 3 ] ',
+]
+
+
+def _chunks(text, size):
+    data = text.encode("utf-8")
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+def _expected(text, data_key=None):
+    document = json.loads(text)
+    if isinstance(document, list):
+        return document
+    return document.get(data_key or "results", document.get("results", []))
+
+
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_every_chunk_size_matches_json_loads(text):
+    expected = _expected(text, "data")
+    for size in range(1, len(text.encode("utf-8")) + 1):
+        assert list(iter_json_items(_chunks(text, size), "data")) == expected, size
+
+
+def test_number_cut_after_the_decimal_point():
+    chunks = [b'{"data": [{"score": 12.', b'75, "id": 1}]}']
+    assert list(iter_json_items(chunks, "data")) == [{"score": 12.75, "id": 1}]
+
+
+def test_multibyte_characters_split_across_chunks():
+    text = '[{"city": "Monterrey, Nuevo León"}]'
+    for size in range(1, 8):
+        assert list(iter_json_items(_chunks(text, size))) == json.loads(text)
+
+
+def test_truncated_body_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_items([b'[1, 2, {"a": ']))
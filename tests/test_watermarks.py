@@ -0,0 +1,70 @@
+import pytest
+
+import watermarks
+from sources.record import JobRecord
+from watermarks import WatermarkStore, config_hash
+
+FILTERS = {"ubicaciones": ["Monterrey"], "niveles": ["Junior"], "exclusion_por_anos": 3, "limite_envio": 10}
+
+
+def _posting(updated_at, key="greenhouse:acme:1"):
+    return JobRecord("Backend", "Acme", "Monterrey", "https://example.com/1", "", key, updated_at)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "watermarks.sqlite3")
+
+
+def test_only_the_rules_change_the_hash():
+    base = config_hash({"filters": FILTERS})
+
+    assert config_hash({"filters": {**FILTERS, "limite_envio": 30}}) == base
+    assert config_hash({"filters": {**FILTERS, "palabras_clave": ["python"]}, "telegram": {"chat_ids": [1]}}) == base
+    assert config_hash({"filters": {**FILTERS, "exclusion_por_anos": 5}}) != base
+    assert config_hash({"filters": {**FILTERS, "niveles": ["Junior", "Trainee"]}}) != base
+
+
+def test_profiles_hash_their_rules_in_order():
+    ana = {"name": "ana", "chat_ids": [1], "limite_envio": 5, "filters": FILTERS}
+    luis = {"name": "luis", "chat_ids": [2], "filters": {"ubicaciones": ["León"]}}
+    base = config_hash({"profiles": [ana, luis]})
+
+    assert config_hash({"profiles": [{**ana, "limite_envio": 50, "chat_ids": [3]}, luis]}) == base
+    assert config_hash({"profiles": [luis, ana]}) != base
+    assert config_hash({"profiles": [ana]}) != base
+
+
+def test_a_rejection_is_skipped_until_the_posting_or_the_rules_change(path):
+    store = WatermarkStore(path, filters_hash="v1")
+    store.remember(_posting("2024-05-01"), "level")
+    store.remember(JobRecord("Sin id", "Acme", "Monterrey", "https://example.com/2"), "level")
+    store.close()
+
+    store = WatermarkStore(path, filters_hash="v1")
+    try:
+        assert store.rejection_of(_posting("2024-05-01")) == "level"
+        assert store.rejection_of(_posting("2024-06-01")) is None
+        assert store.rejection_of(_posting("2024-05-01", key="greenhouse:acme:2")) is None
+        store.filters_hash = "v2"
+        assert store.rejection_of(_posting("2024-05-01")) is None
+
+        # A new verdict replaces the old one.
+        store.remember(_posting("2024-06-01"), "years")
+        assert store.rejection_of(_posting("2024-06-01")) == "years"
+    finally:
+        store.close()
+
+
+def test_old_verdicts_expire(path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(watermarks.time, "time", lambda: now)
+    store = WatermarkStore(path, expire_days=1, filters_hash="v1")
+    store.remember(_posting("2024-05-01"), "level")
+    store.flush()
+
+    now += 2 * 86400
+    assert store.rejection_of(_posting("2024-05-01")) is None
+    store.prune()
+    assert store._conn.execute("SELECT COUNT(*) FROM watermarks").fetchone() == (0,)
+    store.close()
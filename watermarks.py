@@ -0,0 +1,118 @@
+"""Per-posting watermarks: which postings were already judged and rejected."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from profiles import load_profiles
+from sources.record import posting_key_of
+
+
+DEFAULT_WATERMARK_PATH = "watermarks.sqlite3"
+DEFAULT_EXPIRE_DAYS = 30
+
+# The filter keys a rejection depends on; ``limite_envio``, ``palabras_clave``
+# and the chat ids only change what is sent, not what is rejected.
+VERDICT_KEYS = ("ubicaciones", "niveles", "titulos_permitidos", "exclusiones", "exclusion_por_anos")
+
+# (updated_at, filters_hash, rejection, checked_at)
+Verdict = Tuple[Optional[str], str, str, float]
+
+
+def config_hash(config: Dict) -> str:
+    """Hash of the rules that decide a verdict, over every profile in order."""
+    relevant = [{key: profile.filter_config.get(key) for key in VERDICT_KEYS} for profile in load_profiles(config)]
+    encoded = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class WatermarkStore:
+    def __init__(
+        self,
+        path: str = DEFAULT_WATERMARK_PATH,
+        expire_days: Optional[float] = DEFAULT_EXPIRE_DAYS,
+        filters_hash: str = "",
+    ) -> None:
+        self.expire_days = expire_days
+        self.filters_hash = filters_hash
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            " posting_key TEXT PRIMARY KEY,"
+            " updated_at TEXT,"
+            " filters_hash TEXT NOT NULL,"
+            " rejection TEXT NOT NULL,"
+            " checked_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        # Looked up from the fetch threads and the filter loop for every
+        # posting, so the verdicts are kept in memory.
+        self._rejections: Dict[str, Verdict] = {
+            key: (updated_at, verdict_hash, rejection, checked_at)
+            for key, updated_at, verdict_hash, rejection, checked_at in self._conn.execute(
+                "SELECT posting_key, updated_at, filters_hash, rejection, checked_at FROM watermarks"
+            )
+        }
+        self._new: List[str] = []
+        self.prune()
+
+    @classmethod
+    def from_config(cls, watermark_config: Optional[Dict], filters_hash: str = "") -> Optional["WatermarkStore"]:
+        watermark_config = watermark_config or {}
+        if not watermark_config.get("enabled", True):
+            return None
+        return cls(
+            watermark_config.get("path", DEFAULT_WATERMARK_PATH),
+            watermark_config.get("expire_days", DEFAULT_EXPIRE_DAYS),
+            filters_hash,
+        )
+
+    def known_rejection(self, posting_key: str, updated_at: Optional[str]) -> Optional[str]:
+        """The rule that rejected this version of the posting with the current filters, if any."""
+        entry = self._rejections.get(posting_key)
+        if entry is None or entry[0] != updated_at or entry[1] != self.filters_hash:
+            return None
+        if self.expire_days and time.time() - entry[3] > float(self.expire_days) * 86400:
+            return None
+        return entry[2]
+
+    def rejection_of(self, job: Any) -> Optional[str]:
+        key = posting_key_of(job)
+        return self.known_rejection(*key) if key is not None else None
+
+    def remember(self, job: Any, rejection: str) -> None:
+        """Record that the current filters reject ``job``; ignored for jobs without a posting id."""
+        key = posting_key_of(job)
+        if key is None:
+            return
+        posting_key, updated_at = key
+        with self._lock:
+            self._rejections[posting_key] = (updated_at, self.filters_hash, rejection, time.time())
+            self._new.append(posting_key)
+
+    def flush(self) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO watermarks"
+                " (posting_key, updated_at, filters_hash, rejection, checked_at) VALUES (?, ?, ?, ?, ?)",
+                ((key, *self._rejections[key]) for key in dict.fromkeys(self._new) if key in self._rejections),
+            )
+            self._new.clear()
+
+    def prune(self) -> None:
+        if not self.expire_days:
+            return
+        cutoff = time.time() - float(self.expire_days) * 86400
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM watermarks WHERE checked_at < ?", (cutoff,))
+            expired = [key for key, verdict in self._rejections.items() if verdict[3] < cutoff]
+            for key in expired:
+                del self._rejections[key]
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()